@@ -0,0 +1,79 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from orders.models import Order
+
+from analytics.models import DailySales
+from analytics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily sales rollups from the paid orders, a range of "
+        "days at a time, each in its own transaction. Needed after orders "
+        "were changed without signals, e.g. with QuerySet.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=datetime.date.fromisoformat,
+            help="First day to rebuild (YYYY-MM-DD), defaults to the first order.",
+        )
+        parser.add_argument(
+            "--until",
+            type=datetime.date.fromisoformat,
+            help="Last day to rebuild (YYYY-MM-DD), defaults to today.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=31,
+            help="Number of days rebuilt per transaction.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows read and inserted at a time.",
+        )
+
+    def handle(self, *args, **options):
+        since, until = options["since"], options["until"]
+        if since is None:
+            since = self.first_day()
+            if since is None:
+                self.stdout.write("No order to roll up.")
+                return
+        if until is None:
+            until = timezone.localdate()
+        if since > until:
+            raise CommandError("--since is after --until.")
+
+        step = datetime.timedelta(days=options["days"])
+        start, written = since, 0
+        while start <= until:
+            end = min(start + step, until + datetime.timedelta(days=1))
+            rows = rebuild(start, end, batch_size=options["batch_size"])
+            written += rows
+            self.stdout.write(f"{start} to {end}: {rows} rows")
+            start = end
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows."))
+
+    def first_day(self):
+        """
+        Get the first day with orders or rollups, stale rollups included.
+
+        Returns:
+            date: The first day, None without orders nor rollups.
+        """
+
+        first_order = Order.objects.aggregate(first=Min("created"))["first"]
+        first_rollup = DailySales.objects.aggregate(first=Min("day"))["first"]
+        days = [day for day in (first_rollup,) if day]
+        if first_order:
+            days.append(timezone.localdate(first_order))
+        return min(days, default=None)
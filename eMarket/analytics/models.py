@@ -0,0 +1,91 @@
+from django.db import models
+from market.models import Category, Product
+
+
+class Sales(models.Model):
+    """
+    Abstract model of the sales of the paid orders created on a day.
+
+    The Sales models have the following fields:
+    - day: the day the orders were created, in the time zone of the shop
+    - revenue: the revenue of the orders
+    - units: the number of units sold
+    - orders: the number of orders
+    """
+
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ["day"]
+
+
+class DailySales(Sales):
+    """
+    DailySales model to store the sales of the whole shop on a day.
+    """
+
+    class Meta(Sales.Meta):
+        """
+        Meta class to define the constraints of the DailySales objects.
+
+        A day has one row, and the unique constraint serves the lookups by day.
+        """
+
+        constraints = [models.UniqueConstraint(fields=["day"], name="unique_sales_day")]
+        verbose_name_plural = "daily sales"
+
+
+class DailyCategorySales(Sales):
+    """
+    DailyCategorySales model to store the sales of a category on a day.
+
+    The orders of a category count every order with a product of it once.
+    """
+
+    category = models.ForeignKey(
+        Category, related_name="daily_sales", on_delete=models.CASCADE
+    )
+
+    class Meta(Sales.Meta):
+        """
+        Meta class to define the constraints of the DailyCategorySales objects.
+
+        A category has one row per day, and the unique constraint serves the
+        lookups by day.
+        """
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category"], name="unique_category_sales_day"
+            )
+        ]
+        verbose_name_plural = "daily category sales"
+
+
+class DailyProductSales(Sales):
+    """
+    DailyProductSales model to store the sales of a product on a day.
+    """
+
+    product = models.ForeignKey(
+        Product, related_name="daily_sales", on_delete=models.CASCADE
+    )
+
+    class Meta(Sales.Meta):
+        """
+        Meta class to define the constraints of the DailyProductSales objects.
+
+        A product has one row per day, and the unique constraint serves the
+        lookups by day.
+        """
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product"], name="unique_product_sales_day"
+            )
+        ]
+        verbose_name_plural = "daily product sales"
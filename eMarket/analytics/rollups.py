@@ -0,0 +1,246 @@
+"""
+Daily rollups of the sales of the paid orders.
+
+The rollups are kept up to date incrementally, the orders being added to
+them when they are paid and taken out when they are unpaid or deleted, and
+the changes to the items of paid orders being applied as they are saved
+(see analytics.signals). rebuild() recomputes them from the orders, e.g.
+after orders were paid with QuerySet.update(), which sends no signal.
+
+Revenue and units are always summed from the items, never from the totals
+stored on the orders.
+
+An order counts for the day it was created, in the time zone of the shop.
+"""
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from market.models import Product
+from orders.models import Order, OrderItem
+
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+
+def _add(model, keys, **values):
+    """
+    Add values to the counters of a rollup row, creating the row if needed.
+
+    Args:
+        model (Model): The rollup model.
+        keys (dict): The fields identifying the row.
+        **values: The amounts added to every counter.
+    """
+
+    rows = model.objects.filter(**keys)
+    increments = {name: F(name) + value for name, value in values.items()}
+
+    if not rows.update(**increments):
+        try:
+            with transaction.atomic():
+                model.objects.create(**keys, **values)
+        except IntegrityError:
+            # another order of the day created the row in the meantime
+            rows.update(**increments)
+
+
+def record_order(order, sign=1):
+    """
+    Add a paid order to the rollups of its day, or take it out.
+
+    Args:
+        order (Order): The order.
+        sign (int): 1 to add the order, -1 to take it out.
+    """
+
+    day = timezone.localdate(order.created)
+    # every rollup is summed from the stored items, not from the order in
+    # memory, whose totals are refreshed in the database as items are saved
+    lines = list(
+        OrderItem.objects.filter(order=order)
+        .values("product_id", category_id=F("product__category_id"))
+        .annotate(revenue=Sum(F("price") * F("quantity")), units=Sum("quantity"))
+        .order_by()
+    )
+    categories = defaultdict(lambda: {"revenue": Decimal(0), "units": 0})
+
+    with transaction.atomic():
+        _add(
+            DailySales,
+            {"day": day},
+            revenue=sign * sum((line["revenue"] for line in lines), Decimal(0)),
+            units=sign * sum(line["units"] for line in lines),
+            orders=sign,
+        )
+
+        for line in lines:
+            _add(
+                DailyProductSales,
+                {"day": day, "product_id": line["product_id"]},
+                revenue=sign * line["revenue"],
+                units=sign * line["units"],
+                orders=sign,
+            )
+            categories[line["category_id"]]["revenue"] += line["revenue"]
+            categories[line["category_id"]]["units"] += line["units"]
+
+        for category_id, sales in categories.items():
+            _add(
+                DailyCategorySales,
+                {"day": day, "category_id": category_id},
+                revenue=sign * sales["revenue"],
+                units=sign * sales["units"],
+                orders=sign,
+            )
+
+
+def record_item_change(item, stored_line, deleted=False):
+    """
+    Apply the change of an item of a paid order to the rollups of its day.
+
+    An order counts once for a product or a category it has several items
+    of, so the orders counters only change when the order gains its first
+    item of one or loses its last.
+
+    Args:
+        item (OrderItem): The saved or deleted item.
+        stored_line (tuple): The product ID, price and quantity the item was
+            stored with, None for a new item.
+        deleted (bool): Whether the item was deleted.
+    """
+
+    created = (
+        Order.objects.filter(pk=item.order_id, paid=True)
+        .values_list("created", flat=True)
+        .first()
+    )
+    if created is None:
+        return
+
+    lines = [(-1, stored_line), (1, None if deleted else item.line())]
+    lines = [(sign, line) for sign, line in lines if line is not None]
+    others = set(
+        OrderItem.objects.filter(order_id=item.order_id)
+        .exclude(pk=item.pk)
+        .values_list("product_id", "product__category_id")
+    )
+    categories = dict(
+        Product.objects.filter(pk__in=[line[0] for _, line in lines]).values_list(
+            "pk", "category_id"
+        )
+    )
+    changes = defaultdict(lambda: {"revenue": Decimal(0), "units": 0, "orders": 0})
+
+    for sign, (product_id, price, quantity) in lines:
+        for key, value, counted in (
+            ("product_id", product_id, {other[0] for other in others}),
+            ("category_id", categories[product_id], {other[1] for other in others}),
+            (None, None, {None}),
+        ):
+            change = changes[key, value]
+            change["revenue"] += sign * price * quantity
+            change["units"] += sign * quantity
+            if value not in counted:
+                change["orders"] += sign
+
+    tables = {
+        "product_id": DailyProductSales,
+        "category_id": DailyCategorySales,
+        None: DailySales,
+    }
+    day = timezone.localdate(created)
+    with transaction.atomic():
+        for (key, value), change in changes.items():
+            if any(change.values()):
+                keys = {"day": day, key: value} if key else {"day": day}
+                _add(tables[key], keys, **change)
+
+
+def _insert(model, rows, batch_size):
+    """
+    Stream aggregated rows into a rollup table, in batches.
+
+    Args:
+        model (Model): The rollup model.
+        rows (QuerySet): The values of the rows, named after the fields.
+        batch_size (int): Number of rows read and inserted at a time.
+    Returns:
+        int: The number of rows inserted.
+    """
+
+    batch, inserted = [], 0
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(model(**row))
+        if len(batch) == batch_size:
+            model.objects.bulk_create(batch)
+            inserted += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return inserted + len(batch)
+
+
+def rebuild(start, end, batch_size=1000):
+    """
+    Recompute the rollups of a range of days, in one transaction.
+
+    Args:
+        start (date): The first day.
+        end (date): The day after the last one.
+        batch_size (int): Number of rows read and inserted at a time.
+    Returns:
+        int: The number of rollup rows written.
+    """
+
+    lower, upper = (
+        timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        for day in (start, end)
+    )
+    orders = Order.objects.filter(paid=True, created__gte=lower, created__lt=upper)
+    items = OrderItem.objects.filter(
+        order__paid=True, order__created__gte=lower, order__created__lt=upper
+    ).annotate(day=TruncDate("order__created"))
+    item_totals = {
+        "revenue": Sum(F("price") * F("quantity")),
+        "units": Sum("quantity"),
+        "orders": Count("order", distinct=True),
+    }
+
+    with transaction.atomic():
+        for model in (DailySales, DailyCategorySales, DailyProductSales):
+            model.objects.filter(day__gte=start, day__lt=end).delete()
+
+        return (
+            _insert(
+                DailySales,
+                orders.annotate(day=TruncDate("created"))
+                .values("day")
+                .annotate(
+                    revenue=Coalesce(
+                        Sum(F("items__price") * F("items__quantity")),
+                        Decimal(0),
+                        output_field=DailySales._meta.get_field("revenue"),
+                    ),
+                    units=Coalesce(Sum("items__quantity"), 0),
+                    orders=Count("id", distinct=True),
+                )
+                .order_by(),
+                batch_size,
+            )
+            + _insert(
+                DailyCategorySales,
+                items.values("day", category_id=F("product__category_id"))
+                .annotate(**item_totals)
+                .order_by(),
+                batch_size,
+            )
+            + _insert(
+                DailyProductSales,
+                items.values("day", "product_id").annotate(**item_totals).order_by(),
+                batch_size,
+            )
+        )
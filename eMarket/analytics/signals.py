@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from orders.models import Order, OrderItem
+
+from .rollups import record_item_change, record_order
+
+
+@receiver(post_save, sender=Order)
+def record_payment(sender, instance, raw, **kwargs):
+    """
+    Add an order to the rollups when it is paid, take it out when unpaid.
+
+    The rollups are updated in the transaction saving the order, with the
+    items stored then; the items saved afterwards, e.g. by the admin in the
+    same request, are applied by record_item().
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Order): The saved order.
+        raw (bool): Whether the order is saved as loaded from a fixture.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    # new orders were stored unpaid, None if the paid field was deferred
+    stored_paid = getattr(instance, "stored_paid", False)
+    if raw or stored_paid is None or stored_paid == instance.paid:
+        return
+
+    record_order(instance, 1 if instance.paid else -1)
+
+
+@receiver(pre_delete, sender=Order)
+def forget_order(sender, instance, **kwargs):
+    """
+    Take a paid order out of the rollups before it and its items are deleted.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Order): The deleted order.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    if getattr(instance, "stored_paid", instance.paid):
+        record_order(instance, -1)
+        # the items deleted with the order are no longer counted
+        Order.objects.filter(pk=instance.pk).update(paid=False)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def record_item(sender, instance, raw=False, created=False, **kwargs):
+    """
+    Apply the changes to the items of a paid order to the rollups.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (OrderItem): The saved or deleted item.
+        raw (bool): Whether the item is saved as loaded from a fixture.
+        created (bool): Whether the item was just created.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    stored_line = None if created else getattr(instance, "stored_line", None)
+    if raw or (stored_line is None and not created):
+        return
+
+    record_item_change(instance, stored_line, deleted=kwargs["signal"] is post_delete)
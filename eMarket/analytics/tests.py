@@ -0,0 +1,197 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from monitoring.testing import ORDER_DATA, CatalogQueryBudgetMixin, create_catalog
+from orders.models import Order, OrderItem
+
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+
+def rollups():
+    """Get the rows of every rollup, without their IDs."""
+
+    fields = ["day", "revenue", "units", "orders"]
+    return (
+        list(DailySales.objects.values_list(*fields)),
+        list(DailyCategorySales.objects.values_list("category", *fields)),
+        list(
+            DailyProductSales.objects.order_by("product").values_list(
+                "product", *fields
+            )
+        ),
+    )
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_catalog(products=3)
+
+    def create_order(self, *products):
+        order = Order.objects.create(**ORDER_DATA)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=product, price=product.price, quantity=2)
+                for product in products
+            ]
+        )
+        Order.objects.filter(pk=order.pk).refresh_totals()
+        return Order.objects.get(pk=order.pk)
+
+    def pay(self, order, paid=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.paid = paid
+            order.save()
+
+    def test_paid_orders_are_rolled_up(self):
+        self.pay(self.create_order(*self.products[1:]))
+        order = self.create_order(self.products[1])
+        self.pay(order)
+        # saving a paid order again does not count it twice
+        self.pay(order)
+        self.create_order(self.products[2])
+
+        day = DailySales.objects.get()
+        self.assertEqual((day.revenue, day.units, day.orders), (8000, 6, 2))
+        self.assertEqual(DailyCategorySales.objects.get().orders, 2)
+        self.assertEqual(
+            list(
+                DailyProductSales.objects.order_by("-orders").values_list(
+                    "orders", "units"
+                )
+            ),
+            [(2, 4), (1, 2)],
+        )
+
+    def test_unpaid_and_deleted_orders_are_taken_out(self):
+        first = self.create_order(self.products[1])
+        second = self.create_order(self.products[2])
+        self.pay(first)
+        self.pay(second)
+
+        self.pay(first, paid=False)
+        Order.objects.get(pk=second.pk).delete()
+
+        self.assertEqual(DailySales.objects.get().orders, 0)
+        self.assertEqual(
+            set(DailyProductSales.objects.values_list("units", flat=True)), {0}
+        )
+
+    def test_admin_pays_and_edits_an_order_in_one_save(self):
+        order = self.create_order(self.products[1])
+        item = order.items.get()
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "admin")
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("admin:orders_order_change", args=[order.pk]),
+                {
+                    **ORDER_DATA,
+                    "paid": "on",
+                    "items-TOTAL_FORMS": "1",
+                    "items-INITIAL_FORMS": "1",
+                    "items-MIN_NUM_FORMS": "0",
+                    "items-MAX_NUM_FORMS": "1000",
+                    "items-0-id": item.pk,
+                    "items-0-order": order.pk,
+                    "items-0-price": "1000",
+                    "items-0-quantity": "5",
+                },
+            )
+
+        self.assertEqual(response.status_code, 302)
+        shop = DailySales.objects.get()
+        product = DailyProductSales.objects.get()
+        self.assertEqual((shop.revenue, shop.units), (5000, 5))
+        self.assertEqual((product.revenue, product.units), (5000, 5))
+        self.assertEqual(DailyCategorySales.objects.get().units, 5)
+
+    def test_item_changes_of_paid_orders_are_rolled_up(self):
+        order = self.create_order(self.products[1])
+        self.pay(order)
+
+        item = order.items.get()
+        item.quantity = 5
+        item.save()
+        self.assertEqual(
+            DailySales.objects.values_list("revenue", "units").get(), (5000, 5)
+        )
+
+        # a second product of the same category counts the order once
+        OrderItem.objects.create(order=order, product=self.products[2], price=2000)
+        category = DailyCategorySales.objects.get()
+        self.assertEqual(
+            (category.revenue, category.units, category.orders), (7000, 6, 1)
+        )
+
+        item.delete()
+        self.assertEqual(
+            {
+                sales.product_id: (sales.units, sales.orders)
+                for sales in DailyProductSales.objects.all()
+            },
+            {self.products[1].pk: (0, 0), self.products[2].pk: (1, 1)},
+        )
+        self.assertEqual(DailyCategorySales.objects.get().orders, 1)
+
+        self.pay(Order.objects.get(pk=order.pk), paid=False)
+        self.assertEqual(
+            set(DailySales.objects.values_list("revenue", "units")), {(0, 0)}
+        )
+        self.assertEqual(
+            set(DailyProductSales.objects.values_list("revenue", "units")), {(0, 0)}
+        )
+
+    def test_items_of_unpaid_orders_are_not_rolled_up(self):
+        order = self.create_order(self.products[1])
+        item = order.items.get()
+        item.quantity = 5
+        item.save()
+        item.delete()
+
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        self.pay(self.create_order(*self.products))
+        self.pay(self.create_order(self.products[1]))
+        self.create_order(self.products[2])
+        expected = rollups()
+
+        Order.objects.update(paid=True)
+        Order.objects.filter(item_count=2, items__product=self.products[2]).update(
+            paid=False
+        )
+        DailySales.objects.update(revenue=0)
+        call_command("rebuild_rollups", days=1, batch_size=1, stdout=StringIO())
+
+        self.assertEqual(rollups(), expected)
+
+
+class DashboardQueryBudgetTests(CatalogQueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for product in cls.products:
+            order = Order.objects.create(**ORDER_DATA)
+            OrderItem.objects.create(order=order, product=product, price=product.price)
+        Order.objects.update(paid=True)
+        call_command("rebuild_rollups", stdout=StringIO())
+        cls.staff = User.objects.create_user("staff", is_staff=True)
+
+    def test_dashboard(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("analytics:dashboard"))
+
+        self.assertEqual(response.context["orders"], 10)
+        self.assertEqual(len(response.context["products"]), 10)
+        self.assertWithinQueryBudget(response)
+
+    def test_dashboard_is_staff_only(self):
+        response = self.client.get(reverse("analytics:dashboard"))
+
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Sum
+from django.shortcuts import render
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+# the periods the dashboard offers, in days
+PERIODS = [7, 30, 90, 365]
+
+# number of best selling products shown
+TOP_PRODUCTS = 20
+
+
+@staff_member_required
+def dashboard(request):
+    """
+    Display the sales of a period, read from the daily rollups only.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        HttpResponse: The response object.
+    """
+
+    try:
+        days = int(request.GET.get("days", 30))
+    except ValueError:
+        days = 30
+    if days not in PERIODS:
+        days = 30
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    totals = {"revenue": Sum("revenue"), "units": Sum("units"), "orders": Sum("orders")}
+
+    daily = list(DailySales.objects.filter(day__gte=since))
+    categories = (
+        DailyCategorySales.objects.filter(day__gte=since)
+        .values("category__name")
+        .annotate(**totals)
+        .order_by("-revenue")
+    )
+    products = (
+        DailyProductSales.objects.filter(day__gte=since)
+        .values("product__name")
+        .annotate(**totals)
+        .order_by("-revenue")[:TOP_PRODUCTS]
+    )
+
+    return render(
+        request,
+        "analytics/dashboard.html",
+        {
+            "days": days,
+            "periods": PERIODS,
+            "since": since,
+            "daily": daily,
+            "revenue": sum(row.revenue for row in daily),
+            "units": sum(row.units for row in daily),
+            "orders": sum(row.orders for row in daily),
+            "categories": categories,
+            "products": products,
+        },
+    )
@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.urls import reverse
+from monitoring.testing import CatalogQueryBudgetMixin
+
+from .views import DEFAULT_PRODUCT_FIELDS
+
+
+class ApiQueryBudgetTests(CatalogQueryBudgetMixin, TestCase):
+    def test_category_list(self):
+        response = self.client.get(reverse("api:category_list"))
+
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertWithinQueryBudget(response)
+
+    def test_product_list(self):
+        response = self.client.get(reverse("api:product_list") + "?fields=id,image")
+
+        self.assertEqual(len(response.json()["results"]), len(self.products))
+        self.assertWithinQueryBudget(response)
+
+    def test_product_detail(self):
+        response = self.client.get(
+            reverse("api:product_detail", args=[self.products[0].id])
+        )
+
+        self.assertEqual(response.json()["name"], "Phone 0")
+        self.assertWithinQueryBudget(response)
+
+    def test_product_export(self):
+        response = self.client.get(reverse("api:product_export"))
+
+        self.assertEqual(
+            b"".join(response.streaming_content).count(b"\n"), len(self.products)
+        )
+        self.assertWithinQueryBudget(response)
+
+
+class ApiTests(CatalogQueryBudgetMixin, TestCase):
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(f"api:{name}", args=args), params)
+
+    def test_fields_selection(self):
+        response = self.get("product_list", fields="name,price", limit=3)
+
+        self.assertEqual(
+            response.json()["results"][0], {"name": "Phone 0", "price": "0.00"}
+        )
+        product = self.get("product_detail", self.products[1].id, fields="url")
+        self.assertEqual(product.json(), {"url": self.products[1].get_absolute_url()})
+
+    def test_default_fields(self):
+        result = self.get("product_list").json()["results"][0]
+
+        self.assertEqual(list(result), DEFAULT_PRODUCT_FIELDS)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"fields": "name,secret"},
+            {"fields": ","},
+            {"sort": "price"},
+            {"limit": "0"},
+            {"limit": "many"},
+            {"cursor": "not-a-cursor"},
+        ):
+            response = self.get("product_list", **params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+    def test_cursor_links(self):
+        first = self.get("product_list", fields="name", limit=4).json()
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(
+            [result["name"] for result in second["results"]],
+            [f"Phone {i}" for i in range(4, 8)],
+        )
+        self.assertEqual(self.client.get(second["previous"]).json(), first)
+
+    def test_etag(self):
+        response = self.get("product_list")
+        etag = response["ETag"]
+
+        not_modified = self.client.get(
+            reverse("api:product_list"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertNotEqual(self.get("product_list", sort="newest")["ETag"], etag)
+
+        self.products[0].name = "Renamed phone"
+        self.products[0].save()
+        response = self.client.get(reverse("api:product_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["name"], "Phone 1")
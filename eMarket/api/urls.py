@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+app_name = "api"
+
+urlpatterns = [
+    path("categories/", views.category_list, name="category_list"),
+    path("products/", views.product_list, name="product_list"),
+    path("products/export.ndjson", views.product_export, name="product_export"),
+    path("products/<uuid:id>/", views.product_detail, name="product_detail"),
+]
@@ -0,0 +1,293 @@
+import hashlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_GET
+from market.cache import cached_product, catalog_version
+from market.models import Category, Product
+from market.pagination import InvalidCursor, KeysetPaginator
+from market.storage import content_addressed_storage
+from market.views import PRODUCT_ORDERINGS
+
+
+def image_url(product):
+    derivative = product.derivatives.get("card")
+    if derivative:
+        return content_addressed_storage.url(derivative["jpg"])
+    return product.image.url if product.image else None
+
+
+# the fields a client may select with ?fields=, mapped to the model fields
+# they need and to their value
+CATEGORY_FIELDS = {
+    "id": (["id"], lambda category: category.id),
+    "name": (["name"], lambda category: category.name),
+    "identifier": (["identifier"], lambda category: category.identifier),
+    "url": (["identifier"], lambda category: category.get_absolute_url()),
+}
+
+PRODUCT_FIELDS = {
+    "id": (["id"], lambda product: product.id),
+    "category": (["category"], lambda product: product.category_id),
+    "name": (["name"], lambda product: product.name),
+    "identifier": (["identifier"], lambda product: product.identifier),
+    "description": (["description"], lambda product: product.description),
+    "price": (["price"], lambda product: product.price),
+    "available": (["available"], lambda product: product.available),
+    "created": (["created"], lambda product: product.created),
+    "updated": (["updated"], lambda product: product.updated),
+    "url": (["identifier"], lambda product: product.get_absolute_url()),
+    "image": (["image", "derivatives"], image_url),
+}
+
+# fields selected when ?fields= is not given
+DEFAULT_PRODUCT_FIELDS = [
+    "id",
+    "category",
+    "name",
+    "identifier",
+    "price",
+    "available",
+    "url",
+    "image",
+]
+
+
+class BadRequest(ValueError):
+    """Raised when the query parameters of an API request are invalid."""
+
+
+def select_fields(request, fields, default=None):
+    """
+    Get the fields selected by the ?fields= parameter of a request.
+
+    Args:
+        request (HttpRequest): The request object.
+        fields (dict): The selectable fields.
+        default (list): The fields selected without ?fields=, all if None.
+    Returns:
+        list: The names of the selected fields.
+    Raises:
+        BadRequest: If an unknown field is selected.
+    """
+
+    if "fields" not in request.GET:
+        return list(default or fields)
+
+    selected = [name for name in request.GET["fields"].split(",") if name]
+    unknown = [name for name in selected if name not in fields]
+    if unknown or not selected:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown) or '(none)'}.")
+    return selected
+
+
+def only_fields(fields, selected):
+    """
+    Get the model fields needed to serialize the selected fields.
+
+    Args:
+        fields (dict): The selectable fields.
+        selected (list): The names of the selected fields.
+    Returns:
+        set: The model fields to load.
+    """
+
+    return {"id"}.union(*(fields[name][0] for name in selected))
+
+
+def serialize(obj, fields, selected):
+    return {name: fields[name][1](obj) for name in selected}
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Compute the ETag of an API response.
+
+    Responses only change with the catalog, so the ETag is derived from the
+    catalog version and the full path, and unchanged responses are answered
+    with 304 Not Modified before any query runs.
+
+    Args:
+        request (HttpRequest): The request object.
+        *args: Variable length argument list.
+        **kwargs: Arbitrary keyword arguments.
+    Returns:
+        str: The ETag.
+    """
+
+    key = f"{catalog_version()}:{request.get_full_path()}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def filter_products(request, products):
+    """
+    Apply the ?category= filter of a request to products.
+
+    Args:
+        request (HttpRequest): The request object.
+        products (QuerySet): The products.
+    Returns:
+        QuerySet: The filtered products.
+    """
+
+    if request.GET.get("category"):
+        category = get_object_or_404(Category, identifier=request.GET["category"])
+        products = products.filter(category=category)
+    return products
+
+
+@require_GET
+@condition(etag_func=catalog_etag)
+def category_list(request):
+    """
+    List the categories.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        JsonResponse: The categories, under "results".
+    """
+
+    try:
+        selected = select_fields(request, CATEGORY_FIELDS)
+    except BadRequest as e:
+        return error(str(e))
+
+    categories = Category.objects.only(*only_fields(CATEGORY_FIELDS, selected))
+    return JsonResponse(
+        {
+            "results": [
+                serialize(category, CATEGORY_FIELDS, selected)
+                for category in categories
+            ]
+        }
+    )
+
+
+@require_GET
+@condition(etag_func=catalog_etag)
+def product_list(request):
+    """
+    List the available products, a page at a time.
+
+    Query parameters: fields, category, sort ("name" or "newest"), limit
+    (at most settings.API_MAX_PAGE_SIZE) and cursor, as given by the "next"
+    and "previous" links of the previous page.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        JsonResponse: The products under "results", and the "next" and
+            "previous" page links.
+    """
+
+    try:
+        selected = select_fields(request, PRODUCT_FIELDS, DEFAULT_PRODUCT_FIELDS)
+        sort = request.GET.get("sort", "name")
+        if sort not in PRODUCT_ORDERINGS:
+            raise BadRequest(f"Unknown sort: {sort}.")
+        limit = request.GET.get("limit", str(settings.PRODUCTS_PER_PAGE))
+        if not limit.isdigit() or not 0 < int(limit) <= settings.API_MAX_PAGE_SIZE:
+            raise BadRequest(
+                f"limit must be between 1 and {settings.API_MAX_PAGE_SIZE}."
+            )
+    except BadRequest as e:
+        return error(str(e))
+
+    ordering = PRODUCT_ORDERINGS[sort]
+    needed = only_fields(PRODUCT_FIELDS, selected) | {ordering.lstrip("-")}
+    products = filter_products(
+        request, Product.objects.filter(available=True).only(*needed)
+    )
+
+    paginator = KeysetPaginator(products, ordering, int(limit))
+    try:
+        page = paginator.get_page(request.GET.get("cursor"))
+    except InvalidCursor:
+        return error("Invalid cursor.")
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        query = request.GET.copy()
+        query["cursor"] = cursor
+        return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    return JsonResponse(
+        {
+            "results": [
+                serialize(product, PRODUCT_FIELDS, selected) for product in page
+            ],
+            "next": link(page.next_cursor),
+            "previous": link(page.previous_cursor),
+        }
+    )
+
+
+@require_GET
+@condition(etag_func=catalog_etag)
+def product_detail(request, id):
+    """
+    Get an available product, read through the catalog cache.
+
+    Args:
+        request (HttpRequest): The request object.
+        id (UUID): The product ID.
+    Returns:
+        JsonResponse: The product.
+    """
+
+    try:
+        selected = select_fields(request, PRODUCT_FIELDS)
+    except BadRequest as e:
+        return error(str(e))
+
+    product = cached_product(id)
+    if product is None or not product.available:
+        raise Http404("No product matches the given query.")
+
+    return JsonResponse(serialize(product, PRODUCT_FIELDS, selected))
+
+
+@require_GET
+@condition(etag_func=catalog_etag)
+def product_export(request):
+    """
+    Export every available product as newline-delimited JSON.
+
+    The rows are read from a server-side cursor in chunks and streamed as
+    they are serialized, so a dump of the whole catalog runs in constant
+    memory. Accepts the fields and category query parameters.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        StreamingHttpResponse: One JSON product per line.
+    """
+
+    try:
+        selected = select_fields(request, PRODUCT_FIELDS, DEFAULT_PRODUCT_FIELDS)
+    except BadRequest as e:
+        return error(str(e))
+
+    products = filter_products(
+        request,
+        Product.objects.filter(available=True)
+        .only(*only_fields(PRODUCT_FIELDS, selected))
+        .order_by(),
+    )
+
+    def lines():
+        encoder = DjangoJSONEncoder(separators=(",", ":"))
+        for product in products.iterator(chunk_size=settings.API_EXPORT_CHUNK_SIZE):
+            yield encoder.encode(serialize(product, PRODUCT_FIELDS, selected)) + "\n"
+
+    response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+    response["Content-Disposition"] = 'attachment; filename="products.ndjson"'
+    return response
@@ -1,6 +1,97 @@
+from dataclasses import dataclass
 from decimal import Decimal
-from django.conf import settings
+from functools import cached_property
 from market.models import Product
+from .forms import CartAddProductForm
+from .storage import get_cart_storage
+
+# the product columns rendered with a cart, the rest is never loaded
+SNAPSHOT_FIELDS = [
+    "id",
+    "name",
+    "identifier",
+    "image",
+    "derivatives",
+    "price",
+    "price_version",
+]
+
+
+@dataclass(frozen=True)
+class CartItem:
+    """
+    An immutable line of a hydrated cart.
+
+    Attributes:
+        product (Product): The product.
+        quantity (int): The quantity of the product.
+        price (Decimal): The unit price of the product when it was added.
+        total_price (Decimal): The price of the line.
+        stale (bool): Whether the price of the product changed since.
+    """
+
+    product: Product
+    quantity: int
+    price: Decimal
+    total_price: Decimal
+    stale: bool = False
+
+    @cached_property
+    def update_quantity_form(self):
+        """
+        The form changing the quantity of the line.
+
+        Returns:
+            CartAddProductForm: The form.
+        """
+
+        return CartAddProductForm(
+            initial={"quantity": self.quantity, "update_quantity": True}
+        )
+
+
+class CartSnapshot:
+    """
+    The lines of a cart joined with their products.
+
+    Attributes:
+        items (tuple): The CartItem of every line.
+        total_price (Decimal): The total price of the cart.
+    """
+
+    def __init__(self, lines):
+        """Load the products of the lines with a single query.
+
+        Args:
+            lines (dict): The lines of the cart.
+        Returns:
+            None
+        """
+
+        products = Product.objects.filter(id__in=lines.keys()).only(*SNAPSHOT_FIELDS)
+        items = []
+
+        for product in products:
+            line = lines[str(product.id)]
+            price = Decimal(line["price"])
+            items.append(
+                CartItem(
+                    product,
+                    line["quantity"],
+                    price,
+                    price * line["quantity"],
+                    stale=line.get("version") != product.price_version,
+                )
+            )
+
+        self.items = tuple(items)
+        self.total_price = sum((item.total_price for item in items), Decimal(0))
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
 
 
 class Cart:
@@ -13,14 +104,41 @@ class Cart:
             None
         """
 
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
+        self.request = request
+        self.storage = get_cart_storage(request)
 
-        if not cart:
-            self.session[settings.CART_SESSION_ID] = {}
-            cart = self.session[settings.CART_SESSION_ID]
+    @property
+    def key(self):
+        """
+        The key identifying the cart in its storage.
 
-        self.cart = cart
+        Returns:
+            str: The key of the cart.
+        """
+
+        return self.storage.key
+
+    @property
+    def has_key(self):
+        """
+        Whether the cart has a key yet, i.e. was ever changed.
+
+        Returns:
+            bool: Whether the cart has a key.
+        """
+
+        return self.storage.has_key
+
+    @property
+    def cart(self):
+        """
+        The lines of the cart, loaded from the storage on first access.
+
+        Returns:
+            dict: The lines of the cart.
+        """
+
+        return self.storage.load()
 
     def add(self, product, quantity=1, update_quantity=False):
         """Add a product to the cart or update its quantity.
@@ -33,22 +151,19 @@ class Cart:
             None
         """
 
-        product_id = str(product.id)
-
-        if product_id not in self.cart:
-            self.cart[product_id] = {"quantity": 0, "price": str(product.price)}
-
-        if update_quantity:
-            self.cart[product_id]["quantity"] = quantity
-        else:
-            self.cart[product_id]["quantity"] += quantity
-
-        self.save()
+        self.storage.add(
+            str(product.id),
+            quantity,
+            str(product.price),
+            update_quantity,
+            version=product.price_version,
+        )
+        self.invalidate()
 
     def save(self):
         """Save the cart."""
 
-        self.session.modified = True
+        self.storage.save()
 
     def remove(self, product):
         """Remove a product from the cart.
@@ -57,32 +172,66 @@ class Cart:
             product (Product): The product to remove.
         """
 
-        product_id = str(product.id)
+        self.storage.remove(str(product.id))
+        self.invalidate()
 
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+    def snapshot(self):
+        """
+        Get the cart joined with its products.
 
-    def __iter__(self):
+        The snapshot is loaded with a single query and shared by every Cart
+        of the request until the cart changes.
+
+        Returns:
+            CartSnapshot: The hydrated cart.
         """
-        Iterate over the items in the cart and get the products from the database.
 
-        Yields:
-            dict: The product information.
+        snapshot = getattr(self.request, "_cart_snapshot", None)
+        if snapshot is None:
+            snapshot = self.request._cart_snapshot = CartSnapshot(self.cart)
+        return snapshot
+
+    def reprice(self):
         """
+        Reprice the lines whose product changed price since they were added.
 
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
+        The price versions come with the snapshot, so only stale lines are
+        written, in a single batch.
+
+        Returns:
+            list: The CartItem, as they were, whose price changed.
+        """
 
-        cart = self.cart.copy()
+        stale = [item for item in self.snapshot() if item.stale]
+        if not stale:
+            return []
+
+        self.storage.reprice(
+            {
+                str(item.product.id): (
+                    str(item.product.price),
+                    item.product.price_version,
+                )
+                for item in stale
+            }
+        )
+        self.invalidate()
+        return [item for item in stale if item.price != item.product.price]
 
-        for product in products:
-            cart[str(product.id)]["product"] = product
+    def invalidate(self):
+        """Drop the snapshot of the cart after it changed."""
 
-        for item in cart.values():
-            item["price"] = Decimal(item["price"])
-            item["total_price"] = item["price"] * item["quantity"]
-            yield item
+        self.request.__dict__.pop("_cart_snapshot", None)
+
+    def __iter__(self):
+        """
+        Iterate over the items in the cart joined with their products.
+
+        Yields:
+            CartItem: The items of the cart.
+        """
+
+        return iter(self.snapshot())
 
     def __len__(self):
         """
@@ -102,14 +251,12 @@ class Cart:
             Decimal: The total price of the items in the cart.
         """
 
-        return sum(
-            Decimal(item["price"]) * item["quantity"] for item in self.cart.values()
-        )
+        return self.snapshot().total_price
 
     def clear(self):
         """
-        Remove the cart from the session.
+        Remove the cart from its storage.
         """
 
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        self.storage.clear()
+        self.invalidate()
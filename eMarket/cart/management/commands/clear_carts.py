@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.models import CartLine
+from inventory.stock import sweep_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the expired sessions, the cart lines of DatabaseCartStorage "
+        "not changed for SESSION_COOKIE_AGE, whose session expired with them, "
+        "and release the expired stock reservations. Run it periodically, "
+        "e.g. daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of rows deleted per query.",
+        )
+
+    def handle(self, *args, **options):
+        call_command("clearsessions")
+
+        cutoff = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        stale = CartLine.objects.filter(updated__lt=cutoff)
+        deleted = 0
+        while True:
+            # small deletes, so the lines of active carts are never locked long
+            ids = list(stale.values_list("id", flat=True)[: options["batch_size"]])
+            if not ids:
+                break
+            deleted += CartLine.objects.filter(id__in=ids).delete()[0]
+
+        released = sweep_expired(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} cart lines, released {released} reservations."
+            )
+        )
@@ -0,0 +1,64 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django.utils.module_loading import import_string
+
+from cart.storage import SessionCartStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the carts kept in sessions to the storage configured by "
+        "CART_STORAGE. Carts not moved by this command are moved lazily the "
+        "next time their owner visits the shop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of sessions read from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        storage_class = import_string(settings.CART_STORAGE)
+        if issubclass(storage_class, SessionCartStorage):
+            raise CommandError("CART_STORAGE already keeps carts in sessions.")
+        if storage_class.persists_on_response:
+            raise CommandError(
+                "CART_STORAGE keeps carts in cookies, which only a response to "
+                "their owner can set, the carts are moved lazily."
+            )
+
+        engine = import_module(settings.SESSION_ENGINE)
+        if not hasattr(engine.SessionStore, "get_model_class"):
+            raise CommandError(
+                "Only sessions kept in the database can be migrated, the other "
+                "carts are moved lazily."
+            )
+
+        sessions = engine.SessionStore.get_model_class().objects.all()
+        moved = 0
+
+        for row in sessions.iterator(chunk_size=options["batch_size"]):
+            session = engine.SessionStore(session_key=row.session_key)
+            lines = session.get(settings.CART_SESSION_ID)
+            if not lines:
+                continue
+
+            request = HttpRequest()
+            request.session = session
+            storage = storage_class(request)
+            storage.import_lines(lines)
+            # the session keeps the cart until it is read back from the storage
+            if not set(lines) <= set(storage_class(request).read()):
+                self.stderr.write(f"Could not move the cart of {row.session_key}.")
+                continue
+            del session[settings.CART_SESSION_ID]
+            session.save()
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} carts."))
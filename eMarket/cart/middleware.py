@@ -0,0 +1,14 @@
+from django.utils.deprecation import MiddlewareMixin
+
+
+class CartCookieMiddleware(MiddlewareMixin):
+    """
+    Writes the cart cookie of the requests whose cart is kept by
+    CookieCartStorage and changed.
+    """
+
+    def process_response(self, request, response):
+        storage = getattr(request, "cart_cookie_storage", None)
+        if storage is not None:
+            storage.update_response(response)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartline',
+            name='price_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,46 @@
 from django.db import models
+from market.models import Product
 
-# Create your models here.
+
+class CartLine(models.Model):
+    """
+    CartLine model to store a line of a cart kept in the database.
+
+    The CartLine model has the following fields:
+    - cart_key: the key identifying the cart, stored in the session
+    - product: a foreign key to the Product model
+    - quantity: the quantity of the product in the cart
+    - price: the price of the product when it was added to the cart
+    - price_version: the price version of the product for that price, None
+      for lines added before price versions
+    - updated: the date and time the line was last updated
+    """
+
+    cart_key = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product, related_name="cart_lines", on_delete=models.CASCADE
+    )
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    price_version = models.PositiveIntegerField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """
+        Meta class to define the constraints and indexes of the CartLine objects.
+
+        A product appears at most once per cart, and the unique constraint
+        also serves the lookups of a cart's lines by its key.
+        """
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart_key", "product"], name="unique_cart_line"
+            ),
+        ]
+
+    def __str__(self):
+        """
+        Method to return a string representation of the CartLine object.
+        """
+        return f"{self.cart_key}: {self.product_id} x {self.quantity}"
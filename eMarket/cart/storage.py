@@ -0,0 +1,465 @@
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils.module_loading import import_string
+
+from .models import CartLine
+
+
+def get_cart_storage(request):
+    """
+    Get the cart storage configured by settings.CART_STORAGE.
+
+    A cart still kept in the session by SessionCartStorage is moved to the
+    configured storage the first time it is accessed.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        BaseCartStorage: The cart storage of the request.
+    """
+
+    storage = import_string(settings.CART_STORAGE)(request)
+
+    if not isinstance(storage, SessionCartStorage):
+        legacy = request.session.get(settings.CART_SESSION_ID)
+        if legacy:
+            storage.import_lines(legacy)
+            del request.session[settings.CART_SESSION_ID]
+
+    return storage
+
+
+class BaseCartStorage:
+    """
+    Interface of the storages a cart can be kept in.
+
+    A cart is a mapping of product IDs (as strings) to lines, every line
+    being a dict holding the "quantity" and the "price" (as a string) of the
+    product when it was added, and the "version" of that price (see
+    Product.price_version).
+    """
+
+    # whether the cart is written to the response, by update_response(), so
+    # that only requests of its owner can change it
+    persists_on_response = False
+
+    def __init__(self, request):
+        """Initialize the storage.
+
+        Args:
+            request (HttpRequest): The request object.
+        Returns:
+            None
+        """
+
+        self.request = request
+        self.session = request.session
+        self._lines = None
+
+    @property
+    def key(self):
+        """
+        The key identifying the cart, created on first access.
+
+        Returns:
+            str: The key of the cart.
+        """
+
+        key = self.session.get(settings.CART_KEY_SESSION_ID)
+        if key is None:
+            key = secrets.token_urlsafe(24)
+            self.session[settings.CART_KEY_SESSION_ID] = key
+        return key
+
+    @property
+    def has_key(self):
+        return settings.CART_KEY_SESSION_ID in self.session
+
+    def load(self):
+        """
+        Load the lines of the cart, at most once per storage instance.
+
+        Returns:
+            dict: The lines of the cart.
+        """
+
+        if self._lines is None:
+            self._lines = self.read() if self.has_key else {}
+        return self._lines
+
+    def read(self):
+        """Read the lines of the cart from the storage."""
+
+        raise NotImplementedError
+
+    def add(self, product_id, quantity, price, update_quantity=False, version=None):
+        """
+        Add a line or change its quantity.
+
+        Args:
+            product_id (str): The product ID.
+            quantity (int): The quantity to add, or the new quantity.
+            price (str): The price of the product, kept if the line exists.
+            update_quantity (bool): A flag to replace the quantity.
+            version (int): The version of the price, kept with it.
+        """
+
+        raise NotImplementedError
+
+    def reprice(self, prices):
+        """
+        Replace the price of lines, all at once.
+
+        Args:
+            prices (dict): The new price (as a string) and price version of
+                every repriced product ID.
+        """
+
+        lines = self.load()
+        for product_id, (price, version) in prices.items():
+            if product_id in lines:
+                lines[product_id].update(price=price, version=version)
+        self.save()
+
+    def remove(self, product_id):
+        """
+        Remove a line.
+
+        Args:
+            product_id (str): The product ID.
+        """
+
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every line of the cart."""
+
+        raise NotImplementedError
+
+    def import_lines(self, lines):
+        """
+        Add the lines of a cart kept in another storage.
+
+        Args:
+            lines (dict): The lines to add.
+        """
+
+        for product_id, line in lines.items():
+            self.add(
+                product_id,
+                line["quantity"],
+                line["price"],
+                version=line.get("version"),
+            )
+
+    def save(self):
+        """Persist the pending changes of the cart, if the storage needs to."""
+
+    def _apply(self, product_id, quantity, price, update_quantity, version):
+        lines = self.load()
+        line = lines.setdefault(
+            product_id, {"quantity": 0, "price": price, "version": version}
+        )
+        if update_quantity:
+            line["quantity"] = quantity
+        else:
+            line["quantity"] += quantity
+
+
+class SessionCartStorage(BaseCartStorage):
+    """
+    Keeps the cart inside the session.
+
+    Every change rewrites the whole session.
+    """
+
+    @property
+    def key(self):
+        if self.session.session_key is None:
+            self.session.save()
+        return self.session.session_key
+
+    @property
+    def has_key(self):
+        return self.session.session_key is not None
+
+    def load(self):
+        # an empty cart is not written to the session, so browsing the shop
+        # creates no session until something is added to the cart
+        if self._lines is None:
+            self._lines = self.session.get(settings.CART_SESSION_ID, {})
+        return self._lines
+
+    def add(self, product_id, quantity, price, update_quantity=False, version=None):
+        self._apply(product_id, quantity, price, update_quantity, version)
+        self.save()
+
+    def remove(self, product_id):
+        lines = self.load()
+        if product_id in lines:
+            del lines[product_id]
+            self.save()
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self._lines = {}
+
+    def save(self):
+        self.session[settings.CART_SESSION_ID] = self.load()
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """
+    Keeps the cart in the CartLine table.
+
+    Only the key of the cart is kept in the session, written once. Every
+    change is a single-row upsert or delete.
+    """
+
+    def read(self):
+        rows = CartLine.objects.filter(cart_key=self.key).values_list(
+            "product_id", "quantity", "price", "price_version"
+        )
+        return {
+            str(product_id): {
+                "quantity": quantity,
+                "price": str(price),
+                "version": version,
+            }
+            for product_id, quantity, price, version in rows
+        }
+
+    def add(self, product_id, quantity, price, update_quantity=False, version=None):
+        lines = CartLine.objects.filter(cart_key=self.key, product_id=product_id)
+        new_quantity = quantity if update_quantity else F("quantity") + quantity
+
+        if not lines.update(quantity=new_quantity):
+            try:
+                with transaction.atomic():
+                    CartLine.objects.create(
+                        cart_key=self.key,
+                        product_id=product_id,
+                        quantity=quantity,
+                        price=price,
+                        price_version=version,
+                    )
+            except IntegrityError:
+                # another request created the line in the meantime
+                lines.update(quantity=new_quantity)
+
+        if self._lines is not None:
+            self._apply(product_id, quantity, price, update_quantity, version)
+
+    def reprice(self, prices):
+        # a single UPDATE for every repriced line
+        CartLine.objects.filter(cart_key=self.key, product_id__in=prices).update(
+            price=Case(
+                *(
+                    When(product_id=product_id, then=Value(Decimal(price)))
+                    for product_id, (price, _) in prices.items()
+                ),
+                output_field=CartLine._meta.get_field("price"),
+            ),
+            price_version=Case(
+                *(
+                    When(product_id=product_id, then=Value(version))
+                    for product_id, (_, version) in prices.items()
+                ),
+                output_field=CartLine._meta.get_field("price_version"),
+            ),
+        )
+        if self._lines is not None:
+            for product_id, (price, version) in prices.items():
+                if product_id in self._lines:
+                    self._lines[product_id].update(price=price, version=version)
+
+    def remove(self, product_id):
+        if self.has_key:
+            CartLine.objects.filter(cart_key=self.key, product_id=product_id).delete()
+        if self._lines is not None:
+            self._lines.pop(product_id, None)
+
+    def clear(self):
+        if self.has_key:
+            CartLine.objects.filter(cart_key=self.key).delete()
+        self._lines = {}
+
+
+class CacheCartStorage(BaseCartStorage):
+    """
+    Keeps the cart in the cache configured by settings.CART_CACHE_ALIAS.
+
+    Only the key of the cart is kept in the session, written once. Every
+    change rewrites the cache entry of this cart alone.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.CART_CACHE_ALIAS]
+
+    @property
+    def cache_key(self):
+        return f"cart:{self.key}"
+
+    def read(self):
+        return self.cache.get(self.cache_key, {})
+
+    def add(self, product_id, quantity, price, update_quantity=False, version=None):
+        self._apply(product_id, quantity, price, update_quantity, version)
+        self.save()
+
+    def remove(self, product_id):
+        lines = self.load()
+        if product_id in lines:
+            del lines[product_id]
+            self.save()
+
+    def clear(self):
+        if self.has_key:
+            self.cache.delete(self.cache_key)
+        self._lines = {}
+
+    def save(self):
+        self.cache.set(self.cache_key, self.load(), settings.SESSION_COOKIE_AGE)
+
+
+class CookieCartStorage(BaseCartStorage):
+    """
+    Keeps the cart in a signed, compressed cookie, without a session.
+
+    Browsing creates neither a session nor a row: the cookie is only set,
+    by CartCookieMiddleware, once the cart changed. A cart whose cookie
+    would exceed settings.CART_COOKIE_MAX_SIZE bytes is kept in the cache
+    configured by settings.CART_CACHE_ALIAS instead, the cookie then only
+    holding the key of the cart.
+    """
+
+    salt = "cart.storage.CookieCartStorage"
+    persists_on_response = True
+
+    def __init__(self, request):
+        """Initialize the storage from the cart cookie of the request.
+
+        Args:
+            request (HttpRequest): The request object.
+        Returns:
+            None
+        """
+
+        super().__init__(request)
+        self.state = self.read_cookie()
+        self.modified = False
+        request.cart_cookie_storage = self
+
+    def read_cookie(self):
+        """
+        Read the cart cookie, ignoring it if it was tampered with or expired.
+
+        Returns:
+            dict: The "key" of the cart and, unless the cart is cached, its
+            "lines".
+        """
+
+        value = self.request.COOKIES.get(settings.CART_COOKIE_NAME)
+        if value:
+            try:
+                return signing.loads(
+                    value, salt=self.salt, max_age=settings.CART_COOKIE_AGE
+                )
+            except signing.BadSignature:
+                pass
+        return {}
+
+    @property
+    def key(self):
+        if "key" not in self.state:
+            self.state["key"] = secrets.token_urlsafe(24)
+            self.modified = True
+        return self.state["key"]
+
+    @property
+    def has_key(self):
+        return "key" in self.state
+
+    @property
+    def cached(self):
+        return self.has_key and "lines" not in self.state
+
+    @property
+    def cache(self):
+        return caches[settings.CART_CACHE_ALIAS]
+
+    @property
+    def cache_key(self):
+        return f"cart:{self.key}"
+
+    def read(self):
+        if self.cached:
+            return self.cache.get(self.cache_key, {})
+        return self.state["lines"]
+
+    def add(self, product_id, quantity, price, update_quantity=False, version=None):
+        self._apply(product_id, quantity, price, update_quantity, version)
+        self.save()
+
+    def remove(self, product_id):
+        lines = self.load()
+        if product_id in lines:
+            del lines[product_id]
+            self.save()
+
+    def clear(self):
+        if self.cached:
+            self.cache.delete(self.cache_key)
+        self.state = {}
+        self._lines = {}
+        self.save()
+
+    def save(self):
+        # the cookie is written once per request, by update_response()
+        self.modified = True
+
+    def update_response(self, response):
+        """
+        Write the changes of the cart to the cart cookie of a response.
+
+        An empty cart deletes the cookie, a cart too large for it is moved to
+        the cache.
+
+        Args:
+            response (HttpResponse): The response object.
+        """
+
+        if not self.modified:
+            return
+
+        lines = self.load()
+        if not lines:
+            if self.cached:
+                self.cache.delete(self.cache_key)
+            response.delete_cookie(settings.CART_COOKIE_NAME, samesite="Lax")
+            return
+
+        value = signing.dumps(
+            {"key": self.key, "lines": lines}, salt=self.salt, compress=True
+        )
+        if len(value) > settings.CART_COOKIE_MAX_SIZE:
+            self.cache.set(self.cache_key, lines, settings.CART_COOKIE_AGE)
+            value = signing.dumps({"key": self.key}, salt=self.salt, compress=True)
+        elif self.cached:
+            self.cache.delete(self.cache_key)
+
+        response.set_cookie(
+            settings.CART_COOKIE_NAME,
+            value,
+            max_age=settings.CART_COOKIE_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
@@ -1,3 +1,383 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from market.models import Product
+from monitoring.testing import (
+    ORDER_DATA,
+    CatalogQueryBudgetMixin,
+    QueryBudgetMixin,
+    create_catalog,
+)
+
+from orders.models import Order
+
+from .models import CartLine
+from .storage import CookieCartStorage, DatabaseCartStorage
+
+
+class CartQueryBudgetTests(CatalogQueryBudgetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for product in self.products:
+            self.add(product)
+
+    def add(self, product):
+        return self.client.post(
+            reverse("cart:cart_add", args=[product.id]), {"quantity": 1}
+        )
+
+    def test_cart_detail(self):
+        response = self.client.get(reverse("cart:cart_detail"))
+
+        self.assertEqual(len(response.context["cart"]), len(self.products))
+        self.assertWithinQueryBudget(response)
+
+    def test_cart_add(self):
+        response = self.add(self.products[0])
+
+        self.assertRedirects(response, reverse("cart:cart_detail"))
+        self.assertWithinQueryBudget(response)
+
+    def test_cart_remove(self):
+        response = self.client.post(
+            reverse("cart:cart_remove", args=[self.products[0].id])
+        )
+
+        self.assertRedirects(response, reverse("cart:cart_detail"))
+        self.assertWithinQueryBudget(response)
+
+
+@override_settings(CART_STORAGE="cart.storage.SessionCartStorage")
+class LazySessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_catalog(products=1)[0]
+
+    def test_browsing_creates_no_session(self):
+        self.client.get(reverse("cart:cart_detail"))
+        self.client.post(reverse("cart:cart_remove", args=[self.product.id]))
+
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_adding_creates_the_session(self):
+        self.client.post(
+            reverse("cart:cart_add", args=[self.product.id]), {"quantity": 1}
+        )
+
+        self.assertEqual(Session.objects.count(), 1)
+
+
+@override_settings(CART_STORAGE="cart.storage.CookieCartStorage")
+class CartCookieMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_catalog()
+
+    def setUp(self):
+        caches[settings.CART_CACHE_ALIAS].clear()
+
+    def add(self, *products):
+        for product in products:
+            self.client.post(
+                reverse("cart:cart_add", args=[product.id]), {"quantity": 2}
+            )
+
+    def cart(self):
+        return self.client.get(reverse("cart:cart_detail")).context["cart"]
+
+    def test_cart_is_kept_in_the_cookie(self):
+        self.add(*self.products[:2])
+
+        self.assertIn(settings.CART_COOKIE_NAME, self.client.cookies)
+        self.assertEqual(len(self.cart()), 4)
+        self.assertFalse(Session.objects.exists())
+
+    @override_settings(CART_COOKIE_MAX_SIZE=200)
+    def test_large_carts_are_moved_to_the_cache(self):
+        self.add(*self.products)
+
+        self.assertLessEqual(
+            len(self.client.cookies[settings.CART_COOKIE_NAME].value), 200
+        )
+        self.assertEqual(len(self.cart()), 2 * len(self.products))
+
+    @override_settings(CART_COOKIE_MAX_SIZE=400)
+    def test_small_carts_are_moved_back_to_the_cookie(self):
+        self.add(*self.products)
+        value = self.client.cookies[settings.CART_COOKIE_NAME].value
+        self.assertNotIn("lines", signing.loads(value, salt=CookieCartStorage.salt))
+
+        for product in self.products[1:]:
+            self.client.post(reverse("cart:cart_remove", args=[product.id]))
+
+        value = self.client.cookies[settings.CART_COOKIE_NAME].value
+        state = signing.loads(value, salt=CookieCartStorage.salt)
+        self.assertEqual(list(state["lines"]), [str(self.products[0].id)])
+        cache = caches[settings.CART_CACHE_ALIAS]
+        self.assertIsNone(cache.get(f"cart:{state['key']}"))
+        self.assertEqual(len(self.cart()), 2)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.products[0])
+        self.client.cookies[settings.CART_COOKIE_NAME] = "eyJrZXkiOiJ4In0:forged"
+
+        self.assertEqual(len(self.cart()), 0)
+
+    def test_emptied_cart_deletes_the_cookie(self):
+        self.add(self.products[0])
+        self.client.post(reverse("cart:cart_remove", args=[self.products[0].id]))
+
+        self.assertEqual(self.client.cookies[settings.CART_COOKIE_NAME].value, "")
+        self.assertEqual(len(self.cart()), 0)
+
+
+@override_settings(CART_STORAGE="cart.storage.DatabaseCartStorage")
+class DatabaseCartStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [str(product.id) for product in create_catalog(products=2)]
+
+    def setUp(self):
+        caches[settings.CART_CACHE_ALIAS].clear()
+        self.session = SessionStore()
+        self.cookies = {}
+
+    def open(self):
+        request = RequestFactory().get("/")
+        request.session = self.session
+        request.COOKIES = self.cookies
+        return import_string(settings.CART_STORAGE)(request)
+
+    def persist(self, storage):
+        """Persist the changes of a storage like the end of its request."""
+
+        if storage.persists_on_response:
+            response = HttpResponse()
+            storage.update_response(response)
+            if settings.CART_COOKIE_NAME in response.cookies:
+                self.cookies = {
+                    settings.CART_COOKIE_NAME: response.cookies[
+                        settings.CART_COOKIE_NAME
+                    ].value
+                }
+
+    def reopen(self, storage):
+        self.persist(storage)
+        return self.open().load()
+
+    def line(self, quantity, price="1000.00", version=1):
+        return {"quantity": quantity, "price": price, "version": version}
+
+    def test_add(self):
+        storage = self.open()
+        storage.add(self.ids[0], 1, "1000.00", version=1)
+        storage.add(self.ids[0], 2, "1000.00", version=1)
+        storage.add(self.ids[1], 4, "1000.00", version=1)
+        storage.add(self.ids[1], 5, "1000.00", update_quantity=True, version=1)
+
+        expected = {self.ids[0]: self.line(3), self.ids[1]: self.line(5)}
+        self.assertEqual(storage.load(), expected)
+        self.assertEqual(self.reopen(storage), expected)
+
+    def test_remove(self):
+        storage = self.open()
+        storage.add(self.ids[0], 1, "1000.00", version=1)
+        storage.add(self.ids[1], 1, "1000.00", version=1)
+        self.persist(storage)
+        storage = self.open()
+        storage.remove(self.ids[0])
+        storage.remove(self.ids[0])
+
+        self.assertEqual(self.reopen(storage), {self.ids[1]: self.line(1)})
+
+    def test_reprice(self):
+        storage = self.open()
+        storage.add(self.ids[0], 1, "1000.00", version=1)
+        storage.add(self.ids[1], 2, "1000.00", version=1)
+        storage.reprice({self.ids[1]: ("1500.00", 2)})
+
+        expected = {self.ids[0]: self.line(1), self.ids[1]: self.line(2, "1500.00", 2)}
+        self.assertEqual(storage.load(), expected)
+        self.assertEqual(self.reopen(storage), expected)
+
+    def test_clear(self):
+        storage = self.open()
+        storage.add(self.ids[0], 1, "1000.00", version=1)
+        self.persist(storage)
+        storage = self.open()
+        storage.clear()
+
+        self.assertEqual(storage.load(), {})
+        self.assertEqual(self.reopen(storage), {})
+
+
+class DatabaseCartStorageRaceTests(TestCase):
+    def test_line_created_meanwhile_is_added_to(self):
+        product_id = str(create_catalog(products=1)[0].id)
+        request = RequestFactory().get("/")
+        request.session = SessionStore()
+        storage = DatabaseCartStorage(request)
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # another request creates the line between the UPDATE and INSERT
+            if not CartLine.objects.exists():
+                CartLine.objects.create(
+                    cart_key=storage.key, product_id=product_id, quantity=2, price=1
+                )
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", racing_update):
+            storage.add(product_id, 3, "1.00")
+
+        self.assertEqual(CartLine.objects.get().quantity, 5)
+
+
+@override_settings(CART_STORAGE="cart.storage.CacheCartStorage")
+class CacheCartStorageTests(DatabaseCartStorageTests):
+    pass
+
+
+@override_settings(CART_STORAGE="cart.storage.CookieCartStorage")
+class CookieCartStorageTests(DatabaseCartStorageTests):
+    pass
+
+
+@override_settings(CART_STORAGE="cart.storage.DatabaseCartStorage")
+class DatabaseCartQueryBudgetTests(CartQueryBudgetTests):
+    pass
+
+
+class RepriceTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_catalog(products=3)
+
+    def setUp(self):
+        for product in self.products:
+            self.client.post(
+                reverse("cart:cart_add", args=[product.id]), {"quantity": 1}
+            )
+
+    def change_price(self, product, price):
+        product.price = price
+        product.save()
+
+    def test_price_changes_bump_the_version(self):
+        product = self.products[1]
+        product.save()
+        self.assertEqual(product.price_version, 1)
+
+        self.change_price(product, 1500)
+        product.refresh_from_db()
+        self.assertEqual(product.price_version, 2)
+
+    def test_concurrent_price_changes_both_bump_the_version(self):
+        first = Product.objects.get(pk=self.products[1].pk)
+        second = Product.objects.get(pk=self.products[1].pk)
+
+        self.change_price(first, 1500)
+        self.change_price(second, 1600)
+
+        self.assertEqual(second.price_version, 3)
+        self.assertEqual(Product.objects.get(pk=second.pk).price_version, 3)
+
+    def test_stale_lines_are_flagged(self):
+        self.change_price(self.products[1], 1500)
+
+        response = self.client.get(reverse("cart:cart_detail"))
+
+        cart = response.context["cart"]
+        self.assertEqual([item.stale for item in cart], [False, True, False])
+        self.assertWithinQueryBudget(response)
+
+    def test_checkout_reprices_stale_lines(self):
+        self.change_price(self.products[1], 1500)
+
+        response = self.client.post(reverse("orders:create_order"), ORDER_DATA)
+        self.assertContains(response, "changed since you added it")
+        self.assertContains(response, f'value="{ORDER_DATA["address"]}"')
+        self.assertTrue(response.context["form"].is_bound)
+        self.assertEqual(response.context["cart"].get_total_price(), 3500)
+        self.assertFalse(Order.objects.exists())
+
+        self.client.post(reverse("orders:create_order"), ORDER_DATA)
+        self.assertEqual(Order.objects.get().total_cost, 0 + 1500 + 2000)
+
+    def test_unchanged_prices_are_not_reported(self):
+        self.change_price(self.products[1], 1500)
+        self.change_price(self.products[1], 1000)
+
+        self.client.post(reverse("orders:create_order"), ORDER_DATA)
+        self.assertEqual(Order.objects.get().total_cost, 3000)
+
+
+@override_settings(CART_STORAGE="cart.storage.DatabaseCartStorage")
+class DatabaseRepriceTests(RepriceTests):
+    pass
+
+
+@override_settings(CART_STORAGE="cart.storage.SessionCartStorage")
+class MigrateCartsCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_catalog(products=2)
+
+    def setUp(self):
+        for product in self.products:
+            self.client.post(
+                reverse("cart:cart_add", args=[product.id]), {"quantity": 1}
+            )
+
+    def session_cart(self):
+        return Session.objects.get().get_decoded().get(settings.CART_SESSION_ID)
+
+    @override_settings(CART_STORAGE="cart.storage.DatabaseCartStorage")
+    def test_carts_are_moved(self):
+        out = StringIO()
+        call_command("migrate_carts", stdout=out)
+
+        self.assertIn("Moved 1 carts", out.getvalue())
+        self.assertIsNone(self.session_cart())
+        self.assertEqual(CartLine.objects.count(), 2)
+
+    @override_settings(CART_STORAGE="cart.storage.CookieCartStorage")
+    def test_cookie_carts_are_left_in_the_session(self):
+        with self.assertRaises(CommandError):
+            call_command("migrate_carts", stdout=StringIO())
+
+        self.assertEqual(len(self.session_cart()), 2)
+
+
+class ClearCartsCommandTests(TestCase):
+    def test_stale_cart_lines_are_deleted(self):
+        products = create_catalog(products=2)
+        for product in products:
+            CartLine.objects.create(cart_key="key", product=product, price=1)
+        CartLine.objects.filter(product=products[0]).update(
+            updated=timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE + 1)
+        )
+
+        out = StringIO()
+        call_command("clear_carts", stdout=out)
+
+        self.assertIn("Deleted 1 cart lines", out.getvalue())
+
+        self.assertEqual(
+            list(CartLine.objects.values_list("product", flat=True)), [products[1].id]
+        )
@@ -1,6 +1,7 @@
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
+from inventory import stock
 from market.models import Product
 from .cart import Cart
 from .forms import CartAddProductForm
@@ -18,16 +19,19 @@ def cart_add(request, product_id):
         HttpResponseRedirect: The cart detail page.
     """
     cart = Cart(request)
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(Product, id=product_id, available=True)
     form = CartAddProductForm(request.POST)
 
     if form.is_valid():
         cleaned_data = form.cleaned_data
-        cart.add(
-            product=product,
-            quantity=cleaned_data["quantity"],
-            update_quantity=cleaned_data["update_quantity"],
-        )
+        quantity = cleaned_data["quantity"]
+        if not cleaned_data["update_quantity"]:
+            quantity += cart.cart.get(str(product.id), {}).get("quantity", 0)
+
+        if stock.reserve(cart.key, product.id, quantity):
+            cart.add(product=product, quantity=quantity, update_quantity=True)
+        else:
+            messages.error(request, f"Sorry, {product.name} is out of stock.")
 
     # messages.success(request, f"Added {product.name} to your cart.")
 
@@ -48,6 +52,9 @@ def cart_remove(request, product_id):
     cart = Cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
+    # a cart without a key holds no stock, and the key would be created
+    if cart.has_key:
+        stock.release(cart.key, product.id)
 
     return redirect("cart:cart_detail")
 
@@ -63,16 +70,5 @@ def cart_detail(request):
     """
 
     cart = Cart(request)
-    # return render(request, "cart/detail.html", {"cart": cart})
-
-    # for item in cart:
-    #     item["update_quantity_form"] = CartAddProductForm(
-    #         initial={"quantity": item["quantity"]}
-    #     )
-
-    for item in cart:
-        item["update_quantity_form"] = CartAddProductForm(
-            initial={"quantity": item["quantity"], "update_quantity": True}
-        )
 
     return render(request, "cart/detail.html", {"cart": cart})
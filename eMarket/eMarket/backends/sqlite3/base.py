@@ -0,0 +1,53 @@
+"""
+SQLite backend with the transaction_mode and init_command options.
+
+Django 3.2 starts every transaction with a plain BEGIN. Such a transaction
+only takes the write lock at its first write, and when another connection
+wrote in the meantime SQLite fails it at once with "database is locked",
+without waiting for the busy timeout. Checkouts, which read the cart before
+writing the order, hit this under any concurrency. With
+"transaction_mode": "IMMEDIATE" transactions take the write lock up front,
+waiting for it, and readers are not blocked in WAL mode.
+
+"init_command" runs statements, such as PRAGMAs, on every new connection.
+Both options are named as in Django 5.1, which supports them natively.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = {"DEFERRED", "EXCLUSIVE", "IMMEDIATE"}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    transaction_mode = None
+    init_commands = []
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.transaction_mode = kwargs.pop("transaction_mode", None)
+        if self.transaction_mode is not None:
+            self.transaction_mode = self.transaction_mode.upper()
+            if self.transaction_mode not in TRANSACTION_MODES:
+                raise ImproperlyConfigured(
+                    "settings.DATABASES[...]['OPTIONS']['transaction_mode'] must "
+                    f"be one of {', '.join(sorted(TRANSACTION_MODES))}."
+                )
+        self.init_commands = [
+            command.strip()
+            for command in kwargs.pop("init_command", "").split(";")
+            if command.strip()
+        ]
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for command in self.init_commands:
+            conn.execute(command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
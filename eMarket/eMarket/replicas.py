@@ -0,0 +1,140 @@
+"""
+Read replicas of the catalog.
+
+Reads of the catalog models go to a random replica of
+settings.REPLICA_DATABASES, everything else, and every write, to the
+primary ("default"). Replicas lag behind the primary, so reads go to the
+primary instead:
+
+- outside of requests, e.g. in management commands;
+- inside transactions, where checkout and the admin lock and write rows;
+- for the whole admin, which edits what it reads;
+- once a request wrote to the catalog, for the rest of the request and,
+  through a cookie, for the next settings.REPLICA_PIN_SECONDS, so whoever
+  changed the catalog reads their own writes.
+"""
+
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+from django.utils.deprecation import MiddlewareMixin
+
+# the apps whose reads may be served by a replica
+REPLICATED_APPS = {"market"}
+
+# the routing state of the request being served, None outside of requests
+_state = ContextVar("replica_state", default=None)
+
+
+def atomic_depth():
+    # every nested atomic() block adds a savepoint ID, None without savepoint
+    connection = connections[DEFAULT_DB_ALIAS]
+    return connection.in_atomic_block + len(connection.savepoint_ids)
+
+
+class ReplicaState:
+    """
+    The routing state of a request.
+
+    Attributes:
+        pinned (bool): Whether every read goes to the primary.
+        wrote (bool): Whether the request wrote to the catalog.
+        depth (int): The number of transactions open when the request
+            started, those opened by the request read from the primary.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.depth = atomic_depth()
+
+
+def primary_required():
+    """
+    Check whether the reads of the current code must go to the primary.
+
+    Returns:
+        bool: Whether the reads must go to the primary.
+    """
+
+    state = _state.get()
+    return state is None or state.pinned or state.wrote or atomic_depth() > state.depth
+
+
+class ReplicaRouter:
+    """
+    Database router sending the catalog reads to the replicas.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICATED_APPS:
+            return None
+        if not settings.REPLICA_DATABASES or primary_required():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label in REPLICATED_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """
+    Tracks the routing state of every request.
+
+    Admin requests and requests carrying the settings.REPLICA_PIN_COOKIE
+    cookie read from the primary. Requests writing to the catalog set the
+    cookie.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = _state.set(self.request_state(request))
+        try:
+            return self.pin(self.get_response(request))
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        token = _state.set(self.request_state(request))
+        try:
+            return self.pin(await self.get_response(request))
+        finally:
+            _state.reset(token)
+
+    def request_state(self, request):
+        return ReplicaState(
+            pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES
+            or request.path_info.startswith(reverse("admin:index"))
+        )
+
+    def pin(self, response):
+        if _state.get().wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,15 +41,25 @@ INSTALLED_APPS = [
     "market.apps.MarketConfig",
     "cart.apps.CartConfig",
     "orders.apps.OrdersConfig",
+    "inventory.apps.InventoryConfig",
+    "api.apps.ApiConfig",
+    "monitoring.apps.MonitoringConfig",
+    "analytics.apps.AnalyticsConfig",
 ]
 
 MIDDLEWARE = [
+    # before the metrics, static files are not views (see SERVE_STATIC)
+    "eMarket.staticfiles.StaticFilesMiddleware",
+    # before the other middleware, so their time is measured
+    "monitoring.middleware.RequestMetricsMiddleware",
+    "eMarket.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "cart.middleware.CartCookieMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -56,7 +67,8 @@ ROOT_URLCONF = "eMarket.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # the Django backend, timing the rendering of every request
+        "BACKEND": "monitoring.metrics.DjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -72,15 +84,116 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "eMarket.wsgi.application"
 
+# route the product detail URL to its asynchronous view; eMarket.asgi turns
+# this on, under WSGI every async view would need its own event loop
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0") == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
+#
+# SQLite by default. Set DATABASE_ENGINE=postgresql, with DATABASE_NAME,
+# DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and DATABASE_PORT, to use
+# PostgreSQL. Connections are kept open for DATABASE_CONN_MAX_AGE seconds
+# and reused by the following requests of the same thread.
+
+# milliseconds a SQLite connection waits for the write lock, and bytes of the
+# database file it maps in memory
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 2**20))
+
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+
+if DATABASE_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DATABASE_NAME", "emarket"),
+            "USER": os.environ.get("DATABASE_USER", ""),
+            "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+            "HOST": os.environ.get("DATABASE_HOST", ""),
+            "PORT": os.environ.get("DATABASE_PORT", ""),
+            "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 600)),
+            # behind PgBouncer in transaction pooling mode (DATABASE_POOLER=
+            # pgbouncer) a server-side cursor cannot outlive its transaction
+            "DISABLE_SERVER_SIDE_CURSORS": (
+                os.environ.get("DATABASE_POOLER") == "pgbouncer"
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            # the SQLite backend with the options of Django 5.1, see
+            # eMarket.backends.sqlite3
+            "ENGINE": "eMarket.backends.sqlite3",
+            "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 60)),
+            "OPTIONS": {
+                # take the write lock when a transaction starts, waiting for
+                # it, instead of failing with "database is locked" on upgrade
+                "transaction_mode": "IMMEDIATE",
+                # WAL lets readers run alongside the writer, and only needs
+                # an fsync at checkpoints with synchronous=NORMAL
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};"
+                    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};"
+                ),
+            },
+            # a file rather than the in-memory default, so concurrency tests
+            # lock across connections the way the real database does
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
+    }
 
-DATABASES = {
+# read replicas of the catalog (see eMarket.replicas), set with
+# DATABASE_REPLICAS to a comma-separated list of PostgreSQL hosts (host or
+# host:port), or of SQLite files kept up to date with the sync_replicas
+# command; tests read the primary through them
+REPLICA_DATABASES = []
+
+for number, location in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")), start=1
+):
+    replica = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DATABASE_ENGINE == "postgresql":
+        host, _, port = location.partition(":")
+        replica.update(HOST=host, PORT=port or replica["PORT"])
+    else:
+        replica["NAME"] = location
+    DATABASES[f"replica{number}"] = replica
+    REPLICA_DATABASES.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["eMarket.replicas.ReplicaRouter"]
+
+# after writing to the catalog, a client reads it from the primary for this
+# many seconds, longer than the replicas lag behind
+REPLICA_PIN_COOKIE = "pin_primary"
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# The "catalog" cache holds rendered catalog fragments (see market.cache).
+# Local memory is fine for development and tests; in production point it at
+# a shared backend, e.g.
+#   CATALOG_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   CATALOG_CACHE_LOCATION=/var/tmp/emarket_catalog
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalog": {
+        "BACKEND": os.environ.get(
+            "CATALOG_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CATALOG_CACHE_LOCATION", "catalog"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
 
 
@@ -123,6 +236,18 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"  # where collectstatic gathers them
+
+# fingerprint the collected static files and precompress them (see
+# eMarket.staticfiles); {% static %} then needs collectstatic to have run,
+# so it is off for development
+if os.environ.get("STATIC_MANIFEST", "0") == "1":
+    STATICFILES_STORAGE = "eMarket.staticfiles.CompressedManifestStaticFilesStorage"
+
+# serve STATIC_ROOT from the app itself rather than a separate web server,
+# the fingerprinted files being cached by browsers for STATIC_MAX_AGE seconds
+SERVE_STATIC = os.environ.get("SERVE_STATIC", "0") == "1"
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -133,5 +258,102 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# seconds between the looks for new product images of the image worker,
+# `manage.py process_images --watch`, run next to the web server: saving a
+# product with a new image only clears its derivatives (see market.images),
+# pages show the original upload until the worker has rendered them
+IMAGE_WATCH_INTERVAL = int(os.environ.get("IMAGE_WATCH_INTERVAL", 5))
+
 # custom setting for the cart session
 CART_SESSION_ID = "cart"  # the key used to store the cart in the session
+
+# where carts are kept, one of the storages of cart.storage:
+# SessionCartStorage, DatabaseCartStorage, CacheCartStorage or
+# CookieCartStorage, which creates no session for anonymous shoppers
+CART_STORAGE = os.environ.get("CART_STORAGE", "cart.storage.SessionCartStorage")
+CART_KEY_SESSION_ID = "cart_key"  # the session key holding the key of the cart
+# the cache used by CacheCartStorage, and by CookieCartStorage for large carts
+CART_CACHE_ALIAS = "default"
+
+# the cookie CookieCartStorage keeps carts in, its lifetime in seconds, and
+# the largest cookie (in bytes, browsers cap a cookie at 4096) before the
+# cart is moved to the cache
+CART_COOKIE_NAME = "cart"
+CART_COOKIE_AGE = 60 * 60 * 24 * 14
+CART_COOKIE_MAX_SIZE = 2048
+
+# seconds the stock added to a cart stays reserved for it, expired
+# reservations are released by the expire_reservations command
+STOCK_RESERVATION_TTL = 15 * 60
+
+# number of products shown on a page of the catalog
+PRODUCTS_PER_PAGE = 24
+
+# largest page of the JSON API, and number of rows the NDJSON export reads
+# from the database at a time
+API_MAX_PAGE_SIZE = 100
+API_EXPORT_CHUNK_SIZE = 2000
+
+# above this many rows (as estimated by the database), admin changelists
+# show an estimated count rather than counting every row
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+# seconds the order summary shown on the admin order list is cached for
+ORDER_SUMMARY_TIMEOUT = 60
+
+# seconds the order history links emailed to customers stay valid, and
+# number of orders shown on a page of the history
+ORDER_HISTORY_LINK_AGE = 60 * 60 * 24
+ORDERS_PER_PAGE = 20
+
+# most order history links sent to an email address, and requested from a
+# client IP address, per ORDER_HISTORY_THROTTLE_WINDOW seconds; counted in
+# the default cache, which must be shared by the processes of the server
+ORDER_HISTORY_EMAIL_LIMIT = 3
+ORDER_HISTORY_IP_LIMIT = 10
+ORDER_HISTORY_THROTTLE_WINDOW = 60 * 60
+
+# how emails, e.g. the order history links, are sent; printed to the console
+# unless configured
+EMAIL_BACKEND = os.environ.get(
+    "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "eMarket <shop@localhost>")
+
+# most SQL queries a request to each view may run (see monitoring), set to
+# the most measured by the tests of the apps across every CART_STORAGE, with
+# ten products or cart lines, so a query per product fails them; requests
+# over budget are logged and counted. The statements controlling
+# transactions are not counted. Checkout runs a conditional stock UPDATE per
+# line, so its budget covers ten lines
+QUERY_BUDGETS = {
+    "market:product_list": 3,
+    "market:product_list_by_category": 4,
+    "market:product_search": 3,
+    "market:product_detail": 1,
+    "cart:cart_detail": 3,
+    "cart:cart_add": 9,
+    "cart:cart_remove": 5,
+    "orders:create_order": 19,
+    "orders:order_lookup": 1,
+    "orders:order_history": 2,
+    "api:category_list": 1,
+    "api:product_list": 1,
+    "api:product_detail": 1,
+    "api:product_export": 1,
+    "analytics:dashboard": 5,
+}
+
+# bearer token Prometheus sends to read /metrics/; without one the metrics
+# are only open to staff, and to everyone while DEBUG is on
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# lower bounds (Ksh) of the price bands offered as catalog filters; run the
+# rebuild_facets command after changing them
+PRICE_FACET_BANDS = [0, 1000, 5000, 20000, 50000]
+
+# cache alias and lifetime of rendered catalog fragments; entries are
+# invalidated by version as soon as the catalog changes, the timeout only
+# reclaims entries of old versions
+CATALOG_CACHE_ALIAS = "catalog"
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
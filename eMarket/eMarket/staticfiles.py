@@ -0,0 +1,263 @@
+"""
+Fingerprinted, precompressed static files served by the app itself.
+
+collectstatic, with CompressedManifestStaticFilesStorage, copies every
+static file under a name holding the hash of its content, e.g.
+css/main.3f2a9c1e04b7.css, and writes a gzip variant (and a brotli one when
+the brotli package is installed) of every text file next to it.
+
+StaticFilesMiddleware then serves settings.STATIC_ROOT without a separate
+web server: the variant the browser accepts, with far-future, immutable
+cache headers for the fingerprinted files, which never change under the
+same name.
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only gzip variants are written then
+    brotli = None
+
+# the files worth compressing, images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".map", ".svg", ".txt", ".json", ".xml"}
+
+# the encodings of the variants, most preferred first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# seconds the files that are not fingerprinted may be cached for
+SHORT_MAX_AGE = 60
+
+
+def compress(data):
+    """
+    Compress the content of a static file with every available encoding.
+
+    Variants saving less than 5% are dropped, they are not worth the
+    decompression.
+
+    Args:
+        data (bytes): The content of the file.
+    Returns:
+        dict: The compressed content by file extension.
+    """
+
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data)
+    return {
+        extension: compressed
+        for extension, compressed in variants.items()
+        if len(compressed) < len(data) * 0.95
+    }
+
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header (RFC 9110, section 12.5.3).
+
+    Args:
+        header (str): The value of the header.
+    Returns:
+        dict: The quality value of every listed content coding, lowercase,
+            "*" standing for the codings not listed.
+    """
+
+    qualities = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        match = re.search(r"(?:^|;)\s*q\s*=\s*([0-9.]+)\s*$", params, re.IGNORECASE)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        # x-gzip is an alias of gzip
+        qualities["gzip" if coding == "x-gzip" else coding] = quality
+    return qualities
+
+
+def etag_matches(header, etag):
+    """
+    Check an ETag against an If-None-Match header (RFC 9110, section 13.1.2).
+
+    The header may list several ETags or be "*", and is compared weakly: a
+    W/ prefix is ignored.
+
+    Args:
+        header (str): The value of the header.
+        etag (str): The strong ETag of the file.
+    Returns:
+        bool: Whether the file matches, so that it is not modified.
+    """
+
+    etags = parse_etags(header)
+    if etags == ["*"]:
+        return True
+    return etag in {tag[2:] if tag.startswith("W/") else tag for tag in etags}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage also writing compressed variants of the
+    collected text files.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = {*paths, *self.hashed_files.values()}
+        for name in sorted(names):
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            with self.open(name) as file:
+                variants = compress(file.read())
+            for extension, compressed in variants.items():
+                with open(self.path(name + extension), "wb") as file:
+                    file.write(compressed)
+                yield name + extension, name + extension, True
+
+
+class StaticFile:
+    """
+    A collected static file and its compressed variants.
+
+    Attributes:
+        path (str): The path of the file.
+        variants (dict): The path of every compressed variant by encoding.
+        headers (dict): The headers of every response serving the file.
+    """
+
+    def __init__(self, path, immutable):
+        """Read the metadata of the file.
+
+        Args:
+            path (str): The path of the file.
+            immutable (bool): Whether the file is fingerprinted.
+        Returns:
+            None
+        """
+
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.variants = {
+            encoding: path + extension
+            for encoding, extension in ENCODINGS.items()
+            if os.path.exists(path + extension)
+        }
+        self.headers = {
+            "ETag": f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+            "Last-Modified": http_date(stat.st_mtime),
+            "Cache-Control": (
+                f"public, max-age={settings.STATIC_MAX_AGE}, immutable"
+                if immutable
+                else f"public, max-age={SHORT_MAX_AGE}"
+            ),
+        }
+        if self.variants:
+            self.headers["Vary"] = "Accept-Encoding"
+
+    def response(self, request):
+        """
+        Serve the file, compressed if the client accepts it.
+
+        Args:
+            request (HttpRequest): The request object.
+        Returns:
+            HttpResponse: The response object.
+        """
+
+        if etag_matches(
+            request.META.get("HTTP_IF_NONE_MATCH", ""), self.headers["ETag"]
+        ):
+            response = HttpResponseNotModified()
+        else:
+            path, encoding, best = self.path, None, 0
+            qualities = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+            # the variant the client prefers, q=0 meaning "not acceptable"
+            for candidate, variant in self.variants.items():
+                quality = qualities.get(candidate, qualities.get("*", 0))
+                if quality > best:
+                    path, encoding, best = variant, candidate, quality
+
+            response = FileResponse(
+                open(path, "rb"),
+                content_type=self.content_type,
+                filename=os.path.basename(self.path),
+            )
+            if encoding:
+                response["Content-Encoding"] = encoding
+
+        for header, value in self.headers.items():
+            response[header] = value
+        return response
+
+
+class StaticFilesMiddleware(MiddlewareMixin):
+    """
+    Serves the files collected in settings.STATIC_ROOT under
+    settings.STATIC_URL, when settings.SERVE_STATIC is on.
+
+    The files are listed once, when the server starts, so run collectstatic
+    before starting it. Other requests, and unknown static files, go on to
+    the views.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVE_STATIC:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.files = self.find_files()
+
+    def find_files(self):
+        """
+        List the collected static files.
+
+        Returns:
+            dict: The StaticFile of every file by URL.
+        """
+
+        root = os.fspath(settings.STATIC_ROOT)
+        fingerprinted = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        variants = tuple(ENCODINGS.values())
+        files = {}
+
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, "/")
+                if name.endswith(variants) and os.path.exists(
+                    os.path.splitext(path)[0]
+                ):
+                    continue
+                files[settings.STATIC_URL + relative] = StaticFile(
+                    path, relative in fingerprinted
+                )
+        return files
+
+    def process_request(self, request):
+        static_file = self.files.get(request.path)
+        if static_file is None:
+            return None
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return static_file.response(request)
@@ -18,13 +18,19 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
+from market.views import serve_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("cart/", include("cart.urls", namespace="cart")),
     path("orders/", include("orders.urls", namespace="orders")),
+    path("api/", include("api.urls", namespace="api")),
+    path("metrics/", include("monitoring.urls", namespace="monitoring")),
+    path("analytics/", include("analytics.urls", namespace="analytics")),
     path("", include("market.urls", namespace="market")),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(
+        settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT
+    )
@@ -0,0 +1,32 @@
+from django.contrib import admin
+from .models import Reservation, StockItem
+
+
+@admin.register(StockItem)
+class StockItemAdmin(admin.ModelAdmin):
+    """
+    Admin class for the StockItem model to customize the display in the Django admin interface.
+    """
+
+    list_display = ["product", "quantity", "reserved"]
+    list_select_related = ["product"]
+    raw_id_fields = ["product"]
+    readonly_fields = ["reserved"]
+
+    def save_model(self, request, obj, form, change):
+        # never write back a stale reserved count over concurrent reservations
+        if change:
+            obj.save(update_fields=["quantity"])
+        else:
+            obj.save()
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    """
+    Admin class for the Reservation model to customize the display in the Django admin interface.
+    """
+
+    list_display = ["cart_key", "product", "quantity", "expires"]
+    list_select_related = ["product"]
+    raw_id_fields = ["product"]
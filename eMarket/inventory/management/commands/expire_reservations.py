@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stock import sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Release the stock held by expired cart reservations. Run it periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of reservations released per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        released = sweep_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} reservations."))
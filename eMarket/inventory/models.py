@@ -0,0 +1,78 @@
+from django.db import models
+from market.models import Product
+
+
+class StockItem(models.Model):
+    """
+    StockItem model to store the stock level of a product.
+
+    Products without a StockItem are not stock-tracked and never run out.
+    Stock levels are only changed with conditional UPDATE statements (see
+    inventory.stock), never by saving a loaded instance.
+
+    The StockItem model has the following fields:
+    - product: the product, also the primary key
+    - quantity: the number of units on hand
+    - reserved: the number of units held by the reservations of carts
+    """
+
+    product = models.OneToOneField(
+        Product, primary_key=True, related_name="stock", on_delete=models.CASCADE
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """
+        Method to return a string representation of the StockItem object.
+        """
+        return f"{self.product_id}: {self.quantity} ({self.reserved} reserved)"
+
+    @property
+    def available(self):
+        """
+        Property to return the number of units that are neither sold nor reserved.
+        """
+        return max(self.quantity - self.reserved, 0)
+
+
+class Reservation(models.Model):
+    """
+    Reservation model to store the units of a product held for a cart.
+
+    The Reservation model has the following fields:
+    - cart_key: the key of the cart holding the units
+    - product: a foreign key to the Product model
+    - quantity: the number of units held
+    - expires: the date and time after which the units are released
+    """
+
+    cart_key = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product, related_name="reservations", on_delete=models.CASCADE
+    )
+    quantity = models.PositiveIntegerField()
+    expires = models.DateTimeField()
+
+    class Meta:
+        """
+        Meta class to define the constraints and indexes of the Reservation objects.
+
+        A cart holds one reservation per product, and expired reservations are
+        found through the index on expires.
+        """
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart_key", "product"], name="unique_cart_reservation"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["expires"]),
+        ]
+
+    def __str__(self):
+        """
+        Method to return a string representation of the Reservation object.
+        """
+        return f"{self.cart_key}: {self.product_id} x {self.quantity}"
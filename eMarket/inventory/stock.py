@@ -0,0 +1,177 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Reservation, StockItem
+
+
+class OutOfStock(Exception):
+    """
+    Raised when a checkout asks for more units than are available.
+
+    Attributes:
+        product_ids (list): The IDs of the products that ran out.
+    """
+
+    def __init__(self, product_ids):
+        super().__init__(f"Out of stock: {', '.join(map(str, product_ids))}")
+        self.product_ids = product_ids
+
+
+def reserve(cart_key, product_id, quantity):
+    """
+    Hold units of a product for a cart until the reservation expires.
+
+    The reservation replaces the previous one of the cart for the product,
+    only the difference is taken from (or given back to) the stock, with a
+    conditional UPDATE that never lets the reserved units exceed the stock.
+
+    Args:
+        cart_key (str): The key of the cart.
+        product_id (UUID): The ID of the product.
+        quantity (int): The total number of units to hold.
+    Returns:
+        bool: Whether the units are held. Untracked products always are.
+    """
+
+    with transaction.atomic():
+        current = (
+            Reservation.objects.select_for_update()
+            .filter(cart_key=cart_key, product_id=product_id)
+            .values_list("quantity", flat=True)
+            .first()
+        ) or 0
+        delta = quantity - current
+        stock = StockItem.objects.filter(product_id=product_id)
+
+        if delta > 0:
+            held = stock.filter(quantity__gte=F("reserved") + delta).update(
+                reserved=F("reserved") + delta
+            )
+            if not held:
+                # either not enough units or the product is not tracked
+                return not stock.exists()
+        elif delta < 0:
+            stock.update(reserved=Greatest(F("reserved") + delta, 0))
+
+        Reservation.objects.update_or_create(
+            cart_key=cart_key,
+            product_id=product_id,
+            defaults={
+                "quantity": quantity,
+                "expires": timezone.now()
+                + timedelta(seconds=settings.STOCK_RESERVATION_TTL),
+            },
+        )
+
+    return True
+
+
+def release(cart_key, product_id=None):
+    """
+    Give the units held by a cart back to the stock.
+
+    Args:
+        cart_key (str): The key of the cart.
+        product_id (UUID): The product to release, every product if None.
+    """
+
+    reservations = Reservation.objects.filter(cart_key=cart_key)
+    if product_id is not None:
+        reservations = reservations.filter(product_id=product_id)
+
+    with transaction.atomic():
+        _release(reservations)
+
+
+def _release(reservations):
+    held = reservations.order_by().values("product_id").annotate(units=Sum("quantity"))
+    for row in held:
+        StockItem.objects.filter(product_id=row["product_id"]).update(
+            reserved=Greatest(F("reserved") - row["units"], 0)
+        )
+    return reservations.delete()[0]
+
+
+def commit(cart_key, lines):
+    """
+    Take the units of a checkout out of the stock.
+
+    Every tracked product is decremented with a conditional UPDATE
+    (... WHERE quantity >= reserved + wanted), counting the units the cart
+    itself holds as available. Must run inside the checkout transaction, so
+    raising OutOfStock rolls back the whole order.
+
+    Args:
+        cart_key (str): The key of the cart.
+        lines (dict): The quantity to take out of the stock per product ID.
+    Raises:
+        OutOfStock: If any product has fewer units available than wanted.
+    """
+
+    held = dict(
+        Reservation.objects.filter(cart_key=cart_key).values_list(
+            "product_id", "quantity"
+        )
+    )
+    # a fixed locking order keeps concurrent checkouts from deadlocking
+    tracked = (
+        StockItem.objects.filter(product_id__in=lines.keys())
+        .order_by("product_id")
+        .values_list("product_id", flat=True)
+    )
+    short = []
+
+    for product_id in tracked:
+        quantity = lines[product_id]
+        own = held.get(product_id, 0)
+        taken = StockItem.objects.filter(
+            product_id=product_id, quantity__gte=F("reserved") - own + quantity
+        ).update(
+            quantity=F("quantity") - quantity,
+            reserved=Greatest(F("reserved") - own, 0),
+        )
+        if not taken:
+            short.append(product_id)
+
+    if short:
+        raise OutOfStock(short)
+
+    Reservation.objects.filter(cart_key=cart_key).delete()
+
+
+def sweep_expired(batch_size=500, now=None):
+    """
+    Release the reservations that expired, in batches.
+
+    Every batch is its own short transaction, so sweeping a large backlog
+    never holds locks for long.
+
+    Args:
+        batch_size (int): The number of reservations released at a time.
+        now (datetime): The current time, timezone.now() if None.
+    Returns:
+        int: The number of released reservations.
+    """
+
+    now = now or timezone.now()
+    released = 0
+
+    while True:
+        ids = list(
+            Reservation.objects.filter(expires__lte=now)
+            .order_by("expires")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return released
+
+        with transaction.atomic():
+            # a reservation renewed since it was listed is kept
+            released += _release(
+                Reservation.objects.filter(pk__in=ids, expires__lte=now)
+            )
@@ -0,0 +1,127 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from market.models import Category, Product
+from monitoring.testing import ORDER_DATA
+from orders.models import Order
+
+from . import stock
+from .models import Reservation, StockItem
+from .stock import OutOfStock, commit, reserve, sweep_expired
+
+
+def create_product(stock=None):
+    category = Category.objects.create(name="Phones", identifier="phones")
+    product = Product.objects.create(
+        category=category, name="Phone", identifier="phone", price=100
+    )
+    if stock is not None:
+        StockItem.objects.create(product=product, quantity=stock)
+    return product
+
+
+class StockTests(TestCase):
+    def test_reserve_never_exceeds_stock(self):
+        product = create_product(stock=3)
+
+        self.assertTrue(reserve("a", product.id, 2))
+        self.assertFalse(reserve("b", product.id, 2))
+        self.assertTrue(reserve("b", product.id, 1))
+        # lowering a reservation gives units back
+        self.assertTrue(reserve("a", product.id, 1))
+        self.assertEqual(StockItem.objects.get().reserved, 2)
+
+    def test_untracked_products_are_unlimited(self):
+        product = create_product()
+
+        self.assertTrue(reserve("a", product.id, 1000))
+        commit("a", {product.id: 1000})
+
+    def test_commit_counts_own_reservation(self):
+        product = create_product(stock=2)
+        reserve("a", product.id, 2)
+
+        with self.assertRaises(OutOfStock):
+            commit("b", {product.id: 1})
+
+        commit("a", {product.id: 2})
+        self.assertEqual(
+            StockItem.objects.values_list("quantity", "reserved").get(), (0, 0)
+        )
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_sweep_releases_expired_reservations(self):
+        product = create_product(stock=5)
+        for key in "abc":
+            reserve(key, product.id, 1)
+        Reservation.objects.filter(cart_key="a").update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(sweep_expired(batch_size=1), 1)
+        self.assertEqual(StockItem.objects.get().reserved, 2)
+
+    def test_sweep_keeps_reservations_renewed_meanwhile(self):
+        product = create_product(stock=5)
+        reserve("a", product.id, 2)
+        Reservation.objects.update(expires=timezone.now() - timedelta(seconds=1))
+
+        release = stock._release
+
+        def renew_then_release(reservations):
+            # the cart is renewed after the sweep listed its reservation
+            reserve("a", product.id, 2)
+            return release(reservations)
+
+        with mock.patch.object(stock, "_release", renew_then_release):
+            self.assertEqual(sweep_expired(), 0)
+
+        self.assertEqual(Reservation.objects.get().quantity, 2)
+        self.assertEqual(StockItem.objects.get().reserved, 2)
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    threads = 20
+    stock = 5
+
+    def test_concurrent_checkouts_never_oversell(self):
+        product = create_product(stock=self.threads)
+        clients = [Client() for _ in range(self.threads)]
+        for client in clients:
+            client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 1})
+
+        # every cart holds one unit, now shrink the stock under their feet
+        Reservation.objects.all().delete()
+        StockItem.objects.update(quantity=self.stock, reserved=0)
+
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def checkout(client):
+            barrier.wait()
+            try:
+                client.post(reverse("orders:create_order"), ORDER_DATA)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # an open connection would keep the WAL files of the test
+                # database around
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=[c]) for c in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        sold = Order.objects.count()
+        remaining = StockItem.objects.get().quantity
+        self.assertGreater(sold, 0, errors)
+        self.assertLessEqual(sold, self.stock)
+        self.assertEqual(remaining, self.stock - sold)
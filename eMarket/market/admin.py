@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, Product
+from .pagination import EstimatedCountPaginator
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,7 +9,22 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'identifier', 'price', 'available', 'created', 'updated']
-    list_filter = ['available', 'created', 'updated']
+    list_display = ['name', 'identifier', 'category', 'price', 'available', 'created', 'updated']
+    # filter on indexed columns only; "updated" has no index
+    list_filter = ['available', 'created', 'category']
     list_editable = ['price', 'available']
+    list_select_related = ['category']
     prepopulated_fields = {'identifier': ('name',)}
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match.url_name.endswith('_changelist'):
+            # leave the description and the image renditions out of the list
+            queryset = queryset.only(
+                'id', 'name', 'identifier', 'price', 'price_version',
+                'available', 'created', 'updated', 'category__name',
+                'category__identifier',
+            )
+        return queryset
@@ -0,0 +1,49 @@
+"""
+Asynchronous versions of the catalog views.
+
+market.urls routes to these instead of those of market.views when
+settings.ASYNC_VIEWS is on, which is the default under ASGI. Django 3.2 has
+no async ORM, no async sessions and no async cache API, so only the views
+with work to do on the event loop have an asynchronous version: answering
+revalidations of cached products. Views needing the database throughout, like the listings, the search
+and the cart, stay synchronous, Django runs them in a thread either way.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+
+from . import views
+from .cache import cached_product, peek_product
+
+
+async def product_detail(request, id, identifier):
+    """
+    Asynchronous product detail view.
+
+    A cached product is checked against the conditional headers on the event
+    loop. The cache lookup itself is blocking, so it runs in the thread pool
+    without waiting for the thread shared by the database work. Only a cache
+    miss and the rendering of the page go to that thread.
+
+    Args:
+        request (HttpRequest): The request object.
+        id (str): The product ID.
+        identifier (str): The product identifier.
+    Returns:
+        HttpResponse: The HTTP response.
+    """
+
+    # the cache client blocks, it must not run on the event loop
+    product = await sync_to_async(peek_product, thread_sensitive=False)(id)
+    if product is False:
+        product = await sync_to_async(cached_product)(id)
+    if product is None or product.identifier != identifier:
+        raise Http404("No product matches the given query.")
+
+    etag, last_modified = views.product_validators(product)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    return await sync_to_async(views.render_product_detail)(request, product)
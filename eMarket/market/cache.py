@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = "catalog:version"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_catalog_cache():
+    """
+    Get the cache backend that holds rendered catalog fragments.
+
+    Returns:
+        BaseCache: The cache configured by settings.CATALOG_CACHE_ALIAS.
+    """
+
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def catalog_version():
+    """
+    Get the current catalog version.
+
+    The version is seeded from the clock rather than 1, so a version key that
+    was evicted or lost never comes back with a value that was used before.
+
+    Returns:
+        int: The current catalog version.
+    """
+
+    cache = get_catalog_cache()
+    version = cache.get(VERSION_KEY)
+
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog fragment by moving to a new version.
+
+    Returns:
+        int: The new catalog version.
+    """
+
+    cache = get_catalog_cache()
+
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # the key is missing, start a fresh version sequence
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        return cache.get(VERSION_KEY)
+
+
+def fragment_key(name, vary_on=(), version=None):
+    """
+    Build the cache key of a rendered fragment.
+
+    Args:
+        name (str): The name of the fragment.
+        vary_on (iterable): The values the fragment depends on.
+        version (int): The catalog version, the current one if None.
+    Returns:
+        str: The cache key.
+    """
+
+    if version is None:
+        version = catalog_version()
+    digest = hashlib.md5(":".join(str(v) for v in vary_on).encode()).hexdigest()
+    return f"catalog:{version}:{name}:{digest}"
+
+
+def get_or_render(name, vary_on, render, version=None):
+    """
+    Get a fragment from the cache, rendering and storing it on a miss.
+
+    Args:
+        name (str): The name of the fragment.
+        vary_on (iterable): The values the fragment depends on.
+        render (callable): Renders the fragment when it is not cached.
+        version (int): The catalog version, the current one if None.
+    Returns:
+        str: The rendered fragment.
+    """
+
+    cache = get_catalog_cache()
+    key = fragment_key(name, vary_on, version)
+    value = cache.get(key)
+
+    if value is not None:
+        _count("hits")
+        return value
+
+    _count("misses")
+    value = render()
+    cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def cached_product(product_id):
+    """
+    Get a product and its category, read through the catalog cache.
+
+    Saving a product or a category moves to a new catalog version, so a
+    cached product is never served after it changed. Missing products are
+    cached as well, so crawlers requesting them do not reach the database.
+
+    Args:
+        product_id (UUID): The ID of the product.
+    Returns:
+        Product: The product, or None if it does not exist.
+    """
+
+    from .models import Product
+
+    def load():
+        product = Product.objects.select_related("category").filter(pk=product_id)
+        return product.first() or False
+
+    return get_or_render("product", [product_id], load) or None
+
+
+def peek_product(product_id):
+    """
+    Get a product from the catalog cache without touching the database.
+
+    Args:
+        product_id (UUID): The ID of the product.
+    Returns:
+        Product: The product, None if it does not exist, or False if it is
+            not cached.
+    """
+
+    product = get_catalog_cache().get(fragment_key("product", [product_id]))
+    if product is None:
+        return False
+    return product or None
+
+
+def _count(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def cache_stats():
+    """
+    Get the fragment cache hit and miss counters of this process.
+
+    Returns:
+        dict: The "hits" and "misses" counters.
+    """
+
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    """Reset the fragment cache hit and miss counters of this process."""
+
+    with _stats_lock:
+        for counter in _stats:
+            _stats[counter] = 0
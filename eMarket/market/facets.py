@@ -0,0 +1,297 @@
+from bisect import bisect_right
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+# the product fields a facet count depends on, by attribute name
+FACET_FIELDS = {"category_id", "available", "price"}
+
+
+def price_band(price):
+    """
+    Get the price band a price falls in.
+
+    Args:
+        price (Decimal): The price.
+    Returns:
+        int: The index of the band in settings.PRICE_FACET_BANDS.
+    """
+
+    return max(bisect_right(settings.PRICE_FACET_BANDS, price) - 1, 0)
+
+
+def band_range(band):
+    """
+    Get the bounds of a price band.
+
+    Args:
+        band (int): The index of the band.
+    Returns:
+        tuple: The lower bound and the upper bound, None for the last band.
+    """
+
+    bounds = settings.PRICE_FACET_BANDS
+    high = bounds[band + 1] if band + 1 < len(bounds) else None
+    return bounds[band], high
+
+
+def band_label(band):
+    low, high = band_range(band)
+    if high is None:
+        return f"Ksh{low:,} and above"
+    if not low:
+        return f"Under Ksh{high:,}"
+    return f"Ksh{low:,} to Ksh{high:,}"
+
+
+def facet_key(product):
+    """
+    Get the facet a product is counted in.
+
+    Args:
+        product (Product): The product.
+    Returns:
+        tuple: The category ID, the availability and the price band.
+    """
+
+    return product.category_id, product.available, price_band(product.price)
+
+
+def facet_fields_changed(update_fields):
+    """
+    Returns whether a save may have changed the facet of a product.
+
+    Args:
+        update_fields (frozenset): The fields saved, None if all were.
+    Returns:
+        bool: False if none of the saved fields affect facet counts.
+    """
+
+    if update_fields is None:
+        return True
+    return bool({"category"} & update_fields or FACET_FIELDS & update_fields)
+
+
+def adjust_facet_count(key, delta):
+    """
+    Add to the number of products in a facet.
+
+    Args:
+        key (tuple): The facet, as returned by facet_key().
+        delta (int): The number of products added, negative if removed.
+    """
+
+    from .models import ProductFacetCount
+
+    category_id, available, band = key
+    counts = ProductFacetCount.objects.filter(
+        category_id=category_id, available=available, price_band=band
+    )
+
+    # a missing row has nothing to remove, e.g. its category was deleted
+    if not counts.update(count=F("count") + delta) and delta > 0:
+        try:
+            with transaction.atomic():
+                counts.create(
+                    category_id=category_id,
+                    available=available,
+                    price_band=band,
+                    count=delta,
+                )
+        except IntegrityError:
+            # another request created the row in the meantime
+            counts.update(count=F("count") + delta)
+
+
+def compute_facet_counts(products):
+    """
+    Count products by facet with a single GROUP BY.
+
+    Args:
+        products (QuerySet): The products to count.
+    Returns:
+        list: The (category ID, availability, price band, count) tuples.
+    """
+
+    bounds = settings.PRICE_FACET_BANDS
+    band = Case(
+        *[
+            When(price__lt=high, then=Value(index))
+            for index, high in enumerate(bounds[1:])
+        ],
+        default=Value(len(bounds) - 1),
+        output_field=IntegerField(),
+    )
+
+    return list(
+        products.order_by()
+        .annotate(band=band)
+        .values_list("category_id", "available", "band")
+        .annotate(count=Count("pk"))
+    )
+
+
+def rebuild_facets():
+    """
+    Recount the products of every facet.
+
+    Returns:
+        int: The number of facet rows written.
+    """
+
+    from .models import Product, ProductFacetCount
+
+    rows = [
+        ProductFacetCount(
+            category_id=category_id, available=available, price_band=band, count=count
+        )
+        for category_id, available, band, count in compute_facet_counts(
+            Product.objects.all()
+        )
+    ]
+
+    with transaction.atomic():
+        ProductFacetCount.objects.all().delete()
+        ProductFacetCount.objects.bulk_create(rows)
+
+    return len(rows)
+
+
+class ProductFacets:
+    """
+    The filter options of a product listing, with their product counts.
+
+    The counts come from the ProductFacetCount table, which holds at most a
+    row per category, availability and price band, so they are computed in
+    Python from a single small query. Nothing is queried until an option is
+    accessed, so a cached sidebar costs no query at all.
+    """
+
+    def __init__(self, category, categories, band, available, sort):
+        """Initialize the facets.
+
+        Args:
+            category (Category): The selected category, or None.
+            categories (QuerySet): Every category.
+            band (int): The selected price band, or None.
+            available (bool): The selected availability.
+            sort (str): The selected sort key, kept by the option URLs.
+        Returns:
+            None
+        """
+
+        self.category = category
+        self.categories = categories
+        self.band = band
+        self.available = available
+        self.sort = sort
+
+    @cached_property
+    def rows(self):
+        from .models import ProductFacetCount
+
+        return list(
+            ProductFacetCount.objects.filter(count__gt=0).values_list(
+                "category_id", "available", "price_band", "count"
+            )
+        )
+
+    def _count(self, category_id=None, available=None, band=None):
+        return sum(
+            count
+            for row_category, row_available, row_band, count in self.rows
+            if (category_id is None or row_category == category_id)
+            and (available is None or row_available == available)
+            and (band is None or row_band == band)
+        )
+
+    def _url(self, category=False, **params):
+        if category is False:
+            category = self.category
+        path = (
+            category.get_absolute_url() if category else reverse("market:product_list")
+        )
+
+        # the options only keep known parameters, they are cached and shared
+        query = {
+            "sort": self.sort,
+            "price": self.band,
+            "available": None if self.available else 0,
+            **params,
+        }
+        query = urlencode(
+            {key: value for key, value in query.items() if value is not None}
+        )
+        return f"{path}?{query}" if query else path
+
+    @cached_property
+    def category_options(self):
+        options = [
+            {
+                "label": "All",
+                "count": self._count(available=self.available, band=self.band),
+                "url": self._url(None),
+                "selected": self.category is None,
+            }
+        ]
+        for category in self.categories:
+            options.append(
+                {
+                    "label": category.name,
+                    "count": self._count(category.pk, self.available, self.band),
+                    "url": self._url(category),
+                    "selected": self.category is not None
+                    and category.pk == self.category.pk,
+                }
+            )
+        return options
+
+    @cached_property
+    def price_options(self):
+        category_id = self.category.pk if self.category else None
+        options = [
+            {
+                "label": "Any price",
+                "count": self._count(category_id, self.available),
+                "url": self._url(price=None),
+                "selected": self.band is None,
+            }
+        ]
+        for band in range(len(settings.PRICE_FACET_BANDS)):
+            options.append(
+                {
+                    "label": band_label(band),
+                    "count": self._count(category_id, self.available, band),
+                    "url": self._url(price=band),
+                    "selected": band == self.band,
+                }
+            )
+        return options
+
+    @cached_property
+    def availability_options(self):
+        category_id = self.category.pk if self.category else None
+        return [
+            {
+                "label": label,
+                "count": self._count(category_id, available, self.band),
+                "url": self._url(available=None if available else 0),
+                "selected": available == self.available,
+            }
+            for label, available in (("Available", True), ("Unavailable", False))
+        ]
+
+    @cached_property
+    def sort_options(self):
+        return [
+            {
+                "label": label,
+                "url": self._url(sort=sort),
+                "selected": sort == self.sort,
+            }
+            for label, sort in (("Name", None), ("Newest", "newest"))
+        ]
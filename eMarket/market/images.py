@@ -0,0 +1,228 @@
+import hashlib
+import io
+import logging
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image
+
+from .storage import content_addressed_storage
+
+logger = logging.getLogger(__name__)
+
+# the derivatives rendered for every product image: label -> bounding box
+DERIVATIVE_SIZES = {
+    "thumbnail": 150,
+    "card": 300,
+    "detail": 800,
+}
+
+# the encodings of every derivative: file extension -> PIL format and options
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+
+def content_hash(data):
+    """
+    Hash the contents of an image.
+
+    Args:
+        data (bytes): The contents of the image.
+    Returns:
+        str: The hex SHA-256 digest of the contents.
+    """
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def render_derivatives(data):
+    """
+    Render every derivative of an image.
+
+    This runs in a worker process of the pipeline, so it only deals with
+    bytes and never touches the database or the storage.
+
+    Args:
+        data (bytes): The contents of the source image.
+    Returns:
+        dict: For every label, the width, the height and the encoded
+            contents of each format.
+    """
+
+    source = Image.open(io.BytesIO(data))
+    source.load()
+
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+
+    derivatives = {}
+    for label, size in DERIVATIVE_SIZES.items():
+        img = source.copy()
+        # thumbnail() keeps the aspect ratio and never upscales
+        img.thumbnail((size, size), Image.LANCZOS)
+
+        encoded = {}
+        for extension, (image_format, options) in DERIVATIVE_FORMATS.items():
+            out = img.convert("RGB") if image_format == "JPEG" else img
+            buffer = io.BytesIO()
+            out.save(buffer, format=image_format, **options)
+            encoded[extension] = buffer.getvalue()
+
+        derivatives[label] = {
+            "width": img.width,
+            "height": img.height,
+            "files": encoded,
+        }
+
+    return derivatives
+
+
+class DerivativePipeline:
+    """
+    Pipeline rendering the derivatives of product images.
+
+    Product ids are put on a job queue drained by a dispatcher thread, which
+    reads and hashes the source image and hands the resizing and encoding to
+    a process pool. When a job is done its files are written to the
+    content-addressed storage and recorded on the product. With no workers,
+    jobs run inline.
+
+    The pipeline is run by the process_images command, the image worker:
+    web requests only clear the derivatives of a product whose image they
+    replace, which queues it for the worker.
+    """
+
+    def __init__(self, workers):
+        """Initialize the pipeline.
+
+        Args:
+            workers (int): The size of the process pool, 0 to run inline.
+        Returns:
+            None
+        """
+
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self._executor = None
+        self._dispatcher = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, product_id):
+        """
+        Schedule the derivatives of a product to be rendered.
+
+        Args:
+            product_id (UUID): The ID of the product.
+        """
+
+        if not self.workers:
+            try:
+                job = self._prepare(product_id)
+                if job:
+                    self._record(job, render_derivatives(job["data"]))
+            except Exception:
+                logger.exception("Could not process image of product %s", product_id)
+            return
+
+        self._start()
+        self.jobs.put(product_id)
+
+    def wait(self):
+        """Block until every submitted job is done."""
+
+        self.jobs.join()
+        with self._idle:
+            self._idle.wait_for(lambda: not self._pending)
+
+    def _start(self):
+        with self._lock:
+            if self._dispatcher is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._dispatcher = threading.Thread(
+                    target=self._drain, name="image-derivatives", daemon=True
+                )
+                self._dispatcher.start()
+
+    def _drain(self):
+        while True:
+            product_id = self.jobs.get()
+            try:
+                job = self._prepare(product_id)
+                if job:
+                    future = self._executor.submit(render_derivatives, job["data"])
+                    with self._lock:
+                        self._pending.add(future)
+                    future.add_done_callback(partial(self._finish, job))
+            except Exception:
+                logger.exception("Could not schedule image of product %s", product_id)
+            finally:
+                connection.close()
+                self.jobs.task_done()
+
+    def _finish(self, job, future):
+        try:
+            self._record(job, future.result())
+        except Exception:
+            logger.exception("Could not process image of product %s", job["id"])
+        finally:
+            connection.close()
+            with self._idle:
+                self._pending.discard(future)
+                self._idle.notify_all()
+
+    def _prepare(self, product_id):
+        from .models import Product
+
+        product = (
+            Product.objects.filter(pk=product_id)
+            .only("id", "image", "image_hash", "derivatives")
+            .first()
+        )
+        if product is None or not product.image:
+            return None
+
+        with product.image.open("rb") as f:
+            data = f.read()
+        digest = content_hash(data)
+
+        # the same upload was already processed, nothing to do
+        if digest == product.image_hash and product.derivatives:
+            return None
+
+        return {
+            "id": product.pk,
+            "image": product.image.name,
+            "hash": digest,
+            "data": data,
+        }
+
+    def _record(self, job, rendered):
+        from .cache import bump_catalog_version
+        from .models import Product
+
+        derivatives = {}
+        for label, rendition in rendered.items():
+            entry = {"width": rendition["width"], "height": rendition["height"]}
+            for extension, contents in rendition["files"].items():
+                # the storage names files by content, identical renditions
+                # of different uploads share one file
+                entry[extension] = content_addressed_storage.save(
+                    f"derivatives/{label}.{extension}", ContentFile(contents)
+                )
+            derivatives[label] = entry
+
+        # only record the derivatives if the image was not replaced meanwhile
+        updated = Product.objects.filter(pk=job["id"], image=job["image"]).update(
+            image_hash=job["hash"], derivatives=derivatives
+        )
+        if updated:
+            bump_catalog_version()
+
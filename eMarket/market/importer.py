@@ -0,0 +1,376 @@
+import csv
+import json
+import os
+import time
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache import bump_catalog_version
+from .facets import rebuild_facets
+from .models import Category, Product
+from .search import get_search_backend
+from .storage import content_addressed_storage
+
+# the columns of an import or export file, in order
+PRODUCT_COLUMNS = [
+    "id",
+    "category",
+    "name",
+    "identifier",
+    "description",
+    "price",
+    "available",
+    "image",
+]
+
+# the product fields an import writes
+IMPORTED_FIELDS = [
+    "category",
+    "name",
+    "identifier",
+    "description",
+    "price",
+    "available",
+    "image",
+]
+
+# the product fields written when an import updates a product
+UPDATED_FIELDS = IMPORTED_FIELDS + ["image_hash", "derivatives", "updated"]
+
+
+class InvalidRow(ValueError):
+    """Raised when a row of an import file is invalid."""
+
+
+def read_rows(stream, format):
+    """
+    Read the rows of an import file, one at a time.
+
+    Args:
+        stream (file): The text stream of the file.
+        format (str): "csv", with a header line, or "jsonl".
+    Returns:
+        iterator: The rows, as dicts.
+    """
+
+    if format == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_rows(stream, format, rows):
+    """
+    Write the rows of an export file, one at a time.
+
+    Args:
+        stream (file): The text stream of the file.
+        format (str): "csv", with a header line, or "jsonl".
+        rows (iterable): The rows, as dicts keyed by PRODUCT_COLUMNS.
+    """
+
+    if format == "csv":
+        writer = csv.DictWriter(stream, PRODUCT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("", "0", "false", "no", "n")
+
+
+class ProductImporter:
+    """
+    Upserts products from rows, a chunk at a time.
+
+    Every chunk is written in its own transaction with one query to find
+    the existing products, one batched UPDATE and one bulk_create(), so no
+    signal fires and no image is resized per row. Products are matched by
+    "id" when the row has one, otherwise by category and identifier. Image
+    files are copied to the content-addressed storage as they are; their
+    derivatives are left to the process_images command. The catalog version,
+    the facet counts and the search index are refreshed once at the end.
+    """
+
+    def __init__(self, chunk_size=2000, create_categories=False, image_root=None):
+        """Initialize the importer.
+
+        Args:
+            chunk_size (int): The number of rows written at a time.
+            create_categories (bool): Whether to create unknown categories.
+            image_root (str): The directory relative image paths are read
+                from, defaults to the current directory.
+        Returns:
+            None
+        """
+
+        self.chunk_size = chunk_size
+        self.create_categories = create_categories
+        self.image_root = image_root or os.getcwd()
+        self.categories = dict(Category.objects.values_list("identifier", "id"))
+        self.search = get_search_backend()
+        self.created = self.updated = self.skipped = 0
+        self.errors = []
+
+    def run(self, rows, progress=None):
+        """
+        Import every row.
+
+        Args:
+            rows (iterable): The rows, as dicts keyed by PRODUCT_COLUMNS.
+            progress (callable): Called with the importer after every chunk.
+        Returns:
+            ProductImporter: The importer, with its counters.
+        """
+
+        self.started = time.perf_counter()
+        chunk = []
+
+        for number, row in enumerate(rows, start=1):
+            try:
+                chunk.append(self.build(row))
+            except InvalidRow as e:
+                self.skipped += 1
+                self.errors.append((number, str(e)))
+
+            if len(chunk) == self.chunk_size:
+                self.write(chunk)
+                chunk = []
+                if progress:
+                    progress(self)
+
+        if chunk:
+            self.write(chunk)
+            if progress:
+                progress(self)
+
+        rebuild_facets()
+        bump_catalog_version()
+        if self.search is not None:
+            self.search.optimize()
+        return self
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.skipped
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0
+
+    def category_id(self, identifier):
+        if identifier in self.categories:
+            return self.categories[identifier]
+        if not self.create_categories:
+            raise InvalidRow(f"Unknown category: {identifier!r}.")
+
+        category, _ = Category.objects.get_or_create(
+            identifier=identifier,
+            defaults={"name": identifier.replace("-", " ").capitalize()},
+        )
+        self.categories[identifier] = category.id
+        return category.id
+
+    def build(self, row):
+        """
+        Build the unsaved product of a row.
+
+        Args:
+            row (dict): The row.
+        Returns:
+            Product: The product, with a new ID if the row has none.
+        Raises:
+            InvalidRow: If the row is invalid.
+        """
+
+        name = (row.get("name") or "").strip()
+        if not name:
+            raise InvalidRow("Missing name.")
+
+        try:
+            # rejects NaN, infinities and prices wider than the column
+            price = Product._meta.get_field("price").clean(
+                str(row.get("price", "")).strip(), None
+            )
+        except ValidationError:
+            raise InvalidRow(f"Invalid price: {row.get('price')!r}.")
+        if price < 0:
+            raise InvalidRow(f"Negative price: {row.get('price')!r}.")
+
+        try:
+            pk = uuid.UUID(str(row["id"])) if row.get("id") else None
+        except ValueError:
+            raise InvalidRow(f"Invalid id: {row['id']!r}.")
+
+        product = Product(
+            category_id=self.category_id((row.get("category") or "").strip()),
+            name=name,
+            identifier=(row.get("identifier") or "").strip() or slugify(name),
+            description=row.get("description") or "",
+            price=price,
+            available=parse_bool(row.get("available", True)),
+            image=self.store_image((row.get("image") or "").strip()),
+        )
+        if pk is not None:
+            product.id = pk
+        product._imported_pk = pk
+        return product
+
+    def store_image(self, path):
+        """
+        Copy an image into the content-addressed storage.
+
+        Args:
+            path (str): A name already in the storage, or the path of a file.
+        Returns:
+            str: The name of the image in the storage, "" if there is none.
+        Raises:
+            InvalidRow: If the file does not exist.
+        """
+
+        if not path or content_addressed_storage.exists(path):
+            return path
+
+        full_path = os.path.join(self.image_root, path)
+        if not os.path.isfile(full_path):
+            raise InvalidRow(f"Missing image: {path!r}.")
+
+        with open(full_path, "rb") as f:
+            # identical files are stored once, see ContentAddressedStorage
+            return content_addressed_storage.save(
+                f"products/{os.path.basename(path)}", File(f)
+            )
+
+    def write(self, chunk):
+        """
+        Upsert a chunk of products.
+
+        Args:
+            chunk (list): The products built from the rows.
+        """
+
+        with transaction.atomic():
+            existing = self.find_existing(chunk)
+            to_create, to_update = {}, {}
+            now = timezone.now()
+
+            for product in chunk:
+                key = product._imported_pk or (product.category_id, product.identifier)
+                target = existing.get(key)
+
+                if target is None:
+                    # later rows of the chunk for the same product update it
+                    existing[key] = to_create[product.pk] = product
+                    continue
+
+                if product.image.name != target.image.name:
+                    target.image_hash = ""
+                    target.derivatives = {}
+                for field in IMPORTED_FIELDS:
+                    # by attname, "category" would load the related category
+                    attname = Product._meta.get_field(field).attname
+                    setattr(target, attname, getattr(product, attname))
+                target.updated = now
+                if target.pk not in to_create:
+                    to_update[target.pk] = target
+
+            Product.objects.bulk_create(to_create.values())
+            self.update(to_update.values())
+
+            if self.search is not None:
+                self.search.index([*to_create.values(), *to_update.values()])
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+    def update(self, products):
+        """
+        Write the imported fields of existing products.
+
+        A single prepared UPDATE run for every product; bulk_update() builds
+        a CASE per field over the whole batch, which is many times slower.
+        The price version is bumped by the UPDATE itself when the stored
+        price differs, so concurrent price changes all count.
+
+        Args:
+            products (iterable): The products to write.
+        """
+
+        fields = [Product._meta.get_field(name) for name in UPDATED_FIELDS]
+        pk = Product._meta.pk
+        quote = connection.ops.quote_name
+        price = Product._meta.get_field("price")
+        version = quote(Product._meta.get_field("price_version").column)
+        # the right-hand sides of SET read the row as it was before the UPDATE
+        sql = (
+            "UPDATE {} SET {}, {} = {} + CASE WHEN {} <> %s THEN 1 ELSE 0 END "
+            "WHERE {} = %s"
+        ).format(
+            quote(Product._meta.db_table),
+            ", ".join(f"{quote(field.column)} = %s" for field in fields),
+            version,
+            version,
+            quote(price.column),
+            quote(pk.column),
+        )
+
+        params = [
+            [
+                field.get_db_prep_save(getattr(product, field.attname), connection)
+                for field in fields
+            ]
+            + [
+                price.get_db_prep_save(product.price, connection),
+                pk.get_db_prep_save(product.pk, connection),
+            ]
+            for product in products
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def find_existing(self, chunk):
+        """
+        Find the stored products of a chunk with a single query.
+
+        Args:
+            chunk (list): The products built from the rows.
+        Returns:
+            dict: The stored products, keyed by primary key and by
+                (category ID, identifier).
+        """
+
+        pks = {p._imported_pk for p in chunk if p._imported_pk}
+        pairs = {(p.category_id, p.identifier) for p in chunk if not p._imported_pk}
+
+        products = Product.objects.none()
+        if pks:
+            products = Product.objects.filter(pk__in=pks)
+        if pairs:
+            # a superset of the pairs, filtered below; an OR of thousands of
+            # pairs would exceed the expression depth limit of SQLite
+            products = products | Product.objects.filter(
+                category_id__in={category for category, _ in pairs},
+                identifier__in={identifier for _, identifier in pairs},
+            )
+
+        existing = {}
+        for product in products.order_by():
+            key = (product.category_id, product.identifier)
+            if product.pk in pks:
+                existing[product.pk] = product
+            if key in pairs:
+                existing.setdefault(key, product)
+        return existing
@@ -0,0 +1,80 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market.importer import write_rows
+from market.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every product to a CSV (with a header line) or JSONL file "
+        "that import_products can read back. Products are read from the "
+        "database in chunks and written as they are read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-", help="The file to write, - for stdout."
+        )
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Format of the file, guessed from its extension by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of products read from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("jsonl" if path.endswith(".jsonl") else "csv")
+
+        products = (
+            Product.objects.order_by()
+            .values_list(
+                "id",
+                "category__identifier",
+                "name",
+                "identifier",
+                "description",
+                "price",
+                "available",
+                "image",
+            )
+            .iterator(chunk_size=options["chunk_size"])
+        )
+        rows = (
+            {
+                "id": str(pk),
+                "category": category,
+                "name": name,
+                "identifier": identifier,
+                "description": description,
+                "price": str(price),
+                "available": available,
+                "image": image,
+            }
+            for (
+                pk,
+                category,
+                name,
+                identifier,
+                description,
+                price,
+                available,
+                image,
+            ) in products
+        )
+
+        try:
+            if path == "-":
+                write_rows(sys.stdout, format, rows)
+            else:
+                with open(path, "w", newline="", encoding="utf-8") as stream:
+                    write_rows(stream, format, rows)
+        except OSError as e:
+            raise CommandError(e)
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from market.importer import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV (with a header line) or JSONL "
+        "file with the columns id, category, name, identifier, description, "
+        "price, available and image. Rows with an id update that product, "
+        "other rows update the product with the same category and "
+        "identifier. Image derivatives are not rendered, run process_images "
+        "afterwards or pass --process-images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The file to import, - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Format of the file, guessed from its extension by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of rows written per transaction.",
+        )
+        parser.add_argument(
+            "--create-categories",
+            action="store_true",
+            help="Create the categories that do not exist yet.",
+        )
+        parser.add_argument(
+            "--image-root",
+            help="Directory relative image paths are read from, defaults to "
+            "the directory of the file.",
+        )
+        parser.add_argument(
+            "--process-images",
+            action="store_true",
+            help="Render the derivatives of the imported images afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("jsonl" if path.endswith(".jsonl") else "csv")
+        image_root = options["image_root"]
+        if image_root is None and path != "-":
+            image_root = os.path.dirname(os.path.abspath(path))
+
+        importer = ProductImporter(
+            chunk_size=options["chunk_size"],
+            create_categories=options["create_categories"],
+            image_root=image_root,
+        )
+
+        try:
+            if path == "-":
+                stream = nullcontext(sys.stdin)
+            else:
+                stream = open(path, newline="", encoding="utf-8")
+            with stream as stream:
+                importer.run(read_rows(stream, format), progress=self.progress)
+        except OSError as e:
+            raise CommandError(e)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        for number, message in importer.errors[:20]:
+            self.stderr.write(f"Row {number}: {message}")
+        if len(importer.errors) > 20:
+            self.stderr.write(f"... and {len(importer.errors) - 20} more errors.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {importer.created}, updated {importer.updated} and "
+                f"skipped {importer.skipped} products "
+                f"({importer.rate:.0f} rows/sec)."
+            )
+        )
+
+        if options["process_images"]:
+            call_command("process_images", stdout=self.stdout, stderr=self.stderr)
+
+    def progress(self, importer):
+        self.stdout.write(f"{importer.rows} rows, {importer.rate:.0f} rows/sec")
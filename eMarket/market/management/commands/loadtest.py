@@ -0,0 +1,156 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test running servers with many concurrent slow clients and "
+        "compare their requests/sec and latency. Start the servers to compare "
+        "first, e.g.\n"
+        "  gunicorn eMarket.wsgi -w 4 -b 127.0.0.1:8001\n"
+        "  uvicorn eMarket.asgi:application --workers 4 --port 8002\n"
+        "then run\n"
+        "  manage.py loadtest wsgi=http://127.0.0.1:8001/ "
+        "asgi=http://127.0.0.1:8002/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets",
+            nargs="+",
+            help="Servers to load test, as label=url or url.",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path requested on every server, may be repeated; "
+            "defaults to the path of the target URL.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=100, help="Concurrent clients."
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds per server."
+        )
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=256,
+            help="Bytes a client sends or reads at a time.",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0.01,
+            help="Seconds a client waits between two chunks, 0 for fast clients.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'server':<20} {'requests':>9} {'errors':>7} {'req/s':>9}"
+            f" {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        )
+
+        for target in options["targets"]:
+            label, _, url = target.rpartition("=")
+            parts = urlsplit(url)
+            if parts.scheme != "http" or not parts.hostname:
+                raise CommandError(f"Not an http:// URL: {url}")
+
+            paths = options["paths"] or [parts.path or "/"]
+            latencies, errors, elapsed = asyncio.run(
+                self.run(parts.hostname, parts.port or 80, paths, options)
+            )
+
+            if latencies:
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                self.stdout.write(
+                    f"{label or parts.netloc:<20} {len(latencies):>9} {errors:>7}"
+                    f" {len(latencies) / elapsed:>9.1f}"
+                    f" {statistics.median(latencies):>9.1f} {p99:>9.1f}"
+                    f" {latencies[-1]:>9.1f}"
+                )
+            else:
+                self.stdout.write(f"{label or parts.netloc:<20} no successful request")
+
+    async def run(self, host, port, paths, options):
+        """
+        Run the clients against a server until the duration is over.
+
+        Args:
+            host (str): The host of the server.
+            port (int): The port of the server.
+            paths (list): The paths requested in turn by every client.
+            options (dict): The command options.
+        Returns:
+            tuple: The latencies of the successful requests in milliseconds,
+                the number of failed requests and the elapsed seconds.
+        """
+
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        deadline = start + options["duration"]
+
+        async def client(number):
+            nonlocal errors
+            i = number
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                began = time.perf_counter()
+                try:
+                    status = await self.request(host, port, path, options)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    status = None
+                if status is not None and status < 400:
+                    latencies.append((time.perf_counter() - began) * 1000)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(client(n) for n in range(options["concurrency"])))
+        return latencies, errors, time.perf_counter() - start
+
+    async def request(self, host, port, path, options):
+        """
+        Send a request and read the whole response, slowly.
+
+        Args:
+            host (str): The host of the server.
+            port (int): The port of the server.
+            path (str): The path requested.
+            options (dict): The command options.
+        Returns:
+            int: The status code of the response.
+        """
+
+        chunk, delay = options["chunk"], options["delay"]
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            data = (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "User-Agent: eMarket-loadtest\r\n"
+                "Accept: text/html\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            for offset in range(0, len(data), chunk):
+                writer.write(data[offset : offset + chunk])
+                await writer.drain()
+                if delay:
+                    await asyncio.sleep(delay)
+
+            status_line = await reader.readline()
+            status = int(status_line.split()[1])
+            while await reader.read(chunk):
+                if delay:
+                    await asyncio.sleep(delay)
+            return status
+        finally:
+            writer.close()
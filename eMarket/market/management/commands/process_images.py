@@ -0,0 +1,96 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from market.images import DerivativePipeline
+from market.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the derivatives of every product image that has none yet, "
+        "such as the images of imported products or of products saved with "
+        "a new image. With --watch, keep running and render new images as "
+        "they are saved, as a worker next to the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Size of the process pool, defaults to the number of CPUs, "
+            "0 renders in this process.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products read from the database at a time.",
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Keep looking for new images every IMAGE_WATCH_INTERVAL "
+            "seconds instead of exiting.",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        pipeline = DerivativePipeline(os.cpu_count() if workers is None else workers)
+        # the images already tried, an image that cannot be rendered is not
+        # tried again until it is replaced
+        tried = set()
+
+        while True:
+            start = time.perf_counter()
+            count = self.process(pipeline, tried, options["batch_size"])
+            elapsed = time.perf_counter() - start
+
+            if count or not options["watch"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Processed {count} images in {elapsed:.2f}s.")
+                )
+            if not options["watch"]:
+                break
+            time.sleep(settings.IMAGE_WATCH_INTERVAL)
+
+    def process(self, pipeline, tried, batch_size):
+        """
+        Render the derivatives of the images that have none, in batches.
+
+        Args:
+            pipeline (DerivativePipeline): The pipeline rendering them.
+            tried (set): The product IDs and image names already submitted,
+                updated with the new ones.
+            batch_size (int): Number of products read at a time.
+        Returns:
+            int: The number of images submitted.
+        """
+
+        pending = (
+            Product.objects.exclude(image="")
+            .filter(derivatives={})
+            .values_list("pk", "image")
+            .order_by("pk")
+        )
+        count = 0
+        last = None
+
+        while True:
+            # short reads, an open cursor would block the pipeline's writes
+            batch = pending.filter(pk__gt=last) if last else pending
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            for product_id, image in batch:
+                if (product_id, image) not in tried:
+                    tried.add((product_id, image))
+                    pipeline.submit(product_id)
+                    count += 1
+            last = batch[-1][0]
+
+        pipeline.wait()
+        return count
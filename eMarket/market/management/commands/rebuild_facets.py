@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from market.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the products of every catalog facet. The counts are kept up "
+        "to date as products are saved, this is only needed after changing "
+        "PRICE_FACET_BANDS or after bulk changes that bypass save()."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_facets()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {count} facet counts in {elapsed:.2f}s.")
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market.search import get_search_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index of the products. The index is "
+        "kept up to date as products are saved, this is only needed after "
+        "bulk changes that bypass save(), such as queryset updates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products indexed at a time.",
+        )
+
+    def handle(self, *args, **options):
+        if get_search_backend() is None:
+            raise CommandError("The database has no full-text search backend.")
+
+        start = time.perf_counter()
+        count = rebuild_index(options["batch_size"])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {count} products in {elapsed:.2f}s.")
+        )
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database to the replica files of "
+        "DATABASE_REPLICAS, to try the read replicas locally, e.g.\n"
+        "  DATABASE_REPLICAS=replica1.sqlite3,replica2.sqlite3 "
+        "manage.py sync_replicas\n"
+        "Run it again to let the replicas catch up. PostgreSQL replicas are "
+        "kept up to date by streaming replication."
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only SQLite replicas are synced by this command.")
+        if not settings.REPLICA_DATABASES:
+            raise CommandError("No replica configured, set DATABASE_REPLICAS.")
+
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            replica = connections[alias]
+            replica.ensure_connection()
+
+            start = time.perf_counter()
+            # an online backup, the primary stays usable while it is copied
+            primary.connection.backup(replica.connection)
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Synced {alias} ({replica.settings_dict['NAME']}) "
+                    f"in {elapsed:.2f}s."
+                )
+            )
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:35
+
+from django.db import migrations, models
+import market.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0005_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(storage=market.storage.ContentAddressedStorage(), upload_to='products'),
+        ),
+    ]
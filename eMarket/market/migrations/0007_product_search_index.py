@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# the index as it was created, frozen here since market.search may change:
+# an FTS5 table on SQLite, a GIN index on a tsvector expression on PostgreSQL
+FTS_TABLE = 'market_product_fts'
+PG_INDEX = 'market_product_search_idx'
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON market_product '
+            f'USING GIN (({PG_DOCUMENT}))'
+        )
+        return
+    if vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        'name, description, product_id UNINDEXED, category_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+    Product = apps.get_model('market', 'Product')
+    products = Product.objects.using(schema_editor.connection.alias).filter(
+        available=True
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} '
+            '(rowid, name, description, product_id, category_id) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            (
+                (
+                    product.id.int >> 65,
+                    product.name,
+                    product.description,
+                    product.id.hex,
+                    product.category_id.hex,
+                )
+                for product in products.iterator(chunk_size=1000)
+            ),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0006_product_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
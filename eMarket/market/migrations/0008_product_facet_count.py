@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Value, When
+import django.db.models.deletion
+
+
+def count_facets(apps, schema_editor):
+    Product = apps.get_model('market', 'Product')
+    ProductFacetCount = apps.get_model('market', 'ProductFacetCount')
+
+    # the band of every product, from the bands configured when migrating
+    bounds = settings.PRICE_FACET_BANDS
+    band = Case(
+        *[When(price__lt=high, then=Value(index)) for index, high in enumerate(bounds[1:])],
+        default=Value(len(bounds) - 1),
+        output_field=IntegerField(),
+    )
+    counts = (
+        Product.objects.order_by()
+        .annotate(band=band)
+        .values_list('category_id', 'available', 'band')
+        .annotate(count=Count('pk'))
+    )
+    ProductFacetCount.objects.bulk_create(
+        ProductFacetCount(
+            category_id=category_id, available=available, price_band=band, count=count
+        )
+        for category_id, available, band, count in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0007_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('available', models.BooleanField()),
+                ('price_band', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='market.category')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productfacetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'available', 'price_band'), name='unique_product_facet'),
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0008_product_facet_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'identifier'], name='product_category_ident_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0009_product_category_identifier_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='price_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,10 +1,9 @@
-from django.core.files.base import ContentFile
 from django.db import models
 from django.urls import reverse
-from PIL import Image
 from uuid import uuid4
 
-import io
+from .facets import FACET_FIELDS, facet_fields_changed, facet_key
+from .storage import content_addressed_storage
 
 
 class Category(models.Model):
@@ -15,11 +14,14 @@ class Category(models.Model):
         id (UUIDField): The primary key of the model.
         name (CharField): The name of the category.
         identifier (SlugField): The identifier of the category.
+        updated (DateTimeField): The date and time the category was last
+            updated.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     name = models.CharField(max_length=200)
     identifier = models.SlugField(max_length=200, unique=True)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         """
@@ -69,9 +71,13 @@ class Product(models.Model):
         image (ImageField): The image of the product.
         description (TextField): The description of the product.
         price (DecimalField): The price of the product.
+        price_version (PositiveIntegerField): Bumped whenever the price
+            changes, carts compare it to reprice their lines.
         available (BooleanField): The availability of the product.
         created (DateTimeField): The date and time the product was created.
         updated (DateTimeField): The date and time the product was last updated.
+        image_hash (CharField): The content hash of the processed image.
+        derivatives (JSONField): The resized renditions of the image.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -80,12 +86,22 @@ class Product(models.Model):
     )
     name = models.CharField(max_length=200)
     identifier = models.SlugField(max_length=200)
-    image = models.ImageField(upload_to="products/%Y/%m/%d", blank=False)
+    image = models.ImageField(
+        upload_to="products", storage=content_addressed_storage, blank=False
+    )
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    price_version = models.PositiveIntegerField(default=1, editable=False)
     available = models.BooleanField(default=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+
+    # the image name, facet and price as loaded from the database, see from_db()
+    _loaded_image = None
+    _loaded_facet = None
+    _loaded_price = None
 
     class Meta:
         """
@@ -101,6 +117,32 @@ class Product(models.Model):
             models.Index(fields=["id", "identifier"]),
             models.Index(fields=["name"]),
             models.Index(fields=["-created"]),
+            # keyset pagination of the catalog, see market.pagination
+            models.Index(
+                fields=["name", "id"],
+                condition=models.Q(available=True),
+                name="product_available_name_idx",
+            ),
+            models.Index(
+                fields=["-created", "-id"],
+                condition=models.Q(available=True),
+                name="product_available_created_idx",
+            ),
+            models.Index(
+                fields=["category", "name", "id"],
+                condition=models.Q(available=True),
+                name="product_category_name_idx",
+            ),
+            models.Index(
+                fields=["category", "-created", "-id"],
+                condition=models.Q(available=True),
+                name="product_category_created_idx",
+            ),
+            # matching of imported rows, see market.importer
+            models.Index(
+                fields=["category", "identifier"],
+                name="product_category_ident_idx",
+            ),
         ]
 
     def __str__(self):
@@ -122,64 +164,142 @@ class Product(models.Model):
 
         return reverse("market:product_detail", args=[self.id, self.identifier])
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Creates an instance from a database row.
+        Remembers the loaded image to detect when it is replaced, the
+        loaded facet to keep the facet counts up to date, and the loaded
+        price to bump the price version when it changes.
+
+        Args:
+            db (str): The database alias.
+            field_names (list): The loaded field names.
+            values (list): The loaded values.
+        Returns:
+            Product: The product instance.
+        """
+
+        instance = super().from_db(db, field_names, values)
+        if "image" in field_names:
+            instance._loaded_image = values[field_names.index("image")]
+        if FACET_FIELDS.issubset(field_names):
+            instance._loaded_facet = facet_key(instance)
+        if "price" in field_names:
+            instance._loaded_price = values[field_names.index("price")]
+        return instance
+
+    def image_changed(self):
+        """
+        Returns whether the image differs from the one loaded from the database.
+
+        Returns:
+            bool: True if the image was set or replaced.
+        """
+
+        if "image" in self.get_deferred_fields():
+            return False
+        return self.image.name != self._loaded_image
+
     def save(self, *args, **kwargs):
         """
         Saves the model instance.
-        Resizes the image if necessary.
-        Calls the "real" save() method.
-        Updates the image field.
-        Raises an exception if an error occurs.
+        Clears the image derivatives if the image has changed, which queues
+        them for the image worker (see the process_images command), and
+        bumps the price version if the price has changed. The facet counts are updated
+        by market.signals, from the facet remembered here.
 
         Args:
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
         """
 
-        # Determine if the image needs to be resized
-        if self._state.adding:
-            # This is a new product, so resize the image
-            original_image = self.image
-        else:
-            # This is an existing product, check if the image has changed
-            if self.image and self.image != self._old_image:
-                original_image = self.image
-            else:
-                # No image change detected, skip resizing
-                return
+        image_changed = self.image_changed()
+        if image_changed:
+            self.image_hash = ""
+            self.derivatives = {}
+
+        update_fields = kwargs.get("update_fields")
+        saves_price = update_fields is None or "price" in update_fields
+        bump_price_version = saves_price and self._loaded_price not in (
+            None,
+            self.price,
+        )
+        if bump_price_version:
+            # incremented by the UPDATE, so concurrent price changes all count
+            self.price_version = models.F("price_version") + 1
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "price_version"}
+
+        track_facet = facet_fields_changed(
+            None if update_fields is None else frozenset(update_fields)
+        )
+        if track_facet and not self._state.adding and self._loaded_facet is None:
+            # not loaded with every facet field, read the stored ones
+            stored = (
+                Product.objects.filter(pk=self.pk)
+                .only("category", "available", "price")
+                .first()
+            )
+            self._loaded_facet = stored and stored._loaded_facet
 
-        # Call the "real" save() method to save the initial state of the model
         super(Product, self).save(*args, **kwargs)
 
-        if original_image:
-            try:
-                # Open the image file in memory
-                img = Image.open(original_image.path)
-                # Define the desired size and aspect ratio
-                max_width = 300  # Adjusted for better display in cards
-                max_height = 300  # Adjusted for a 1:1 aspect ratio
-                aspect_ratio = max_width / max_height
-
-                # Calculate the new dimensions based on the aspect ratio
-                width, height = img.size
-                if width > height:
-                    new_width = max_width
-                    new_height = int(new_width / aspect_ratio)
-                else:
-                    new_height = max_height
-                    new_width = int(new_height * aspect_ratio)
-
-                # Resize the image
-                resized_img_io = io.BytesIO()
-                img.resize((new_width, new_height), Image.ANTIALIAS)
-                img.save(resized_img_io, format="JPEG")
-
-                # Create a new content file with the resized image
-                new_image = ContentFile(
-                    resized_img_io.getvalue(), name=original_image.name
-                )
-
-                # Replace the original image with the resized one
-                self.image.save(original_image.name, new_image, save=False)
-                self.save()  # Save again to update the image field
-            except Exception as e:
-                print(f"Error processing image {e}")
+        if bump_price_version:
+            self.refresh_from_db(fields=["price_version"])
+        self._loaded_image = self.image.name
+        if saves_price:
+            self._loaded_price = self.price
+        if track_facet:
+            self._loaded_facet = facet_key(self)
+
+
+class ProductFacetCount(models.Model):
+    """
+    Number of products in a facet of the catalog.
+
+    Kept up to date by market.signals as products change, so the listing can
+    show filter counts without counting the products table. Rebuilt by the
+    rebuild_facets command.
+
+    Attributes:
+        category (ForeignKey): The category of the products.
+        available (BooleanField): The availability of the products.
+        price_band (PositiveSmallIntegerField): The index of the price band
+            of the products, see settings.PRICE_FACET_BANDS.
+        count (IntegerField): The number of products.
+    """
+
+    category = models.ForeignKey(
+        Category, related_name="facet_counts", on_delete=models.CASCADE
+    )
+    available = models.BooleanField()
+    price_band = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        """
+        Meta options.
+
+        Attributes:
+            constraints (list): The model's constraints.
+        """
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "available", "price_band"],
+                name="unique_product_facet",
+            )
+        ]
+
+    def __str__(self):
+        """
+        Returns the string representation of the facet count.
+
+        Returns:
+            str: The string representation of the facet count.
+        """
+
+        return (
+            f"{self.category_id} / {self.available} / {self.price_band}: {self.count}"
+        )
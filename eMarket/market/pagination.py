@@ -0,0 +1,231 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class KeysetPage:
+    """
+    A single page of results produced by the KeysetPaginator.
+
+    Attributes:
+        object_list (list): The objects on the page.
+        next_cursor (str): The cursor of the following page, if any.
+        previous_cursor (str): The cursor of the preceding page, if any.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) paginator.
+
+    Instead of OFFSET, every page is fetched with a "seek" predicate on the
+    ordering field and the primary key, so deep pages cost the same as the
+    first one as long as an index covers (filters..., field, pk).
+    """
+
+    def __init__(self, queryset, ordering="name", per_page=24):
+        """Initialize the paginator.
+
+        Args:
+            queryset (QuerySet): The filtered, unordered queryset to page over.
+            ordering (str): The field to order by, prefixed with "-" for
+                descending order.
+            per_page (int): The number of objects on a page.
+        Returns:
+            None
+        """
+
+        self.queryset = queryset
+        self.field = ordering.lstrip("-")
+        self.descending = ordering.startswith("-")
+        self.per_page = per_page
+
+    def _order_by(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        return [f"{prefix}{self.field}", f"{prefix}pk"]
+
+    def _seek(self, value, pk, reverse=False):
+        lookup = "lt" if self.descending != reverse else "gt"
+        # the redundant inclusive bound gives the planner a range to seek to
+        return Q(**{f"{self.field}__{lookup}e": value}) & (
+            Q(**{f"{self.field}__{lookup}": value}) | Q(**{f"pk__{lookup}": pk})
+        )
+
+    def encode_cursor(self, obj, direction):
+        """
+        Encode the position of an object into an opaque cursor.
+
+        Args:
+            obj (Model): The boundary object of a page.
+            direction (str): "n" to seek forward, "p" to seek backward.
+        Returns:
+            str: The cursor.
+        """
+
+        value = getattr(obj, self.field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps([direction, value, str(obj.pk)], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """
+        Decode a cursor produced by encode_cursor().
+
+        Args:
+            cursor (str): The cursor.
+        Returns:
+            tuple: The direction, the ordering value and the primary key.
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = base64.b64decode(padded, altchars=b"-_", validate=True)
+            direction, value, pk = json.loads(payload)
+        except (TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+        if direction not in ("n", "p"):
+            raise InvalidCursor(cursor)
+
+        # a cursor is user input, its values are checked like form input
+        meta = self.queryset.model._meta
+        try:
+            value = meta.get_field(self.field).to_python(value)
+            pk = meta.pk.to_python(pk)
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        if value is None or pk is None:
+            raise InvalidCursor(cursor)
+
+        return direction, value, pk
+
+    def get_page(self, cursor=None):
+        """
+        Fetch the page located by a cursor.
+
+        Args:
+            cursor (str): The cursor, or None for the first page.
+        Returns:
+            KeysetPage: The page.
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+
+        backward = False
+        queryset = self.queryset
+
+        if cursor:
+            direction, value, pk = self.decode_cursor(cursor)
+            backward = direction == "p"
+            queryset = queryset.filter(self._seek(value, pk, reverse=backward))
+
+        queryset = queryset.order_by(*self._order_by(reverse=backward))
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if backward:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], "n")
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], "p")
+
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def estimate_count(queryset):
+    """
+    Estimate the number of rows of a queryset from the planner statistics.
+
+    PostgreSQL estimates any query with EXPLAIN. SQLite only knows the size
+    of whole tables, from the statistics gathered by ANALYZE.
+
+    Args:
+        queryset (QuerySet): The queryset.
+    Returns:
+        int: The estimated number of rows, or None if there is no estimate.
+    """
+
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]["Plan"]["Plan Rows"])
+
+            if connection.vendor == "sqlite" and not queryset.query.where:
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        # e.g. sqlite_stat1 does not exist until ANALYZE runs
+        return None
+
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator estimating the number of objects of huge querysets.
+
+    Counting the rows of a table with millions of them takes seconds, and
+    the admin does it on every changelist page. When the planner estimates
+    more than settings.ESTIMATED_COUNT_THRESHOLD rows, the estimate is used
+    instead; smaller results are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
@@ -0,0 +1,261 @@
+import re
+
+from django.db import connection, transaction
+
+FTS_TABLE = "market_product_fts"
+PG_INDEX = "market_product_search_idx"
+
+# the document searched by PostgreSQL, the GIN index is built on this exact
+# expression so that the planner can use it
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def search_terms(query):
+    """
+    Split a search query into terms.
+
+    Args:
+        query (str): The search query typed by the shopper.
+    Returns:
+        list: The lowercase word terms of the query.
+    """
+
+    return re.findall(r"\w+", query.lower())
+
+
+def fts_rowid(product_id):
+    """
+    Map a product UUID to the integer rowid of its FTS5 row.
+
+    Args:
+        product_id (UUID): The ID of the product.
+    Returns:
+        int: A positive 63-bit integer derived from the UUID.
+    """
+
+    return product_id.int >> 65
+
+
+class SQLiteSearchBackend:
+    """
+    Full-text search backed by an SQLite FTS5 table.
+
+    Only available products are indexed. Rows are keyed by a rowid derived
+    from the product UUID, so a product is updated or removed with an
+    indexed lookup. Name matches weigh ten times more than description ones.
+    """
+
+    def create(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, description, product_id UNINDEXED, category_id UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def index(self, products):
+        """
+        Add or update products in the index.
+
+        Args:
+            products (iterable): The products, unavailable ones are removed.
+        """
+
+        rows, removed = [], []
+        for product in products:
+            if product.available:
+                rows.append(
+                    (
+                        fts_rowid(product.id),
+                        product.name,
+                        product.description,
+                        product.id.hex,
+                        product.category_id.hex,
+                    )
+                )
+            else:
+                removed.append(product.id)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [(row[0],) for row in rows] + [(fts_rowid(pk),) for pk in removed],
+            )
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} "
+                "(rowid, name, description, product_id, category_id) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, product_ids):
+        """
+        Remove products from the index.
+
+        Args:
+            product_ids (iterable): The IDs of the products.
+        """
+
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [(fts_rowid(pk),) for pk in product_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+    def search(self, query, category=None, limit=24, offset=0):
+        """
+        Find the IDs of the products matching a query, best matches first.
+
+        Every term must match, the last one as a prefix too, so results
+        show up while the shopper is still typing.
+
+        Args:
+            query (str): The search query.
+            category (Category): Restrict the results to this category.
+            limit (int): The maximum number of results.
+            offset (int): The number of results to skip.
+        Returns:
+            list: The product IDs, as hex strings.
+        """
+
+        terms = search_terms(query)
+        if not terms:
+            return []
+
+        match = " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        sql = f"SELECT product_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params = [match]
+        if category is not None:
+            sql += " AND category_id = %s"
+            params.append(category.pk.hex)
+        sql += f" ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s OFFSET %s"
+        params += [limit, offset]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    """
+    Full-text search backed by a GIN index on a tsvector expression.
+
+    PostgreSQL keeps the expression index up to date by itself, so there is
+    nothing to do when products change.
+    """
+
+    def create(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON market_product "
+            f"USING GIN (({PG_DOCUMENT}))"
+        )
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE market_product")
+
+    def search(self, query, category=None, limit=24, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+
+        tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        sql = (
+            "SELECT id FROM market_product "
+            f"WHERE available AND ({PG_DOCUMENT}) @@ to_tsquery('simple', %s)"
+        )
+        params = [tsquery]
+        if category is not None:
+            sql += " AND category_id = %s"
+            params.append(category.pk)
+        sql += (
+            f" ORDER BY ts_rank(({PG_DOCUMENT}), to_tsquery('simple', %s)) DESC"
+            " LIMIT %s OFFSET %s"
+        )
+        params += [tsquery, limit, offset]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(vendor=None):
+    """
+    Get the search backend of a database vendor.
+
+    Args:
+        vendor (str): The database vendor, the default connection's if None.
+    Returns:
+        object: The search backend, or None if the vendor has none.
+    """
+
+    backend = BACKENDS.get(vendor or connection.vendor)
+    return backend() if backend else None
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Rebuild the search index of every product, in chunks.
+
+    Args:
+        batch_size (int): The number of products indexed at a time.
+    Returns:
+        int: The number of indexed products.
+    """
+
+    from .models import Product
+
+    backend = get_search_backend()
+    if backend is None:
+        return 0
+
+    products = Product.objects.filter(available=True).only(
+        "id", "name", "description", "category_id", "available"
+    )
+    count = 0
+
+    with transaction.atomic():
+        backend.clear()
+        chunk = []
+        for product in products.iterator(chunk_size=batch_size):
+            chunk.append(product)
+            if len(chunk) == batch_size:
+                backend.index(chunk)
+                count += len(chunk)
+                chunk = []
+        backend.index(chunk)
+        count += len(chunk)
+
+    backend.optimize()
+    return count
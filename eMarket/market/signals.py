@@ -0,0 +1,104 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Category, Product
+from .facets import adjust_facet_count, facet_fields_changed, facet_key
+from .search import get_search_backend
+
+# the product fields kept in the search index
+SEARCH_FIELDS = {"name", "description", "category", "available"}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Invalidate the cached catalog fragments when a product or category changes.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    """
+    Update the search index entry of a saved product.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Product): The saved product.
+        update_fields (frozenset): The fields saved, None if all were.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    if update_fields is not None and not update_fields & SEARCH_FIELDS:
+        return
+
+    backend = get_search_backend()
+    if backend is not None:
+        backend.index([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """
+    Remove a deleted product from the search index.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Product): The deleted product.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    backend = get_search_backend()
+    if backend is not None:
+        backend.remove([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Move a saved product to its facet in the facet counts.
+
+    Product.save() remembers the facet the product was loaded with, so a
+    product whose category, availability and price band are unchanged
+    costs no query.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Product): The saved product.
+        created (bool): Whether the product was created.
+        update_fields (frozenset): The fields saved, None if all were.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    if not facet_fields_changed(update_fields):
+        return
+
+    old, new = (None if created else instance._loaded_facet), facet_key(instance)
+    if old == new:
+        return
+    if old is not None:
+        adjust_facet_count(old, -1)
+    adjust_facet_count(new, 1)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    """
+    Remove a deleted product from the facet counts.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Product): The deleted product.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    adjust_facet_count(instance._loaded_facet or facet_key(instance), -1)
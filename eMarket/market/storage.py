@@ -0,0 +1,60 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming every file after the hash of its contents.
+
+    A stored file never changes under its name, so it can be served with
+    far-future cache headers, and identical uploads share one file. The
+    directory part of the requested name is kept, the base name is replaced
+    by the SHA-256 digest of the contents and the original extension.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # an existing name already holds these exact contents
+        return name
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+
+        tmp_dir = self.path(directory)
+        os.makedirs(tmp_dir, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(tmp_dir, self.directory_permissions_mode)
+
+        # hash while writing to a temporary file, then move it into place
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+            if hasattr(content, "seek"):
+                content.seek(0)
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        hexdigest = digest.hexdigest()
+        name = posixpath.join(directory, hexdigest[:2], hexdigest + extension)
+        full_path = self.path(name)
+
+        if os.path.exists(full_path):
+            os.remove(tmp.name)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # identical contents make a concurrent replace harmless
+            os.replace(tmp.name, full_path)
+            os.chmod(full_path, self.file_permissions_mode or 0o644)
+
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
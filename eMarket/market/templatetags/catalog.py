@@ -0,0 +1,139 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from ..cache import catalog_version, get_or_render
+from ..images import DERIVATIVE_SIZES
+from ..storage import content_addressed_storage
+
+register = template.Library()
+
+
+class CatalogFragmentNode(template.Node):
+    """Renders its contents once per catalog version and vary-on values."""
+
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        # look the version up once per render instead of once per fragment
+        version = context.render_context.get(self)
+        if version is None:
+            version = context.render_context[self] = catalog_version()
+
+        return get_or_render(
+            self.name.resolve(context),
+            [var.resolve(context) for var in self.vary_on],
+            lambda: self.nodelist.render(context),
+            version=version,
+        )
+
+
+@register.tag("catalogfragment")
+def do_catalogfragment(parser, token):
+    """
+    Cache a template fragment until the catalog changes.
+
+    Usage::
+
+        {% load catalog %}
+        {% catalogfragment "card" product.id %}
+            .. some expensive processing ..
+        {% endcatalogfragment %}
+
+    The first argument names the fragment and any further arguments are the
+    values it varies on. Entries are keyed by the catalog version, which is
+    bumped whenever a Product or Category is saved or deleted.
+    """
+
+    nodelist = parser.parse(("endcatalogfragment",))
+    parser.delete_first_token()
+    bits = token.split_contents()
+
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 1 argument."
+        )
+
+    return CatalogFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
+
+
+def _srcset(derivatives, extension):
+    return ", ".join(
+        f"{content_addressed_storage.url(entry[extension])} {entry['width']}w"
+        for entry in derivatives
+        if extension in entry
+    )
+
+
+@register.simple_tag
+def product_image(product, size="card", sizes=None, lazy=True):
+    """
+    Render the responsive image of a product.
+
+    Emits a <picture> offering every derivative in WebP and JPEG through
+    srcset, so browsers download the smallest file that fits. Until the
+    derivatives are rendered, the original upload is used.
+
+    Usage::
+
+        {% load catalog %}
+        {% product_image product "card" sizes="(max-width: 600px) 50vw, 25vw" %}
+
+    Args:
+        product (Product): The product.
+        size (str): The derivative used as the fallback src.
+        sizes (str): The sizes attribute, defaults to the width of `size`.
+        lazy (bool): Whether the browser may defer loading the image.
+    Returns:
+        str: The HTML of the image.
+    """
+
+    loading = "lazy" if lazy else "eager"
+
+    if not product.image:
+        return format_html(
+            '<img src="{}" alt="{}" loading="{}">',
+            static("img/no_image.png"),
+            product.name,
+            loading,
+        )
+
+    derivatives = [
+        product.derivatives[label]
+        for label in DERIVATIVE_SIZES
+        if label in product.derivatives
+    ]
+    fallback = product.derivatives.get(size)
+
+    if not fallback:
+        return format_html(
+            '<img src="{}" alt="{}" loading="{}">',
+            product.image.url,
+            product.name,
+            loading,
+        )
+
+    if sizes is None:
+        sizes = f"{fallback['width']}px"
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"'
+        ' alt="{}" loading="{}"></picture>',
+        _srcset(derivatives, "webp"),
+        sizes,
+        content_addressed_storage.url(fallback["jpg"]),
+        _srcset(derivatives, "jpg"),
+        sizes,
+        fallback["width"],
+        fallback["height"],
+        product.name,
+        loading,
+    )
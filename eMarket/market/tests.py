@@ -1,3 +1,709 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.templatetags.static import static
+from eMarket.replicas import ReplicaMiddleware, ReplicaRouter
+from eMarket.staticfiles import StaticFilesMiddleware, accepted_encodings, brotli
+from monitoring.testing import CatalogQueryBudgetMixin, create_catalog
+from orders.models import Order
+from PIL import Image
+
+from . import async_views, cache
+from .cache import catalog_version, get_catalog_cache
+from .facets import compute_facet_counts
+from .images import DerivativePipeline, render_derivatives
+from .importer import ProductImporter
+from .models import Category, Product, ProductFacetCount
+from .pagination import (
+    EstimatedCountPaginator,
+    InvalidCursor,
+    KeysetPaginator,
+    estimate_count,
+)
+from .storage import content_addressed_storage
+from .templatetags.catalog import product_image
+
+
+class CatalogQueryBudgetTests(CatalogQueryBudgetMixin, TestCase):
+    def test_product_list(self):
+        response = self.client.get(reverse("market:product_list"))
+
+        self.assertEqual(len(response.context["products"]), len(self.products))
+        self.assertWithinQueryBudget(response)
+
+    def test_product_list_by_category(self):
+        response = self.client.get(
+            reverse("market:product_list_by_category", args=["phones"])
+            + "?price=1&sort=newest"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_product_search(self):
+        response = self.client.get(reverse("market:product_search") + "?q=phone")
+
+        self.assertEqual(len(response.context["products"]), len(self.products))
+        self.assertWithinQueryBudget(response)
+
+    def test_malformed_cursors(self):
+        for payload in (
+            ["n", "Phone 1", "notauuid"],
+            ["n", "x", None],
+            ["p", None, str(self.products[0].pk)],
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            response = self.client.get(
+                reverse("market:product_list"), {"cursor": cursor}
+            )
+            self.assertEqual(response.status_code, 404, payload)
+
+        response = self.client.get(
+            reverse("market:product_list"),
+            {
+                "sort": "newest",
+                "cursor": base64.urlsafe_b64encode(
+                    json.dumps(["n", "yesterday", str(self.products[0].pk)]).encode()
+                ).decode(),
+            },
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_product_detail(self):
+        response = self.client.get(self.products[0].get_absolute_url())
+
+        self.assertContains(response, "Phone 0")
+        self.assertWithinQueryBudget(response)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.product = create_catalog(products=1)[0]
+        self.url = self.product.get_absolute_url()
+
+    def assertFragmentRefreshed(self, change, text):
+        self.client.get(self.url)
+        version = catalog_version()
+
+        change()
+
+        self.assertNotEqual(catalog_version(), version)
+        self.assertContains(self.client.get(self.url), text)
+
+    def test_product_save_invalidates_fragments(self):
+        def rename():
+            self.product.name = "Renamed phone"
+            self.product.save()
+
+        self.assertFragmentRefreshed(rename, "Renamed phone")
+
+    def test_price_change_invalidates_fragments(self):
+        def reprice():
+            self.product.price = Decimal("1234.50")
+            self.product.save()
+
+        self.assertFragmentRefreshed(reprice, "Ksh1234.50")
+
+    def test_category_save_invalidates_fragments(self):
+        def rename():
+            category = self.product.category
+            category.name = "Smartphones"
+            category.save()
+
+        self.assertFragmentRefreshed(rename, "Smartphones")
+
+    def test_unchanged_catalog_is_served_from_cache(self):
+        self.client.get(self.url)
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed phone")
+
+        self.assertContains(self.client.get(self.url), "Phone 0")
+
+
+class ProductDetailConditionalTests(TestCase):
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.product = create_catalog(products=1)[0]
+        self.url = self.product.get_absolute_url()
+
+    def test_unchanged_page_is_not_modified(self):
+        response = self.client.get(self.url)
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        revalidated = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_product_change_invalidates_the_page(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.product.name = "Renamed phone"
+        self.product.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Renamed phone")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_category_change_invalidates_the_page(self):
+        etag = self.client.get(self.url)["ETag"]
+        category = self.product.category
+        category.name = "Smartphones"
+        category.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Smartphones")
+        self.assertNotEqual(response["ETag"], etag)
+
+    async def test_async_view_revalidates_cached_products(self):
+        request = AsyncRequestFactory().get(self.url)
+        args = (request, self.product.pk, self.product.identifier)
+
+        response = await async_views.product_detail(*args)
+        self.assertEqual(response.status_code, 200)
+
+        request.META["HTTP_IF_NONE_MATCH"] = response["ETag"]
+        threads = []
+
+        def peek_product(product_id):
+            threads.append(threading.current_thread())
+            return cache.peek_product(product_id)
+
+        with mock.patch.object(
+            async_views, "peek_product", peek_product
+        ), mock.patch.object(async_views, "cached_product") as cached_product:
+            response = await async_views.product_detail(*args)
+
+        self.assertEqual(response.status_code, 304)
+        cached_product.assert_not_called()
+        # the blocking cache lookup ran off the event loop
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(len(threads), 1)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(products=0)
+        phones, tablets = Category.objects.order_by("name")
+        cls.case = Product.objects.create(
+            category=phones,
+            name="Leather case",
+            identifier="leather-case",
+            description="Fits the Galaxy phone.",
+            price=500,
+        )
+        cls.phone = Product.objects.create(
+            category=phones,
+            name="Galaxy phone",
+            identifier="galaxy-phone",
+            description="A phone.",
+            price=1000,
+        )
+        cls.tablet = Product.objects.create(
+            category=tablets,
+            name="Galaxy tablet",
+            identifier="galaxy-tablet",
+            description="A tablet.",
+            price=2000,
+        )
+
+    def search(self, q, **params):
+        response = self.client.get(reverse("market:product_search"), {"q": q, **params})
+        return response.context["products"]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search("galaxy phone"), [self.phone, self.case])
+
+    def test_only_the_last_term_is_a_prefix(self):
+        self.assertEqual(self.search("galaxy tab"), [self.tablet])
+        self.assertEqual(self.search("gal tablet"), [])
+
+    def test_category_filter(self):
+        self.assertEqual(self.search("galaxy", category="tablets"), [self.tablet])
+        self.assertEqual(
+            self.search("galaxy", category="phones"), [self.phone, self.case]
+        )
+        response = self.client.get(
+            reverse("market:product_search"), {"q": "galaxy", "category": "laptops"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_unavailable_products_are_not_found(self):
+        self.phone.available = False
+        self.phone.save()
+
+        self.assertEqual(self.search("galaxy phone"), [self.case])
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        # phones of 0, 1000 and 2000, in the first two price bands
+        self.products = create_catalog(products=3)
+        self.phones, self.tablets = Category.objects.order_by("name")
+
+    def counts(self):
+        rows = ProductFacetCount.objects.filter(count__gt=0).values_list(
+            "category_id", "available", "price_band", "count"
+        )
+        return {row[:3]: row[3] for row in rows}
+
+    def assertCounts(self, expected):
+        self.assertEqual(self.counts(), expected)
+        computed = compute_facet_counts(Product.objects.all())
+        self.assertEqual(self.counts(), {row[:3]: row[3] for row in computed})
+
+    def test_created_products_are_counted(self):
+        self.assertCounts({(self.phones.pk, True, 0): 1, (self.phones.pk, True, 1): 2})
+
+        Product.objects.create(
+            category=self.tablets, name="Tablet", identifier="tablet", price=30000
+        )
+        self.assertCounts(
+            {
+                (self.phones.pk, True, 0): 1,
+                (self.phones.pk, True, 1): 2,
+                (self.tablets.pk, True, 3): 1,
+            }
+        )
+
+    def test_moved_products_change_facet(self):
+        product = self.products[1]
+        product.category = self.tablets
+        product.save()
+        self.assertCounts(
+            {
+                (self.phones.pk, True, 0): 1,
+                (self.phones.pk, True, 1): 1,
+                (self.tablets.pk, True, 1): 1,
+            }
+        )
+
+        product.price = 6000
+        product.save(update_fields=["price"])
+        self.assertCounts(
+            {
+                (self.phones.pk, True, 0): 1,
+                (self.phones.pk, True, 1): 1,
+                (self.tablets.pk, True, 2): 1,
+            }
+        )
+
+    def test_availability_toggles_change_facet(self):
+        product = self.products[2]
+        product.available = False
+        product.save()
+        self.assertCounts(
+            {
+                (self.phones.pk, True, 0): 1,
+                (self.phones.pk, True, 1): 1,
+                (self.phones.pk, False, 1): 1,
+            }
+        )
+
+        product.available = True
+        product.save()
+        self.assertCounts({(self.phones.pk, True, 0): 1, (self.phones.pk, True, 1): 2})
+
+    def test_deleted_products_are_uncounted(self):
+        self.products[0].delete()
+        self.assertCounts({(self.phones.pk, True, 1): 2})
+
+        Product.objects.get(pk=self.products[1].pk).delete()
+        self.assertCounts({(self.phones.pk, True, 1): 1})
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = create_catalog(products=7)
+        # ties on every ordering, only the primary key tells them apart
+        for i, product in enumerate(products):
+            Product.objects.filter(pk=product.pk).update(
+                name=f"Phone {i // 3}",
+                created=timezone.now() - timedelta(days=i // 2),
+            )
+
+    def walk(self, ordering):
+        paginator = KeysetPaginator(Product.objects.all(), ordering, per_page=2)
+        pages = [paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        forward = [product.pk for page in pages for product in page]
+
+        backward = []
+        page = pages[-1]
+        while True:
+            backward[:0] = [product.pk for product in page]
+            if not page.has_previous:
+                break
+            page = paginator.get_page(page.previous_cursor)
+        return forward, backward
+
+    def test_pages_follow_the_ordering_both_ways(self):
+        for ordering in ("name", "-name", "-created", "created"):
+            field = ordering.lstrip("-")
+            expected = list(
+                Product.objects.order_by(
+                    ordering, ordering[: -len(field)] + "pk"
+                ).values_list("pk", flat=True)
+            )
+
+            forward, backward = self.walk(ordering)
+            self.assertEqual(forward, expected, ordering)
+            self.assertEqual(backward, expected, ordering)
+
+    def test_tampered_cursor(self):
+        paginator = KeysetPaginator(Product.objects.all(), "name", per_page=2)
+        cursor = paginator.get_page().next_cursor
+
+        for tampered in (cursor[:-3], cursor[::-1], cursor + "!", "x" + cursor):
+            with self.assertRaises(InvalidCursor, msg=tampered):
+                paginator.get_page(tampered)
+
+
+@skipUnless(connection.vendor == "sqlite", "reads the SQLite statistics")
+@override_settings(ESTIMATED_COUNT_THRESHOLD=5)
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def analyze(self, rows=None):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            if rows is not None:
+                # what ANALYZE would find in a huge table
+                cursor.execute(
+                    "UPDATE sqlite_stat1 SET stat = %s WHERE tbl = %s",
+                    [f"{rows} 1", Product._meta.db_table],
+                )
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset, 10).count
+
+    def test_counts_without_statistics(self):
+        self.assertEqual(estimate_count(Product.objects.all()), None)
+        self.assertEqual(self.count(Product.objects.all()), 10)
+
+    def test_small_tables_are_counted(self):
+        self.analyze()
+
+        self.assertEqual(estimate_count(Product.objects.all()), 10)
+        with override_settings(ESTIMATED_COUNT_THRESHOLD=100):
+            with self.assertNumQueries(2):
+                self.assertEqual(self.count(Product.objects.all()), 10)
+
+    def test_huge_tables_are_estimated(self):
+        self.analyze(rows=1000000)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.count(Product.objects.all()), 1000000)
+        # there are no statistics of filtered rows, those are counted
+        self.assertEqual(self.count(Product.objects.filter(price__gte=5000)), 5)
+
+    def test_changelist_shows_the_estimate(self):
+        self.analyze(rows=1000000)
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "admin")
+        )
+
+        response = self.client.get(reverse("admin:market_product_changelist"))
+
+        self.assertContains(response, "1000000 products")
+
+
+@override_settings(REPLICA_DATABASES=["replica1"])
+class ReplicaRouterTests(TestCase):
+    router = ReplicaRouter()
+
+    def route(self, path="/", cookies=None, view=None):
+        """Get where a read of a product goes during a request."""
+
+        routes = []
+
+        def get_response(request):
+            if view:
+                view()
+            routes.append(self.router.db_for_read(Product))
+            return HttpResponse()
+
+        request = RequestFactory().get(path)
+        request.COOKIES.update(cookies or {})
+        response = ReplicaMiddleware(get_response)(request)
+        return routes[0], response
+
+    def test_catalog_reads_go_to_a_replica(self):
+        self.assertEqual(self.route()[0], "replica1")
+        self.assertIsNone(self.router.db_for_read(Order))
+
+    def test_reads_outside_of_requests_go_to_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_transactions_read_the_primary(self):
+        routes = []
+
+        def view():
+            with transaction.atomic():
+                routes.append(self.router.db_for_read(Product))
+
+        self.assertEqual(self.route(view=view)[0], "replica1")
+        self.assertEqual(routes, ["default"])
+
+    def test_admin_reads_the_primary(self):
+        self.assertEqual(self.route(reverse("admin:index"))[0], "default")
+
+    def test_writers_read_their_writes(self):
+        route, response = self.route(view=lambda: self.router.db_for_write(Product))
+
+        self.assertEqual(route, "default")
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(
+            self.route(cookies={settings.REPLICA_PIN_COOKIE: "1"})[0], "default"
+        )
+
+    def test_other_writes_do_not_pin(self):
+        route, response = self.route(view=lambda: self.router.db_for_write(Order))
+
+        self.assertEqual(route, "replica1")
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_admin_changes_pin_the_client(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "admin")
+        )
+        response = self.client.post(
+            reverse("admin:market_category_add"),
+            {"name": "Phones", "identifier": "phones"},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        collected = override_settings(
+            STATIC_ROOT=root.name,
+            STATICFILES_STORAGE="eMarket.staticfiles.CompressedManifestStaticFilesStorage",
+            SERVE_STATIC=True,
+        )
+        collected.enable()
+        self.addCleanup(collected.disable)
+
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse())
+
+    def get(self, path, **headers):
+        return self.middleware(RequestFactory().get(path, **headers))
+
+    def test_fingerprinted_files_are_immutable(self):
+        url = static("css/main.css")
+        response = self.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertRegex(url, r"main\.[0-9a-f]{12}\.css$")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_unfingerprinted_files_are_cached_briefly(self):
+        response = self.get("/static/css/main.css")
+
+        self.assertNotIn("immutable", response["Cache-Control"])
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_images_are_not_compressed(self):
+        self.assertTrue(
+            staticfiles_storage.exists(
+                staticfiles_storage.stored_name("img/no_image.png")
+            )
+        )
+        self.assertFalse(staticfiles_storage.exists("img/no_image.png.gz"))
+
+    def test_conditional_requests(self):
+        url = static("css/main.css")
+        etag = self.get(url)["ETag"]
+
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for header in (
+            f"W/{etag}",
+            f'"other", {etag}',
+            f'W/"other",W/{etag}',
+            "*",
+        ):
+            response = self.get(url, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+        for header in ('"other"', f'{etag[:-1]}x"', ""):
+            response = self.get(url, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 200, header)
+
+    def test_accept_encoding_quality_values(self):
+        url = static("css/main.css")
+
+        for header, encoding in (
+            ("gzip;q=0", None),
+            ("gzip; q=0.0, identity", None),
+            ("br;q=0, gzip;q=0.5", "gzip"),
+            ("*", "br" if brotli else "gzip"),
+            ("*;q=0", None),
+            ("*, gzip;q=0", "br" if brotli else None),
+            ("x-gzip", "gzip"),
+            ("GZIP;Q=1", "gzip"),
+            ("gzipped", None),
+        ):
+            response = self.get(url, HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response.get("Content-Encoding"), encoding, header)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings("gzip;q=0.8, br, identity;q=0, *;q=0.1"),
+            {"gzip": 0.8, "br": 1.0, "identity": 0.0, "*": 0.1},
+        )
+
+
+def image_file(size=(1200, 600), mode="RGB", color="red"):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, "PNG")
+    return ContentFile(buffer.getvalue(), name="image.png")
+
+
+class ImagePipelineTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media = override_settings(MEDIA_ROOT=root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.product = create_catalog(products=1)[0]
+        self.product.image = image_file()
+        self.product.save()
+
+    def test_render_derivatives(self):
+        rendered = render_derivatives(image_file(mode="P").read())
+
+        self.assertEqual(
+            {label: rendition["width"] for label, rendition in rendered.items()},
+            {"thumbnail": 150, "card": 300, "detail": 800},
+        )
+        self.assertEqual(rendered["card"]["height"], 150)
+        self.assertEqual(set(rendered["card"]["files"]), {"webp", "jpg"})
+        self.assertEqual(
+            Image.open(io.BytesIO(rendered["detail"]["files"]["webp"])).size,
+            (800, 400),
+        )
+
+    def test_small_images_are_not_upscaled(self):
+        rendered = render_derivatives(image_file(size=(100, 50), mode="RGBA").read())
+
+        self.assertEqual(
+            {
+                (rendition["width"], rendition["height"])
+                for rendition in rendered.values()
+            },
+            {(100, 50)},
+        )
+
+    def test_saving_a_new_image_queues_it(self):
+        self.product.derivatives = {"card": {}}
+        self.product.save()
+        self.product.image = image_file(color="blue")
+        self.product.save()
+
+        self.assertEqual(Product.objects.get().derivatives, {})
+        self.assertIn(f'src="{self.product.image.url}"', product_image(self.product))
+
+    def test_pipeline_records_the_derivatives(self):
+        DerivativePipeline(0).submit(self.product.pk)
+
+        product = Product.objects.get()
+        self.assertEqual(set(product.derivatives), {"thumbnail", "card", "detail"})
+        self.assertTrue(
+            content_addressed_storage.exists(product.derivatives["card"]["webp"])
+        )
+        self.assertIn("<picture>", product_image(product))
+
+    def test_worker_renders_the_queued_images_once(self):
+        out = io.StringIO()
+        call_command("process_images", workers=0, stdout=out)
+        call_command("process_images", workers=0, stdout=out)
+
+        self.assertEqual(out.getvalue().count("Processed 1 images"), 1, out.getvalue())
+        self.assertIn("Processed 0 images", out.getvalue())
+        self.assertTrue(Product.objects.get().derivatives)
+
+
+class ImagePoolTests(TransactionTestCase):
+    def test_pool_renders_the_queued_images(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        with override_settings(MEDIA_ROOT=root.name):
+            products = create_catalog(products=2)
+            for product, color in zip(products, ["red", "blue"]):
+                product.image = image_file(color=color)
+                product.save()
+
+            call_command("process_images", workers=2, stdout=io.StringIO())
+
+        self.assertFalse(Product.objects.filter(derivatives={}).exists())
+
+
+class ProductImporterTests(TestCase):
+    def setUp(self):
+        create_catalog(products=0)
+
+    def test_invalid_prices_are_rejected_per_row(self):
+        prices = ["NaN", "Infinity", "-1", "123456789.00", "1.234", "", "ten"]
+        rows = [
+            {"category": "phones", "name": f"Phone {i}", "price": price}
+            for i, price in enumerate(prices + ["999.99"])
+        ]
+
+        importer = ProductImporter().run(rows)
+
+        self.assertEqual(importer.created, 1)
+        self.assertEqual(
+            [number for number, _ in importer.errors], [1, 2, 3, 4, 5, 6, 7]
+        )
+        self.assertEqual(Product.objects.get().price, Decimal("999.99"))
+
+    def test_price_changes_bump_the_version(self):
+        phone = Product.objects.create(
+            category=Category.objects.get(identifier="phones"),
+            name="Phone",
+            identifier="phone",
+            price=100,
+        )
+        rows = [
+            {"id": str(phone.pk), "category": "phones", "name": "Phone", "price": price}
+            for price in ["100.00", "120"]
+        ]
+
+        ProductImporter().run(rows[:1])
+        self.assertEqual(Product.objects.get().price_version, 1)
+        ProductImporter().run(rows[1:])
+        self.assertEqual(Product.objects.get().price_version, 2)
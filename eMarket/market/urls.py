@@ -1,14 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    from .async_views import product_detail
+else:
+    product_detail = views.product_detail
+
 app_name = "market"
 
 urlpatterns = [
     path("", views.product_list, name="product_list"),
+    path("search/", views.product_search, name="product_search"),
     path(
         "<slug:category_identifier>/",
         views.product_list,
         name="product_list_by_category",
     ),
-    path("<uuid:id>/<slug:identifier>/", views.product_detail, name="product_detail"),
+    path("<uuid:id>/<slug:identifier>/", product_detail, name="product_detail"),
 ]
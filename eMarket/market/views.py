@@ -1,6 +1,39 @@
+from uuid import UUID
+
 from cart.forms import CartAddProductForm
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render
+from django.views.static import serve
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .cache import cached_product
+from .facets import ProductFacets, band_range
 from .models import Category, Product
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import get_search_backend
+
+# public sort keys accepted in ?sort= mapped to the ordering they page over
+PRODUCT_ORDERINGS = {"name": "name", "newest": "-created"}
+
+
+def page_url(request, cursor, param="cursor"):
+    """
+    Build the URL of another page of the current listing.
+
+    Args:
+        request (HttpRequest): The request object.
+        cursor (str): The cursor of the page.
+        param (str): The query parameter holding the cursor.
+    Returns:
+        str: The query string of the page, or None if there is no such page.
+    """
+
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query[param] = cursor
+    return f"?{query.urlencode()}"
 
 
 def product_list(request, category_identifier=None):
@@ -16,14 +49,112 @@ def product_list(request, category_identifier=None):
 
     category = None
     categories = Category.objects.all()
-    products = Product.objects.filter(available=True)
+    available = request.GET.get("available") != "0"
+    products = Product.objects.filter(available=available)
     if category_identifier:
         category = get_object_or_404(Category, identifier=category_identifier)
         products = products.filter(category=category)
+
+    band = request.GET.get("price")
+    if band and band.isdigit() and int(band) < len(settings.PRICE_FACET_BANDS):
+        band = int(band)
+        low, high = band_range(band)
+        products = products.filter(price__gte=low)
+        if high is not None:
+            products = products.filter(price__lt=high)
+    else:
+        band = None
+
+    sort = request.GET.get("sort", "name")
+    if sort not in PRODUCT_ORDERINGS:
+        sort = "name"
+
+    paginator = KeysetPaginator(
+        products, PRODUCT_ORDERINGS[sort], settings.PRODUCTS_PER_PAGE
+    )
+    try:
+        page = paginator.get_page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+
+    facets = ProductFacets(
+        category, categories, band, available, None if sort == "name" else sort
+    )
+
     return render(
         request,
         "market/product/list.html",
-        {"category": category, "categories": categories, "products": products},
+        {
+            "category": category,
+            "categories": categories,
+            "facets": facets,
+            "products": page.object_list,
+            "page": page,
+            "sort": sort,
+            "next_url": page_url(request, page.next_cursor),
+            "previous_url": page_url(request, page.previous_cursor),
+        },
+    )
+
+
+def product_search(request):
+    """
+    Product search view.
+
+    Matches the words of ?q= against the names and descriptions of the
+    available products, best matches first, optionally within the category
+    given by ?category=.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        HttpResponse: The HTTP response.
+    """
+
+    query = request.GET.get("q", "").strip()
+    category = None
+    categories = list(Category.objects.all())
+    if request.GET.get("category"):
+        # picked from the listed categories, which saves a query
+        category = next(
+            (c for c in categories if c.identifier == request.GET["category"]), None
+        )
+        if category is None:
+            raise Http404("No such category.")
+
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        raise Http404("Invalid page number.")
+
+    per_page = settings.PRODUCTS_PER_PAGE
+    products = []
+    has_next = False
+    backend = get_search_backend()
+
+    if query and backend is not None:
+        # one extra match tells whether there is a next page
+        ids = backend.search(
+            query, category, limit=per_page + 1, offset=(page - 1) * per_page
+        )
+        has_next = len(ids) > per_page
+        ranks = {UUID(str(pk)): rank for rank, pk in enumerate(ids[:per_page])}
+        products = sorted(
+            Product.objects.filter(pk__in=ranks, available=True),
+            key=lambda product: ranks[product.pk],
+        )
+
+    return render(
+        request,
+        "market/product/search.html",
+        {
+            "query": query,
+            "category": category,
+            "categories": categories,
+            "products": products,
+            "next_url": page_url(request, page + 1 if has_next else None, "page"),
+            "previous_url": page_url(request, page - 1 if page > 1 else None, "page"),
+        },
     )
 
 
@@ -31,6 +162,11 @@ def product_detail(request, id, identifier):
     """
     Product detail view.
 
+    The product is read through the catalog cache and the page carries an
+    ETag and a Last-Modified date derived from the update times of the
+    product and its category, so hot products are served without a query
+    and revalidations without rendering.
+
     Args:
         request (HttpRequest): The request object.
         id (str): The product ID.
@@ -39,10 +175,76 @@ def product_detail(request, id, identifier):
         HttpResponse: The HTTP response.
     """
 
-    product = get_object_or_404(Product, id=id, identifier=identifier, available=True)
+    product = cached_product(id)
+    if product is None or product.identifier != identifier:
+        raise Http404("No product matches the given query.")
+
+    # unchanged pages are answered with 304 Not Modified without rendering
+    etag, last_modified = product_validators(product)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    return render_product_detail(request, product)
+
+
+def product_validators(product):
+    """
+    Get the validators of the detail page of a product.
+
+    The page shows the category too, so renaming it changes both validators.
+
+    Args:
+        product (Product): The product, with its category.
+    Returns:
+        tuple: The ETag and the Last-Modified timestamp of the page.
+    """
+
+    updated = product.updated.timestamp()
+    category_updated = product.category.updated.timestamp()
+    etag = quote_etag(f"{product.pk.hex}-{updated}-{category_updated}")
+    return etag, int(max(updated, category_updated))
+
+
+def render_product_detail(request, product):
+    """
+    Render the detail page of a product, with its validators.
+
+    Args:
+        request (HttpRequest): The request object.
+        product (Product): The product.
+    Returns:
+        HttpResponse: The HTTP response.
+    """
+
+    etag, last_modified = product_validators(product)
     cart_product_form = CartAddProductForm()
-    return render(
+    response = render(
         request,
         "market/product/detail.html",
         {"product": product, "cart_product_form": cart_product_form},
     )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def serve_media(request, path, document_root=None):
+    """
+    Serve an uploaded media file during development.
+
+    Media files are content-addressed (see market.storage), so a name always
+    refers to the same contents and the response may be cached forever.
+
+    Args:
+        request (HttpRequest): The request object.
+        path (str): The path of the file below document_root.
+        document_root (str): The media root.
+    Returns:
+        HttpResponse: The file.
+    """
+
+    response = serve(request, path, document_root=document_root)
+    if response.status_code == 200:
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
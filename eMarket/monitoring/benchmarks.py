@@ -0,0 +1,232 @@
+"""
+Benchmarks of the catalog, cart and checkout hot paths.
+
+Every benchmark requests a view through the test client against a synthetic
+catalog, so the whole stack is measured: middleware, sessions, queries and
+rendering. Catalogs and the products picked by the benchmarks are derived
+from their index alone, so two runs of the same sizes request the same
+pages and carts, whatever ran before. See the bench management command.
+"""
+
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from django.test import Client
+from django.urls import reverse
+from market.cache import bump_catalog_version, get_catalog_cache
+from market.facets import rebuild_facets
+from market.models import Category, Product
+
+from .testing import ORDER_DATA
+
+# namespace of the IDs of the synthetic products
+PRODUCT_NAMESPACE = uuid.UUID("6f0f4d0e-92a8-4c43-9a55-6b0b6f0c1e7a")
+
+CATEGORIES = 20
+ADJECTIVES = ["Compact", "Classic", "Smart", "Rugged", "Slim", "Pro", "Mini"]
+NOUNS = ["Phone", "Tablet", "Laptop", "Speaker", "Camera", "Watch", "Charger"]
+
+
+def product_id(index):
+    return uuid.uuid5(PRODUCT_NAMESPACE, str(index))
+
+
+def seed_catalog(size, batch_size=5000, progress=None):
+    """
+    Grow the synthetic catalog to a number of products.
+
+    Args:
+        size (int): The number of products wanted.
+        batch_size (int): The number of products inserted at a time.
+        progress (callable): Called with the number of products after every
+            batch.
+    """
+
+    categories = list(Category.objects.filter(identifier__startswith="bench-"))
+    if not categories:
+        categories = Category.objects.bulk_create(
+            Category(name=f"Bench {i}", identifier=f"bench-{i}")
+            for i in range(CATEGORIES)
+        )
+
+    for start in range(Product.objects.count(), size, batch_size):
+        Product.objects.bulk_create(
+            Product(
+                id=product_id(i),
+                category=categories[i % len(categories)],
+                name=f"{ADJECTIVES[i * 31 % 7]} {NOUNS[i * 17 % 7]} {i}",
+                identifier=f"product-{i}",
+                description="A synthetic product.",
+                price=100 + i * 7919 % 100000,
+                available=i % 20 != 0,
+            )
+            for i in range(start, min(start + batch_size, size))
+        )
+        if progress:
+            progress(min(start + batch_size, size))
+
+    # bulk_create() sends no signals
+    rebuild_facets()
+    bump_catalog_version()
+
+
+def pick_products(size, count, seed=0):
+    """
+    Pick available products of the synthetic catalog.
+
+    Args:
+        size (int): The number of products of the catalog.
+        count (int): The number of products to pick.
+        seed (int): The seed of the pick.
+    Returns:
+        list: The products.
+    """
+
+    rng = random.Random(seed)
+    # every 20th product is unavailable
+    indexes = [i for i in rng.sample(range(size), min(size, count * 2)) if i % 20]
+    ids = [product_id(i) for i in indexes[:count]]
+    products = Product.objects.in_bulk(ids)
+    return [products[id] for id in ids if id in products]
+
+
+def fill_cart(client, products):
+    for product in products:
+        client.post(reverse("cart:cart_add", args=[product.id]), {"quantity": 1})
+
+
+def product_list(size, lines, run):
+    client = Client()
+    return lambda: client.get(reverse("market:product_list"))
+
+
+def product_detail(size, lines, run):
+    client = Client()
+    [product] = pick_products(size, 1, seed=run)
+    return lambda: client.get(product.get_absolute_url())
+
+
+def cart_add(size, lines, run):
+    client = Client()
+    products = pick_products(size, lines, seed=run)
+    fill_cart(client, products[:-1])
+    url = reverse("cart:cart_add", args=[products[-1].id])
+    return lambda: client.post(url, {"quantity": 1})
+
+
+def cart_detail(size, lines, run):
+    client = Client()
+    fill_cart(client, pick_products(size, lines, seed=run))
+    return lambda: client.get(reverse("cart:cart_detail"))
+
+
+def create_order(size, lines, run):
+    client = Client()
+    fill_cart(client, pick_products(size, lines, seed=run))
+    return lambda: client.post(reverse("orders:create_order"), ORDER_DATA)
+
+
+# the benchmarks, each preparing a request and returning it, untimed; the
+# cart benchmarks run once per cart size
+BENCHMARKS = {
+    "product_list": (product_list, False),
+    "product_detail": (product_detail, False),
+    "cart_add": (cart_add, True),
+    "cart_detail": (cart_detail, True),
+    "create_order": (create_order, True),
+}
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def run_benchmark(name, size, lines=None, runs=20, warm=False):
+    """
+    Time a benchmark.
+
+    Every run prepares a fresh request and times it. The catalog cache is
+    cleared before every run unless warm. The allocations are traced in one
+    more run, as tracing slows the code down too much to time it.
+
+    Args:
+        name (str): The name of the benchmark, a key of BENCHMARKS.
+        size (int): The number of products of the catalog.
+        lines (int): The number of lines of the cart.
+        runs (int): The number of timed runs.
+        warm (bool): Whether to keep the catalog cache between runs.
+    Returns:
+        dict: The "p50_ms", "p95_ms" and "mean_ms" latencies, the most
+            "queries" of a run and the "peak_kib" allocated by a run.
+    """
+
+    prepare, _ = BENCHMARKS[name]
+    timings = []
+    queries = 0
+
+    # the first run warms up the code paths, the last one is traced
+    for run in range(runs + 2):
+        request = prepare(size, lines or 1, run)
+        if not warm:
+            get_catalog_cache().clear()
+
+        if run == runs + 1:
+            tracemalloc.start()
+            response = request()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            started = time.perf_counter()
+            response = request()
+            elapsed = (time.perf_counter() - started) * 1000
+            if run:
+                timings.append(elapsed)
+
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} answered {response.status_code}.")
+        queries = max(queries, response.wsgi_request.metrics.queries)
+
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "queries": queries,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def result_key(name, size, lines=None):
+    return f"{name}/{size}" if lines is None else f"{name}/{size}/{lines}"
+
+
+def compare(results, baseline, threshold=20.0):
+    """
+    Compare benchmark results with a baseline.
+
+    A benchmark regressed when its median latency grew by more than the
+    threshold, or when it runs more queries.
+
+    Args:
+        results (dict): The results, keyed by result_key().
+        baseline (dict): The results of the baseline.
+        threshold (float): The latency growth tolerated, in percent.
+    Returns:
+        list: A (key, result, baseline result, regressed) tuple for every
+            benchmark of both.
+    """
+
+    rows = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        regressed = (
+            result["p50_ms"] > base["p50_ms"] * (1 + threshold / 100)
+            or result["queries"] > base["queries"]
+        )
+        rows.append((key, result, base, regressed))
+    return rows
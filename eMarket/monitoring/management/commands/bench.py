@@ -0,0 +1,198 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from monitoring.benchmarks import (
+    BENCHMARKS,
+    compare,
+    result_key,
+    run_benchmark,
+    seed_catalog,
+)
+
+SIZE_SUFFIXES = {"k": 1000, "m": 1000000}
+
+
+def parse_size(value):
+    """Parse a catalog size such as 1000, 100k or 1m."""
+
+    value = value.strip().lower()
+    multiplier = SIZE_SUFFIXES.get(value[-1:], 1)
+    try:
+        return int(value.rstrip("km")) * multiplier
+    except ValueError:
+        raise CommandError(f"Invalid catalog size: {value}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the catalog, cart and checkout views against synthetic "
+        "catalogs, e.g.\n"
+        "  manage.py bench --sizes 1k 100k 1m --output baseline.json\n"
+        "  manage.py bench --sizes 1k 100k 1m --compare baseline.json\n"
+        "Runs against a throwaway test database, the configured database is "
+        "not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            default=["1k"],
+            help="Catalog sizes, as a number of products such as 1000, 100k "
+            "or 1m. Seeding a million products takes a few minutes.",
+        )
+        parser.add_argument(
+            "--lines",
+            type=int,
+            nargs="+",
+            default=[1, 10, 100],
+            help="Cart sizes (number of distinct products) of the cart benchmarks.",
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="append",
+            dest="benchmarks",
+            choices=list(BENCHMARKS),
+            help="Benchmark to run, may be repeated; defaults to all.",
+        )
+        parser.add_argument(
+            "--runs", type=int, default=20, help="Timed runs per benchmark."
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Keep the catalog cache between runs instead of clearing it.",
+        )
+        parser.add_argument(
+            "--output", help="Write the results to this JSON file, as a baseline."
+        )
+        parser.add_argument(
+            "--compare", help="Compare the results with this JSON baseline."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20,
+            help="Median latency growth over the baseline, in percent, "
+            "reported as a regression; runs on the same machine differ by "
+            "about 10%%.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(parse_size(size) for size in options["sizes"])
+        names = options["benchmarks"] or list(BENCHMARKS)
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)["results"]
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # as in production, and without the test environment, whose
+            # instrumented template rendering would be measured too
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=["testserver"]):
+                results = self.run(sizes, names, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"meta": self.meta(options), "results": results}, f, indent=2)
+                f.write("\n")
+            self.stdout.write(f"Wrote {options['output']}.")
+
+        if baseline is not None:
+            self.compare(results, baseline, options["threshold"])
+
+    def run(self, sizes, names, options):
+        """
+        Seed every catalog size in turn and run the benchmarks against it.
+
+        Args:
+            sizes (list): The catalog sizes, smallest first.
+            names (list): The benchmarks to run.
+            options (dict): The command options.
+        Returns:
+            dict: The results, keyed by result_key().
+        """
+
+        results = {}
+        self.stdout.write(
+            f"{'benchmark':<28} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}"
+            f" {'peak KiB':>9}"
+        )
+
+        for size in sizes:
+            self.stderr.write(f"Seeding {size} products...")
+            seed_catalog(
+                size,
+                progress=lambda count: self.stderr.write(f"  {count}", ending="\r"),
+            )
+            self.stderr.write("")
+
+            for name in names:
+                _, per_cart_size = BENCHMARKS[name]
+                for lines in options["lines"] if per_cart_size else [None]:
+                    key = result_key(name, size, lines)
+                    result = results[key] = run_benchmark(
+                        name, size, lines, options["runs"], options["warm"]
+                    )
+                    self.stdout.write(
+                        f"{key:<28} {result['p50_ms']:>9.2f}"
+                        f" {result['p95_ms']:>9.2f} {result['queries']:>8}"
+                        f" {result['peak_kib']:>9.1f}"
+                    )
+
+        return results
+
+    def meta(self, options):
+        return {
+            "created": timezone.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "runs": options["runs"],
+            "warm": options["warm"],
+        }
+
+    def compare(self, results, baseline, threshold):
+        rows = compare(results, baseline, threshold)
+        self.stdout.write(
+            f"\n{'benchmark':<28} {'p50 ms':>9} {'was':>9} {'change':>8}"
+            f" {'queries':>8} {'was':>5}"
+        )
+        for key, result, base, regressed in rows:
+            change = (
+                (result["p50_ms"] / base["p50_ms"] - 1) * 100 if base["p50_ms"] else 0
+            )
+            line = (
+                f"{key:<28} {result['p50_ms']:>9.2f} {base['p50_ms']:>9.2f}"
+                f" {change:>+7.1f}% {result['queries']:>8} {base['queries']:>5}"
+            )
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+
+        regressions = sum(regressed for *_, regressed in rows)
+        if regressions:
+            raise CommandError(f"{regressions} benchmark(s) regressed.")
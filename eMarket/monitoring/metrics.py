@@ -0,0 +1,299 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.template.backends import django as django_backend
+from market.cache import cache_stats
+
+# upper bounds (seconds) of the buckets of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# the statements controlling transactions, not counted as queries: a test
+# runs a SAVEPOINT and a RELEASE where production runs a BEGIN alone
+TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK")
+
+# the measurements of the request being served, if any; a context variable
+# rather than a thread local, so the queries an async view runs through
+# sync_to_async() are counted for its request
+_current = ContextVar("request_metrics", default=None)
+
+_views_lock = threading.Lock()
+_views = {}
+
+
+class RequestMetrics:
+    """
+    The measurements of a single request.
+
+    Attributes:
+        queries (int): The number of SQL queries run, not counting the
+            statements controlling transactions.
+        db_time (float): The seconds spent running them.
+        template_time (float): The seconds spent rendering templates.
+        duration (float): The seconds spent serving the request, once done.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.duration = None
+        self.rendering = False
+        self.started = time.perf_counter()
+
+
+@contextmanager
+def measure():
+    """
+    Measure the queries, template rendering and duration of a block.
+
+    Yields:
+        RequestMetrics: The measurements, complete when the block exits.
+    """
+
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.duration = time.perf_counter() - metrics.started
+        _current.reset(token)
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += not sql.startswith(TRANSACTION_STATEMENTS)
+        metrics.db_time += time.perf_counter() - started
+
+
+def _wrap_connection(sender, connection, **kwargs):
+    # first in the list, so execute_wrapper() blocks still pop their own
+    # wrapper; connections reconnecting keep the one they have
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute_wrapper)
+
+
+class Template(django_backend.Template):
+    """
+    A Django template adding its rendering time to the request measured.
+    """
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # templates rendered by another one are part of its time
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.rendering = False
+            metrics.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The Django template backend, with templates timing their rendering.
+
+    Set as the BACKEND of settings.TEMPLATES, so the rendering time is
+    measured without patching Django.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+def instrument():
+    """
+    Hook the query timer into Django.
+
+    Every database connection gets an execute wrapper as it is opened, which
+    only measures while a block of measure() runs. Called once, when the app
+    is ready. Templates are timed by the DjangoTemplates backend.
+    """
+
+    connection_created.connect(_wrap_connection, dispatch_uid="monitoring")
+
+
+def record(view, metrics, status, over_budget=False):
+    """
+    Add the measurements of a request to the counters of its view.
+
+    Args:
+        view (str): The URL name of the view, with its namespace.
+        metrics (RequestMetrics): The measurements of the request.
+        status (int): The status code of the response.
+        over_budget (bool): Whether the request exceeded its query budget.
+    """
+
+    with _views_lock:
+        stats = _views.get(view)
+        if stats is None:
+            stats = _views[view] = {
+                "requests": 0,
+                "errors": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_seconds": 0.0,
+                "template_seconds": 0.0,
+                "seconds": 0.0,
+                "over_budget": 0,
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+
+        stats["requests"] += 1
+        stats["errors"] += status >= 500
+        stats["queries"] += metrics.queries
+        stats["max_queries"] = max(stats["max_queries"], metrics.queries)
+        stats["db_seconds"] += metrics.db_time
+        stats["template_seconds"] += metrics.template_time
+        stats["seconds"] += metrics.duration
+        stats["over_budget"] += over_budget
+        stats["buckets"][bisect_left(LATENCY_BUCKETS, metrics.duration)] += 1
+
+
+def view_stats():
+    """
+    Get the request counters of every view served by this process.
+
+    Returns:
+        dict: The counters of every view, keyed by URL name.
+    """
+
+    with _views_lock:
+        return {
+            view: {**stats, "buckets": list(stats["buckets"])}
+            for view, stats in _views.items()
+        }
+
+
+def reset_view_stats():
+    """Reset the request counters of this process."""
+
+    with _views_lock:
+        _views.clear()
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(views, cache):
+    """
+    Render counters in the Prometheus text exposition format.
+
+    Args:
+        views (dict): The counters of every view, as given by view_stats().
+        cache (dict): The catalog cache counters, as given by cache_stats().
+    Returns:
+        str: The metrics.
+    """
+
+    lines = []
+
+    def metric(name, type, help, samples):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {type}")
+        lines.extend(samples)
+
+    def per_view(name, type, help, key):
+        metric(
+            name,
+            type,
+            help,
+            [
+                f'{name}{{view="{_label(view)}"}} {stats[key]}'
+                for view, stats in views.items()
+            ],
+        )
+
+    per_view("emarket_requests_total", "counter", "Requests served.", "requests")
+    per_view(
+        "emarket_request_errors_total",
+        "counter",
+        "Requests answered with a server error.",
+        "errors",
+    )
+
+    samples = []
+    for view, stats in views.items():
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+            cumulative += count
+            samples.append(
+                f'emarket_request_duration_seconds_bucket{{view="{label}",le="{bound}"}}'
+                f" {cumulative}"
+            )
+        samples.extend(
+            [
+                f'emarket_request_duration_seconds_bucket{{view="{label}",le="+Inf"}}'
+                f' {stats["requests"]}',
+                f'emarket_request_duration_seconds_sum{{view="{label}"}}'
+                f' {stats["seconds"]}',
+                f'emarket_request_duration_seconds_count{{view="{label}"}}'
+                f' {stats["requests"]}',
+            ]
+        )
+    metric(
+        "emarket_request_duration_seconds",
+        "histogram",
+        "Time spent serving requests.",
+        samples,
+    )
+
+    per_view("emarket_db_queries_total", "counter", "SQL queries run.", "queries")
+    per_view(
+        "emarket_db_queries_max",
+        "gauge",
+        "Most SQL queries run by a single request.",
+        "max_queries",
+    )
+    per_view(
+        "emarket_db_duration_seconds_total",
+        "counter",
+        "Time spent running SQL queries.",
+        "db_seconds",
+    )
+    per_view(
+        "emarket_template_duration_seconds_total",
+        "counter",
+        "Time spent rendering templates.",
+        "template_seconds",
+    )
+    per_view(
+        "emarket_query_budget_exceeded_total",
+        "counter",
+        "Requests running more queries than the budget of their view.",
+        "over_budget",
+    )
+
+    metric(
+        "emarket_catalog_cache_hits_total",
+        "counter",
+        "Catalog fragments served from the cache.",
+        [f"emarket_catalog_cache_hits_total {cache['hits']}"],
+    )
+    metric(
+        "emarket_catalog_cache_misses_total",
+        "counter",
+        "Catalog fragments rendered on a cache miss.",
+        [f"emarket_catalog_cache_misses_total {cache['misses']}"],
+    )
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import measure, record
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """
+    Measures every request and adds it to the counters of its view.
+
+    Counts the SQL queries and the time spent running them, rendering
+    templates and serving the whole request, per URL name. The measurements
+    of a request are kept as request.metrics. Requests running more queries
+    than the budget of their view in settings.QUERY_BUDGETS are logged. The
+    body of a streaming response is produced after the request is measured.
+
+    Must be the first middleware, so the time of the others is included.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        with measure() as request.metrics:
+            response = self.get_response(request)
+        self.record(request, response)
+        return response
+
+    async def __acall__(self, request):
+        with measure() as request.metrics:
+            response = await self.get_response(request)
+        self.record(request, response)
+        return response
+
+    def record(self, request, response):
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        metrics = request.metrics
+
+        budget = settings.QUERY_BUDGETS.get(view)
+        over_budget = budget is not None and metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                "%s ran %d queries, over its budget of %d.",
+                view,
+                metrics.queries,
+                budget,
+            )
+
+        record(view, metrics, response.status_code, over_budget)
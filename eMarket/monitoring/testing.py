@@ -0,0 +1,72 @@
+from django.conf import settings
+from market.cache import get_catalog_cache
+from market.models import Category, Product
+
+# the checkout form of every test and benchmark order
+ORDER_DATA = {
+    "first_name": "Jane",
+    "last_name": "Doe",
+    "email": "jane@example.com",
+    "address": "1 Main Street",
+    "postal_code": "00100",
+    "city": "Nairobi",
+}
+
+
+def create_catalog(products=10):
+    """Create two categories of phones, the first one with the products."""
+
+    category = Category.objects.create(name="Phones", identifier="phones")
+    Category.objects.create(name="Tablets", identifier="tablets")
+    return [
+        Product.objects.create(
+            category=category,
+            name=f"Phone {i}",
+            identifier=f"phone-{i}",
+            description="A phone.",
+            price=1000 * i,
+        )
+        for i in range(products)
+    ]
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin checking requests against the query budget of their view.
+
+    Exercise a view with enough objects for a query per object to show, then
+    pass the response to assertWithinQueryBudget(); an N+1 regression runs
+    more queries than settings.QUERY_BUDGETS allows and fails the test.
+    """
+
+    def assertWithinQueryBudget(self, response):
+        request = response.wsgi_request
+        view = request.resolver_match.view_name
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None:
+            self.fail(f"{view} has no query budget in settings.QUERY_BUDGETS.")
+
+        self.assertLessEqual(
+            request.metrics.queries,
+            budget,
+            f"{view} ran {request.metrics.queries} queries, "
+            f"over its budget of {budget}.",
+        )
+
+
+class CatalogQueryBudgetMixin(QueryBudgetMixin):
+    """
+    QueryBudgetMixin for the views of the catalog, with ten products.
+
+    The products are created once per TestCase, as cls.products, and the
+    catalog cache is cleared before every test, so pages are measured cold.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products = create_catalog()
+
+    def setUp(self):
+        super().setUp()
+        get_catalog_cache().clear()
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import get_resolver, reverse
+
+from .benchmarks import compare, run_benchmark, seed_catalog
+from .metrics import reset_view_stats, view_stats
+from .testing import create_catalog
+
+# the namespaces whose every view must have a query budget
+BUDGETED_NAMESPACES = ["market", "cart", "orders", "api", "analytics"]
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        reset_view_stats()
+
+    def test_requests_are_measured_per_view(self):
+        create_catalog(products=3)
+        self.client.get(reverse("market:product_list"))
+        response = self.client.get(reverse("market:product_list"))
+
+        metrics = response.wsgi_request.metrics
+        self.assertGreater(metrics.queries, 0)
+        self.assertGreater(metrics.template_time, 0)
+        self.assertGreaterEqual(metrics.duration, metrics.template_time)
+
+        stats = view_stats()["market:product_list"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertGreaterEqual(stats["max_queries"], metrics.queries)
+        self.assertEqual(sum(stats["buckets"]), 2)
+
+    def test_unresolved_requests(self):
+        self.client.get("/no/such/page/")
+
+        self.assertEqual(view_stats()["unresolved"]["requests"], 1)
+
+    @override_settings(QUERY_BUDGETS={"market:product_list": 0})
+    def test_requests_over_budget_are_counted(self):
+        with self.assertLogs("monitoring.middleware", "WARNING"):
+            self.client.get(reverse("market:product_list"))
+
+        self.assertEqual(view_stats()["market:product_list"]["over_budget"], 1)
+
+    def test_every_view_has_a_budget(self):
+        resolver = get_resolver()
+        for namespace in BUDGETED_NAMESPACES:
+            _, urls = resolver.namespace_dict[namespace]
+            for name in urls.reverse_dict:
+                if isinstance(name, str):
+                    self.assertIn(f"{namespace}:{name}", settings.QUERY_BUDGETS)
+
+
+@override_settings(DEBUG=False, METRICS_TOKEN="secret")
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        reset_view_stats()
+        self.client.get(reverse("market:product_list"))
+
+    def test_metrics_require_the_token_or_staff(self):
+        self.assertEqual(
+            self.client.get(reverse("monitoring:metrics")).status_code, 403
+        )
+
+        response = self.client.get(
+            reverse("monitoring:metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.assertEqual(
+            self.client.get(reverse("monitoring:metrics")).status_code, 200
+        )
+
+    def test_prometheus_format(self):
+        response = self.client.get(
+            reverse("monitoring:metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn("# TYPE emarket_request_duration_seconds histogram", body)
+        self.assertIn('emarket_requests_total{view="market:product_list"} 1', body)
+        self.assertIn(
+            'emarket_request_duration_seconds_bucket{view="market:product_list",'
+            'le="+Inf"} 1',
+            body,
+        )
+        self.assertIn("emarket_catalog_cache_misses_total", body)
+
+    def test_json_format(self):
+        response = self.client.get(
+            reverse("monitoring:metrics_json"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        data = response.json()
+        stats = data["views"]["market:product_list"]
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(
+            stats["query_budget"], settings.QUERY_BUDGETS["market:product_list"]
+        )
+        self.assertEqual(set(data["catalog_cache"]), {"hits", "misses"})
+
+
+class BenchmarkTests(TestCase):
+    def test_benchmarks_run_and_compare(self):
+        seed_catalog(50)
+        result = run_benchmark("create_order", 50, lines=3, runs=2)
+
+        self.assertEqual(
+            set(result), {"p50_ms", "p95_ms", "mean_ms", "queries", "peak_kib"}
+        )
+        self.assertGreater(result["queries"], 0)
+
+        slower = {**result, "p50_ms": result["p50_ms"] * 2}
+        more_queries = {**result, "queries": result["queries"] + 1}
+        rows = compare(
+            {"a": result, "b": slower, "c": more_queries},
+            {"a": result, "b": result, "c": result},
+        )
+        self.assertEqual([row[3] for row in rows], [False, True, True])
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = "monitoring"
+
+urlpatterns = [
+    path("", views.metrics, name="metrics"),
+    path("json/", views.metrics_json, name="metrics_json"),
+]
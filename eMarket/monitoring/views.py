@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from market.cache import cache_stats
+
+from .metrics import render_prometheus, view_stats
+
+
+def check_access(request):
+    """
+    Only let staff and holders of the metrics token read the metrics.
+
+    Scrapers send settings.METRICS_TOKEN as a bearer token. Without a token
+    configured, the metrics are also open while DEBUG is on.
+
+    Args:
+        request (HttpRequest): The request object.
+    Raises:
+        PermissionDenied: If the request may not read the metrics.
+    """
+
+    if request.user.is_staff:
+        return
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if constant_time_compare(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+            return
+    elif settings.DEBUG:
+        return
+    raise PermissionDenied
+
+
+@require_GET
+def metrics(request):
+    """
+    Export the request and cache counters of this process to Prometheus.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        HttpResponse: The metrics, in the Prometheus text format.
+    """
+
+    check_access(request)
+    return HttpResponse(
+        render_prometheus(view_stats(), cache_stats()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@require_GET
+def metrics_json(request):
+    """
+    Export the request and cache counters of this process as JSON.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        JsonResponse: The counters of every view under "views", with their
+            budget, and the catalog cache counters under "catalog_cache".
+    """
+
+    check_access(request)
+    views = view_stats()
+    for view, stats in views.items():
+        stats["query_budget"] = settings.QUERY_BUDGETS.get(view)
+    return JsonResponse({"views": views, "catalog_cache": cache_stats()})
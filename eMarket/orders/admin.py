@@ -1,14 +1,56 @@
+from datetime import datetime, time
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from market.pagination import EstimatedCountPaginator
 from .models import Order, OrderItem
 
 
 class OrderItemInline(admin.TabularInline):
     """
     Inline class for the OrderItem model to be displayed within the Order model in the Django admin interface.
+
+    The product is shown read-only from a joined query; a raw id widget loads every product with its own query.
+    Items are added at checkout, not here.
     """
 
     model = OrderItem
-    raw_id_fields = ["product"]
+    fields = ["product", "price", "quantity"]
+    readonly_fields = ["product"]
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def order_summary():
+    """
+    Count the paid, unpaid and today's orders, with a single query.
+
+    The summary is cached for settings.ORDER_SUMMARY_TIMEOUT seconds, so it does not aggregate the orders table on every changelist page.
+
+    Returns:
+        dict: The "paid_count", "unpaid_count" and "today_count" of the orders and the "revenue" of paid ones.
+    """
+
+    summary = cache.get("orders:summary")
+    if summary is None:
+        today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        summary = Order.objects.order_by().aggregate(
+            # not named after the fields, which the filters would resolve to
+            paid_count=Count("pk", filter=Q(paid=True)),
+            unpaid_count=Count("pk", filter=Q(paid=False)),
+            today_count=Count("pk", filter=Q(created__gte=today)),
+            revenue=Sum("total_cost", filter=Q(paid=True)),
+        )
+        cache.set("orders:summary", summary, settings.ORDER_SUMMARY_TIMEOUT)
+    return summary
 
 
 @admin.register(Order)
@@ -26,8 +68,28 @@ class OrderAdmin(admin.ModelAdmin):
         "postal_code",
         "city",
         "paid",
+        "total_cost",
+        "item_count",
         "created",
         "updated",
     ]
-    list_filter = ["paid", "created", "updated"]
+    readonly_fields = ["total_cost", "item_count"]
+    # filter on indexed columns only; "updated" has no index
+    list_filter = ["paid", "created"]
+    # customers are found by their full email, see get_search_results()
+    search_fields = ["email"]
     inlines = [OrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # an exact match on the (email, -created) index, where the default
+        # icontains search scans every order
+        search_term = search_term.strip().lower()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(email=search_term), False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), "order_summary": order_summary()}
+        return super().changelist_view(request, extra_context)
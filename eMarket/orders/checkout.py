@@ -0,0 +1,50 @@
+from decimal import Decimal
+from django.db import transaction
+from inventory import stock
+from .models import OrderItem
+
+
+def place_order(form, cart):
+    """
+    Create an order and all its items from a cart.
+
+    The order and its items are written in one transaction, the items with a
+    single bulk INSERT, so checkout either stores the whole order or nothing.
+    The unit prices are the ones snapshotted in the hydrated cart. The units
+    are taken out of the stock in the same transaction.
+
+    Args:
+        form (CreateOrderForm): The validated order form.
+        cart (Cart): The cart to check out.
+    Returns:
+        Order: The created order.
+    Raises:
+        OutOfStock: If a product does not have enough units left, in which
+            case nothing is written.
+    """
+
+    items = list(cart)
+
+    with transaction.atomic():
+        stock.commit(cart.key, {item.product.id: item.quantity for item in items})
+
+        order = form.save(commit=False)
+        # bulk_create() sends no signals, so the totals are stored up front
+        order.total_cost = sum((item.total_price for item in items), Decimal(0))
+        order.item_count = sum(item.quantity for item in items)
+        order.save()
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=item.product,
+                    price=item.price,
+                    quantity=item.quantity,
+                )
+                for item in items
+            ]
+        )
+
+    cart.clear()
+
+    return order
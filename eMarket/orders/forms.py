@@ -21,3 +21,17 @@ class CreateOrderForm(forms.ModelForm):
 
         model = Order
         fields = ["first_name", "last_name", "email", "address", "postal_code", "city"]
+
+
+class OrderLookupForm(forms.Form):
+    """
+    Form class asking for the email address whose orders to look up.
+    """
+
+    email = forms.EmailField()
+
+    def clean_email(self):
+        """
+        Method to lowercase the email address, as the orders store it.
+        """
+        return self.cleaned_data["email"].lower()
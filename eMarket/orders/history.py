@@ -0,0 +1,113 @@
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import Order
+
+# namespaces the signatures of the order history links
+HISTORY_SALT = "orders.history"
+
+
+def history_token(email):
+    """
+    Sign an email address into the token of an order history link.
+
+    Args:
+        email (str): The email address.
+    Returns:
+        str: The token, valid for settings.ORDER_HISTORY_LINK_AGE seconds.
+    """
+
+    return signing.dumps(email, salt=HISTORY_SALT)
+
+
+def history_email(token):
+    """
+    Get the email address of an order history link.
+
+    Args:
+        token (str): The token of the link.
+    Returns:
+        str: The email address.
+    Raises:
+        BadSignature: If the token was tampered with or expired.
+    """
+
+    return signing.loads(
+        token, salt=HISTORY_SALT, max_age=settings.ORDER_HISTORY_LINK_AGE
+    )
+
+
+def throttled(key, limit):
+    """
+    Count an attempt against a limit per settings.ORDER_HISTORY_THROTTLE_WINDOW.
+
+    Args:
+        key (str): The cache key of the counter.
+        limit (int): The most attempts allowed in the window.
+    Returns:
+        bool: Whether the attempt is over the limit.
+    """
+
+    window = settings.ORDER_HISTORY_THROTTLE_WINDOW
+    cache.add(key, 0, window)
+    try:
+        attempts = cache.incr(key)
+    except ValueError:
+        # the counter expired in the meantime
+        cache.set(key, 1, window)
+        attempts = 1
+    return attempts > limit
+
+
+def send_history_link(request, email):
+    """
+    Email a link to the order history of an email address, if it has orders.
+
+    Only the owner of the address can follow the link, so the response of
+    the lookup does not tell whether the address has orders. Nor does it
+    tell whether the lookup was throttled: at most
+    settings.ORDER_HISTORY_EMAIL_LIMIT links are sent to an address, and
+    settings.ORDER_HISTORY_IP_LIMIT requested from a client, per window.
+
+    Args:
+        request (HttpRequest): The request object, to build the link.
+        email (str): The email address, in lowercase.
+    Returns:
+        bool: Whether a link was sent.
+    """
+
+    # both counters count every lookup, so that neither many addresses nor
+    # many clients get around the limits
+    address = hashlib.sha256(email.encode()).hexdigest()
+    over_email = throttled(
+        f"orders:history:email:{address}", settings.ORDER_HISTORY_EMAIL_LIMIT
+    )
+    over_ip = throttled(
+        f"orders:history:ip:{request.META.get('REMOTE_ADDR', '')}",
+        settings.ORDER_HISTORY_IP_LIMIT,
+    )
+    if over_email or over_ip:
+        return False
+
+    if not Order.objects.filter(email=email).exists():
+        return False
+
+    url = request.build_absolute_uri(
+        reverse("orders:order_history", args=[history_token(email)])
+    )
+    send_mail(
+        "Your eMarket orders",
+        render_to_string(
+            "orders/history_email.txt",
+            {"url": url, "hours": settings.ORDER_HISTORY_LINK_AGE // 3600},
+        ),
+        None,
+        [email],
+    )
+    return True
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from inventory.models import StockItem
+from market.models import Category, Product
+from monitoring.testing import ORDER_DATA
+
+
+class Command(BaseCommand):
+    help = (
+        "Place orders from many threads at once and report the write "
+        'throughput and the failed checkouts, e.g. "database is locked". '
+        "Runs against a throwaway test database with the configured engine "
+        "and options, the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Concurrent customers."
+        )
+        parser.add_argument(
+            "--orders", type=int, default=25, help="Orders placed per thread."
+        )
+        parser.add_argument("--lines", type=int, default=3, help="Lines of every cart.")
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=50,
+            help="Stock-tracked products the carts are filled from; fewer "
+            "products means more contention on their stock rows.",
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=["testserver"]):
+                products = self.seed(options["products"])
+                connection.close()
+                self.run(products, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count):
+        category = Category.objects.create(name="Stress", identifier="stress")
+        products = Product.objects.bulk_create(
+            Product(
+                category=category,
+                name=f"Stress product {i}",
+                identifier=f"stress-product-{i}",
+                price=100 + i,
+            )
+            for i in range(count)
+        )
+        StockItem.objects.bulk_create(
+            StockItem(product=product, quantity=1000000) for product in products
+        )
+        return products
+
+    def run(self, products, options):
+        """
+        Place the orders from every thread at once.
+
+        Args:
+            products (list): The products the carts are filled from.
+            options (dict): The command options.
+        """
+
+        barrier = threading.Barrier(options["threads"])
+        placed, errors = [], []
+
+        def customer(number):
+            rng = random.Random(number)
+            client = Client()
+            barrier.wait()
+            try:
+                for _ in range(options["orders"]):
+                    try:
+                        for product in rng.sample(products, options["lines"]):
+                            response = client.post(
+                                reverse("cart:cart_add", args=[product.id]),
+                                {"quantity": 1},
+                            )
+                            if response.status_code != 302:
+                                raise RuntimeError(f"cart_add {response.status_code}")
+                        response = client.post(
+                            reverse("orders:create_order"), ORDER_DATA
+                        )
+                        if response.status_code != 200:
+                            raise RuntimeError(f"create_order {response.status_code}")
+                        placed.append(1)
+                    except Exception as e:
+                        errors.append(f"{type(e).__name__}: {e}")
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=customer, args=[number])
+            for number in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{connection.vendor}: {len(placed)} orders in {elapsed:.2f}s, "
+            f"{len(placed) / elapsed:.1f} orders/s "
+            f"({len(placed) * (options['lines'] + 1) / elapsed:.1f} requests/s), "
+            f"{len(errors)} failed"
+        )
+        for error in sorted(set(errors)):
+            self.stdout.write(f"  {errors.count(error)} x {error}")
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['paid', '-created'], name='order_paid_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:19
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+
+    Order.objects.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_paid_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['email', '-created'], name='order_email_created_idx'),
+        ),
+    ]
@@ -1,7 +1,54 @@
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from market.models import Product
 
 
+class OrderQuerySet(models.QuerySet):
+    """
+    QuerySet class with the aggregate queries over the items of orders.
+    """
+
+    def with_totals(self):
+        """
+        Method to annotate every order with the total cost and the number of
+        items computed from its items, in a single aggregate query.
+        The annotations are named computed_total_cost and computed_item_count.
+        """
+        return self.annotate(
+            computed_total_cost=Coalesce(
+                Sum(F("items__price") * F("items__quantity")),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            computed_item_count=Coalesce(Sum("items__quantity"), Value(0)),
+        )
+
+    def refresh_totals(self):
+        """
+        Method to recompute the stored total_cost and item_count of the
+        orders from their items, with a single UPDATE statement.
+        """
+        items = (
+            OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+        )
+        return self.update(
+            total_cost=Coalesce(
+                Subquery(
+                    items.annotate(total=Sum(F("price") * F("quantity"))).values(
+                        "total"
+                    )
+                ),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            item_count=Coalesce(
+                Subquery(items.annotate(count=Sum("quantity")).values("count")),
+                Value(0),
+            ),
+        )
+
+
 class Order(models.Model):
     """
     Order model to store order information.
@@ -16,6 +63,8 @@ class Order(models.Model):
     - created: the date and time the order was created
     - updated: the date and time the order was last updated
     - paid: a boolean field to indicate if the order has been paid for
+    - total_cost: the total cost of the items, kept up to date when items change
+    - item_count: the total quantity of the items, kept up to date when items change
     - items: a many-to-many relationship with the Product model to store the products in the order
     """
 
@@ -28,6 +77,12 @@ class Order(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     paid = models.BooleanField(default=False)
+    total_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         """
@@ -35,11 +90,17 @@ class Order(models.Model):
 
         The ordering is set to descending order based on the created field.
         An index is created on the created field for faster lookups.
+        Another one on paid and created serves the admin list filtered by payment.
+        The one on email and created serves the order history of a customer.
         """
 
         ordering = ["-created"]
         indexes = [
             models.Index(fields=["-created"]),
+            # the paid filter of the admin, in list order
+            models.Index(fields=["paid", "-created"], name="order_paid_created_idx"),
+            # the order history of a customer, newest first
+            models.Index(fields=["email", "-created"], name="order_email_created_idx"),
         ]
 
     def __str__(self):
@@ -49,12 +110,37 @@ class Order(models.Model):
         """
         return f"Order ID: {self.id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Method to remember whether a loaded order was paid, so saving it can
+        tell whether it was just paid (see analytics). None if the paid field
+        was deferred.
+        """
+        order = super().from_db(db, field_names, values)
+        order.stored_paid = order.__dict__.get("paid")
+        return order
+
+    def save(self, *args, **kwargs):
+        """
+        Method to save the order with its email in lowercase, so the order
+        history finds it with an exact, indexed lookup; the post_save
+        receivers still see the paid status it had before.
+        """
+        self.email = self.email.lower()
+        super().save(*args, **kwargs)
+        self.stored_paid = self.paid
+
     def get_total_cost(self):
         """
-        Method to calculate the total cost of the order.
-        The total cost is calculated by summing the cost of all the products in the order.
+        Method to return the total cost of the order.
+        The total cost is stored on the order and kept up to date when its items change.
         """
-        return sum(item.get_cost() for item in self.items.all())
+        return self.total_cost
+
+
+# the fields of an item counted by the sales rollups
+LINE_FIELDS = ("product_id", "price", "quantity")
 
 
 class OrderItem(models.Model):
@@ -83,6 +169,33 @@ class OrderItem(models.Model):
         return str(self.id)
         # return f"{self.product.name} x {self.quantity}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Method to remember the product, price and quantity a loaded item was
+        stored with, so saving or deleting it can tell what it changed (see
+        analytics). None if one of them was deferred.
+        """
+        item = super().from_db(db, field_names, values)
+        item.stored_line = item.line()
+        return item
+
+    def save(self, *args, **kwargs):
+        """
+        Method to save the item; the post_save receivers still see the line
+        it was stored with before.
+        """
+        super().save(*args, **kwargs)
+        self.stored_line = self.line()
+
+    def line(self):
+        """
+        Method to return the product ID, the price and the quantity of the
+        item, None if one of them is not loaded.
+        """
+        line = tuple(self.__dict__.get(name) for name in LINE_FIELDS)
+        return None if None in line else line
+
     def get_cost(self):
         """
         Method to calculate the cost of the order item.
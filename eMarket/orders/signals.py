@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_order_totals(sender, instance, **kwargs):
+    """
+    Recompute the stored totals of an order when one of its items changes.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (OrderItem): The saved or deleted order item.
+        **kwargs: Arbitrary keyword arguments.
+    """
+
+    Order.objects.filter(pk=instance.order_id).refresh_totals()
@@ -1,3 +1,269 @@
-from django.test import TestCase
+import base64
+import json
+import re
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from inventory.models import Reservation, StockItem
+from monitoring.testing import (
+    ORDER_DATA,
+    CatalogQueryBudgetMixin,
+    QueryBudgetMixin,
+    create_catalog,
+)
+
+from .history import history_token
+from .models import Order, OrderItem
+
+
+class CheckoutQueryBudgetTests(CatalogQueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        StockItem.objects.bulk_create(
+            [StockItem(product=product, quantity=10) for product in cls.products]
+        )
+
+    def setUp(self):
+        super().setUp()
+        for product in self.products:
+            self.client.post(
+                reverse("cart:cart_add", args=[product.id]), {"quantity": 1}
+            )
+
+    def test_create_order_form(self):
+        response = self.client.get(reverse("orders:create_order"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_create_order(self):
+        response = self.client.post(reverse("orders:create_order"), ORDER_DATA)
+
+        self.assertEqual(Order.objects.get().item_count, len(self.products))
+        self.assertWithinQueryBudget(response)
+
+
+class CheckoutRollbackTests(TestCase):
+    def test_stock_shortage_rolls_back_the_whole_order(self):
+        # stock is taken in product ID order, the short product comes last
+        products = sorted(create_catalog(products=2), key=lambda p: p.id)
+        StockItem.objects.bulk_create(
+            [StockItem(product=product, quantity=10) for product in products]
+        )
+        for product in products:
+            self.client.post(
+                reverse("cart:cart_add", args=[product.id]), {"quantity": 1}
+            )
+        # the units of the second product are sold elsewhere meanwhile
+        StockItem.objects.filter(product=products[1]).update(quantity=0)
+
+        response = self.client.post(reverse("orders:create_order"), ORDER_DATA)
+
+        self.assertRedirects(
+            response, reverse("cart:cart_detail"), fetch_redirect_response=False
+        )
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(StockItem.objects.get(product=products[0]).quantity, 10)
+        self.assertEqual(Reservation.objects.count(), 2)
+        cart = self.client.get(reverse("cart:cart_detail")).context["cart"]
+        self.assertEqual(len(cart), 2)
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        self.products = create_catalog(products=3)
+        self.order = Order.objects.create(**ORDER_DATA)
+
+    def totals(self):
+        order = Order.objects.get(pk=self.order.pk)
+        return order.total_cost, order.item_count
+
+    def test_totals_follow_saved_items(self):
+        item = OrderItem.objects.create(
+            order=self.order, product=self.products[1], price=1000, quantity=2
+        )
+        OrderItem.objects.create(
+            order=self.order, product=self.products[2], price=2000, quantity=1
+        )
+        self.assertEqual(self.totals(), (4000, 3))
+
+        item.quantity = 5
+        item.price = 1500
+        item.save()
+        self.assertEqual(self.totals(), (9500, 6))
+
+    def test_totals_follow_deleted_items(self):
+        item = OrderItem.objects.create(
+            order=self.order, product=self.products[1], price=1000, quantity=2
+        )
+        OrderItem.objects.create(
+            order=self.order, product=self.products[2], price=2000, quantity=1
+        )
+
+        item.delete()
+        self.assertEqual(self.totals(), (2000, 1))
+
+        self.order.items.all().delete()
+        self.assertEqual(self.totals(), (0, 0))
+
+    def test_stored_totals_match_the_items(self):
+        for product in self.products:
+            OrderItem.objects.create(
+                order=self.order, product=product, price=product.price, quantity=3
+            )
+
+        order = Order.objects.with_totals().get(pk=self.order.pk)
+        self.assertEqual(order.total_cost, order.computed_total_cost)
+        self.assertEqual(order.item_count, order.computed_item_count)
+        self.assertEqual(order.get_total_cost(), 9000)
+
+
+class OrderHistoryTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for paid in [True] * 5 + [False] * 5:
+            Order.objects.create(
+                **{**ORDER_DATA, "email": "Jane@Example.com"}, paid=paid, total_cost=10
+            )
+        Order.objects.create(**{**ORDER_DATA, "email": "john@example.com"})
+
+    def setUp(self):
+        cache.clear()
+
+    def lookup(self, email, ip="127.0.0.1"):
+        return self.client.post(
+            reverse("orders:order_lookup"), {"email": email}, REMOTE_ADDR=ip
+        )
+
+    def test_lookup_emails_a_link(self):
+        response = self.client.post(
+            reverse("orders:order_lookup"), {"email": "JANE@example.com"}
+        )
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["jane@example.com"])
+        self.assertWithinQueryBudget(response)
+
+        url = re.search(r"http://testserver(\S+)", mail.outbox[0].body).group(1)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["orders"]), 10)
+
+    def test_unknown_emails_get_no_link(self):
+        response = self.client.post(
+            reverse("orders:order_lookup"), {"email": "nobody@example.com"}
+        )
+
+        self.assertTrue(response.context["sent"])
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(ORDER_HISTORY_EMAIL_LIMIT=2)
+    def test_links_to_an_address_are_throttled(self):
+        responses = [
+            self.lookup("jane@example.com", ip=f"10.0.0.{i}") for i in range(3)
+        ]
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(responses[2].content, responses[0].content)
+        self.lookup("john@example.com")
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(ORDER_HISTORY_IP_LIMIT=2)
+    def test_lookups_from_a_client_are_throttled(self):
+        responses = [
+            self.lookup(email)
+            for email in ("jane@example.com", "nobody@example.com", "john@example.com")
+        ]
+
+        self.assertEqual(
+            [message.to for message in mail.outbox], [["jane@example.com"]]
+        )
+        self.assertEqual(responses[2].content, responses[0].content)
+        self.lookup("john@example.com", ip="10.0.0.1")
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(ORDER_HISTORY_EMAIL_LIMIT=1, ORDER_HISTORY_THROTTLE_WINDOW=60)
+    def test_throttling_ends_with_the_window(self):
+        self.lookup("jane@example.com")
+        self.lookup("jane@example.com")
+        self.assertEqual(len(mail.outbox), 1)
+
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.lookup("jane@example.com")
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(ORDERS_PER_PAGE=4)
+    def test_history(self):
+        url = reverse("orders:order_history", args=[history_token("jane@example.com")])
+        response = self.client.get(url)
+
+        self.assertEqual(response.context["summary"], {"order_count": 10, "spent": 50})
+        self.assertEqual(len(response.context["orders"]), 4)
+        self.assertIsNotNone(response.context["next_url"])
+        self.assertWithinQueryBudget(response)
+
+    def test_malformed_cursors(self):
+        url = reverse("orders:order_history", args=[history_token("jane@example.com")])
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(["n", "2024-01-01T00:00:00+00:00", "notanint"]).encode()
+        ).decode()
+
+        self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 404)
+
+    def test_tampered_links_are_refused(self):
+        token = history_token("jane@example.com")
+        token = token[:-1] + ("A" if token[-1] != "A" else "B")
+        response = self.client.get(reverse("orders:order_history", args=[token]))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.context["expired"])
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    threads = 8
+    orders = 3
+
+    def test_concurrent_checkouts_all_succeed(self):
+        products = create_catalog(products=4)
+        StockItem.objects.bulk_create(
+            [StockItem(product=product, quantity=1000) for product in products]
+        )
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def customer():
+            client = Client()
+            barrier.wait()
+            try:
+                for _ in range(self.orders):
+                    # every cart takes the same stock rows
+                    for product in products:
+                        client.post(
+                            reverse("cart:cart_add", args=[product.id]),
+                            {"quantity": 1},
+                        )
+                    client.post(reverse("orders:create_order"), ORDER_DATA)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=customer) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), self.threads * self.orders)
+        self.assertEqual(
+            set(StockItem.objects.values_list("quantity", flat=True)),
+            {1000 - self.threads * self.orders},
+        )
@@ -5,4 +5,6 @@ app_name = "orders"
 
 urlpatterns = [
     path("create/", views.create_order, name="create_order"),
+    path("history/", views.order_lookup, name="order_lookup"),
+    path("history/<str:token>/", views.order_history, name="order_history"),
 ]
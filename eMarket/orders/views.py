@@ -1,31 +1,131 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, Q, Sum
+from django.http import Http404
 from django.shortcuts import render, redirect
-from .models import OrderItem
-from .forms import CreateOrderForm
+from .checkout import place_order
+from .forms import CreateOrderForm, OrderLookupForm
+from .history import history_email, send_history_link
+from .models import Order
 from cart.cart import Cart
 from django.contrib import messages
+from inventory.stock import OutOfStock
+from market.pagination import InvalidCursor, KeysetPaginator
+from market.views import page_url
 
 
 def create_order(request):
     cart = Cart(request)
 
+    if not cart:
+        return redirect("cart:cart_detail")
+
+    repriced = cart.reprice()
+    if repriced:
+        names = ", ".join(item.product.name for item in repriced)
+        messages.warning(
+            request,
+            f"The price of {names} changed since you added it to your cart, "
+            "please review your order.",
+        )
+
     if request.method == "POST":
         form = CreateOrderForm(request.POST)
 
-        if form.is_valid():
-            order = form.save()
-
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item["product"],
-                    price=item["price"],
-                    quantity=item["quantity"],
+        # a repriced order is shown again, with the details filled in, to be
+        # placed at the new prices
+        if not repriced and form.is_valid():
+            try:
+                order = place_order(form, cart)
+            except OutOfStock as e:
+                names = [
+                    item.product.name
+                    for item in cart
+                    if item.product.id in e.product_ids
+                ]
+                messages.error(
+                    request, f"Sorry, not enough stock left for: {', '.join(names)}."
                 )
-
-            cart.clear()
+                return redirect("cart:cart_detail")
 
             return render(request, "orders/order_created.html", {"order": order})
     else:
         form = CreateOrderForm()
 
     return render(request, "orders/create_order.html", {"cart": cart, "form": form})
+
+
+def order_lookup(request):
+    """
+    Email a customer the link to their order history.
+
+    Args:
+        request (HttpRequest): The request object.
+    Returns:
+        HttpResponse: The response object.
+    """
+
+    sent = False
+
+    if request.method == "POST":
+        form = OrderLookupForm(request.POST)
+
+        if form.is_valid():
+            send_history_link(request, form.cleaned_data["email"])
+            sent = True
+    else:
+        form = OrderLookupForm()
+
+    return render(request, "orders/lookup.html", {"form": form, "sent": sent})
+
+
+def order_history(request, token):
+    """
+    List the orders of the email address a history link was sent to.
+
+    The orders are paged over the (email, -created) index, with their stored
+    totals, and summed up with a single aggregate query.
+
+    Args:
+        request (HttpRequest): The request object.
+        token (str): The signed email address of the link.
+    Returns:
+        HttpResponse: The response object.
+    """
+
+    try:
+        email = history_email(token)
+    except signing.BadSignature:
+        return render(
+            request,
+            "orders/lookup.html",
+            {"form": OrderLookupForm(), "expired": True},
+            status=403,
+        )
+
+    orders = Order.objects.filter(email=email)
+    summary = orders.aggregate(
+        order_count=Count("pk"), spent=Sum("total_cost", filter=Q(paid=True))
+    )
+
+    paginator = KeysetPaginator(
+        orders.only("id", "created", "paid", "total_cost", "item_count"),
+        "-created",
+        settings.ORDERS_PER_PAGE,
+    )
+    try:
+        page = paginator.get_page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+
+    return render(
+        request,
+        "orders/history.html",
+        {
+            "email": email,
+            "summary": summary,
+            "orders": page.object_list,
+            "next_url": page_url(request, page.next_cursor),
+            "previous_url": page_url(request, page.previous_cursor),
+        },
+    )